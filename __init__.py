@@ -4,7 +4,7 @@ ComfyUI-CCXManager - SD-PPP插件更新助手
 """
 
 from .ccx_downloader_node import NODE_CLASS_MAPPINGS as CCX_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as CCX_NODE_DISPLAY_NAME_MAPPINGS
-from .auto_updater_node import NODE_CLASS_MAPPINGS as AUTO_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as AUTO_NODE_DISPLAY_NAME_MAPPINGS, auto_check_for_repo_updates
+from .auto_updater_node import NODE_CLASS_MAPPINGS as AUTO_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as AUTO_NODE_DISPLAY_NAME_MAPPINGS, update_scheduler
 from .py.lgutils import NODE_CLASS_MAPPINGS as CCX_GROUP_EXECUTOR_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as CCX_GROUP_EXECUTOR_NODE_DISPLAY_NAME_MAPPINGS
 from .node_version_manager import NODE_CLASS_MAPPINGS as VERSION_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as VERSION_NODE_DISPLAY_NAME_MAPPINGS
 
@@ -22,8 +22,5 @@ __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
 # 可选：添加Web目录支持（如果有JS组件）
 WEB_DIRECTORY = "web"
 
-# 在后台线程中运行自动更新检查（延迟5秒）
-import threading
-timer = threading.Timer(5.0, auto_check_for_repo_updates)
-timer.daemon = True
-timer.start()
+# 在后台线程中按计划运行自动更新检查（启动延迟5秒，之后按check_interval_days周期检查）
+update_scheduler.start()
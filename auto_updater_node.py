@@ -1,14 +1,25 @@
 import os
 import sys
 import json
-import subprocess
 import requests
 import shutil
+import random
 import tempfile
-from datetime import datetime
+from datetime import datetime, timedelta
+from pathlib import Path
 from urllib.parse import urlparse
 import threading
 from concurrent.futures import ThreadPoolExecutor
+from .py.revision_cache import get_revision_cache, normalize_repo_key
+from .py.git_runner import run_git, is_git_installed, read_head, read_remote_url, set_network_timeout
+
+try:
+    from server import PromptServer
+    from aiohttp import web
+    from .py.async_pipeline import get_async_pipeline
+except ImportError:
+    # 脱离ComfyUI运行时不注册路由
+    PromptServer = None
 
 __version__ = "2.0"
 
@@ -18,10 +29,22 @@ class GitHubRepoUpdater:
         self.comfyui_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         self.custom_nodes_path = os.path.join(self.comfyui_path, "custom_nodes")
         self.updater_config_path = os.path.join(os.path.dirname(__file__), "updater_config.json")
+        self.update_report_path = os.path.join(os.path.dirname(__file__), "update_report.json")
+        # 受管仓库的裸镜像缓存目录，用于秒级重新克隆和离线重装
+        self.mirror_cache_path = os.path.join(os.path.dirname(__file__), "mirror_cache")
+        # 并发更新时多个线程会修改并保存配置
+        self.config_lock = threading.RLock()
         self.config = self.load_config()
-        self.repo_cache = {}
+        set_network_timeout(self.config.get("git_network_timeout", 3600))
+        # 进程内共享并持久化的远程版本缓存（与CCX下载器共用）
+        self.revision_cache = get_revision_cache()
         self.updatable_repos = []
         self.updated_count = 0
+        # 按主机限制并发请求数
+        self.host_semaphores = {}
+        self.host_lock = threading.Lock()
+        # 本轮检查/更新的汇总结果，写入update_report.json
+        self.report = {}
 
     def load_config(self):
         """加载更新器配置文件"""
@@ -30,7 +53,18 @@ class GitHubRepoUpdater:
             "auto_update_on_start": True,
             "last_check_time": "",
             "check_interval_days": 1,
-            "max_workers": 5
+            "check_jitter_minutes": 30,  # 在检查间隔上随机增加的分钟数，避免多台机器同时请求
+            "next_check_time": "",  # 调度器持久化的下次检查时间
+            "max_workers": 5,
+            "update_check_mode": "ls-remote",  # ls-remote: 只比较远程引用与本地HEAD；fetch: 先fetch再比较
+            "fleet_mode": False,  # 舰队模式：管理custom_nodes下的所有Git仓库，而不只是SD-PPP
+            "fleet_exclude": [],  # 舰队模式下不参与自动更新的节点目录名
+            "max_requests_per_host": 4,
+            "clone_depth": 0,  # 大于0时使用浅克隆（--depth），后续拉取只增量传输新提交
+            "clone_filter": "",  # 部分克隆过滤器，如"blob:none"，文件内容按需下载
+            "single_branch": False,  # 只克隆和拉取跟踪的分支
+            "mirror_cache": True,  # 为每个受管仓库保留本地裸镜像，重新克隆时优先从镜像克隆
+            "git_network_timeout": 3600  # clone/fetch/pull的超时（秒），0表示不限时
         }
         try:
             if os.path.exists(self.updater_config_path):
@@ -47,18 +81,14 @@ class GitHubRepoUpdater:
     def save_config(self):
         """保存更新器配置文件"""
         try:
-            with open(self.updater_config_path, 'w', encoding='utf-8') as f:
+            with self.config_lock, open(self.updater_config_path, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, indent=4, ensure_ascii=False)
         except Exception as e:
             print(f"[CCXManager Updater] 保存配置失败: {str(e)}")
 
     def is_git_installed(self):
-        """检查Git是否安装"""
-        try:
-            subprocess.run(["git", "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            return True
-        except (subprocess.SubprocessError, FileNotFoundError):
-            return False
+        """检查Git是否安装（进程内只探测一次）"""
+        return is_git_installed()
 
     def add_repo(self, repo_url, node_name=None, branch="main", auto_update=True):
         """添加要监控的仓库"""
@@ -81,47 +111,202 @@ class GitHubRepoUpdater:
         except Exception as e:
             print(f"[CCXManager Updater] 获取SHA失败: {str(e)}")
 
-        # 清空现有仓库列表，只保留当前设置的仓库
-        self.config["repos"] = [{
+        repo_info = {
             "repo_url": repo_url,
             "node_name": node_name,
             "branch": branch,
             "auto_update": auto_update,
             "last_commit_sha": current_sha,
             "last_update_time": ""
-        }]
+        }
+
+        if self.config.get("fleet_mode", False):
+            # 舰队模式下保留其他仓库，同名节点直接替换
+            with self.config_lock:
+                self.config["repos"] = [repo for repo in self.config["repos"] if repo["node_name"] != node_name] + [repo_info]
+            self.save_config()
+            return True, f"成功添加仓库监控: {node_name}"
+
+        # 清空现有仓库列表，只保留当前设置的仓库
+        self.config["repos"] = [repo_info]
         
         self.save_config()
         return True, f"成功添加仓库监控: {node_name}，已自动清除旧仓库配置"
 
+    def discover_repos(self):
+        """扫描custom_nodes下的所有Git仓库并加入监控列表（舰队模式），返回新增数量"""
+        known_names = {repo["node_name"] for repo in self.config["repos"]}
+        excluded = set(self.config.get("fleet_exclude", []))
+        discovered = []
+        try:
+            node_names = sorted(os.listdir(self.custom_nodes_path))
+        except OSError as e:
+            print(f"[CCXManager Updater] 扫描custom_nodes失败: {str(e)}")
+            return 0
+
+        for node_name in node_names:
+            node_path = os.path.join(self.custom_nodes_path, node_name)
+            if node_name in known_names or node_name in excluded or not os.path.exists(os.path.join(node_path, ".git")):
+                continue
+            repo_url = read_remote_url(node_path)
+            if not repo_url:
+                continue
+            head_sha, head_ref = read_head(node_path)
+            if head_ref and head_ref.startswith("refs/heads/"):
+                branch = head_ref[len("refs/heads/"):]
+            else:
+                # 游离HEAD（通常是固定在某个版本）时使用远程默认分支，读取不到则不纳入管理
+                result = run_git(["symbolic-ref", "--short", "refs/remotes/origin/HEAD"], cwd=node_path)
+                branch = result.stdout.strip()[len("origin/"):] if result.returncode == 0 and result.stdout.strip().startswith("origin/") else ""
+                if not branch:
+                    print(f"[CCXManager Updater] 舰队模式跳过游离HEAD且无法确定默认分支的仓库: {node_name}")
+                    continue
+            discovered.append({
+                "repo_url": repo_url,
+                "node_name": node_name,
+                "branch": branch,
+                "auto_update": True,
+                "last_commit_sha": head_sha or "",
+                "last_update_time": "",
+                "discovered": True  # 舰队模式自动发现，更新时不覆盖本地修改
+            })
+
+        if discovered:
+            with self.config_lock:
+                self.config["repos"].extend(discovered)
+            self.save_config()
+            print(f"[CCXManager Updater] 舰队模式发现{len(discovered)}个新的Git仓库")
+        return len(discovered)
+
+    def host_slot(self, repo_url):
+        """返回仓库所在主机的信号量，用于限制同一主机的并发请求数"""
+        host = normalize_repo_key(repo_url).split("/")[0]
+        with self.host_lock:
+            semaphore = self.host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(max(1, self.config.get("max_requests_per_host", 4)))
+                self.host_semaphores[host] = semaphore
+            return semaphore
+
+    def clone_args(self):
+        """根据配置生成克隆参数（浅克隆/部分克隆/单分支）
+
+        后续pull不再传--depth（否则新提交会成为新的浅克隆根，与本地分支无法合并），
+        浅克隆仓库pull时只增量传输新提交；部分克隆的过滤器和单分支的refspec已记录在仓库配置中，拉取时自动沿用
+        """
+        args = []
+        if self.config.get("clone_depth", 0) > 0:
+            args.append(f"--depth={self.config['clone_depth']}")
+        if self.config.get("clone_filter"):
+            args.append(f"--filter={self.config['clone_filter']}")
+        if self.config.get("single_branch", False):
+            args.append("--single-branch")
+        return args
+
+    def get_mirror_path(self, repo_info):
+        """受管仓库对应的裸镜像路径"""
+        return os.path.join(self.mirror_cache_path, f"{repo_info['node_name']}.git")
+
+    def mirror_refspec(self, repo_info):
+        """镜像只同步分支（不含refs/pull/*等），单分支模式下只同步受管分支"""
+        if self.config.get("single_branch", False):
+            branch = repo_info["branch"]
+            return f"+refs/heads/{branch}:refs/heads/{branch}"
+        return "+refs/heads/*:refs/heads/*"
+
+    def refresh_mirror(self, repo_info):
+        """创建或增量刷新裸镜像，返回镜像是否可用（刷新失败但已有旧镜像时仍可离线使用）
+
+        镜像按clone_args()创建（浅克隆/部分克隆/单分支设置同样生效），刷新时只增量获取分支
+        """
+        mirror_path = self.get_mirror_path(repo_info)
+        if os.path.exists(mirror_path):
+            # 旧版本用clone --mirror创建的镜像包含所有引用，重新按当前设置创建
+            if run_git(["config", "--get", "remote.origin.mirror"], cwd=mirror_path).stdout.strip() == "true":
+                print(f"[CCXManager Updater] 重建旧格式镜像: {repo_info['node_name']}")
+                shutil.rmtree(mirror_path, ignore_errors=True)
+            else:
+                result = run_git(["fetch", "--prune", "origin"], cwd=mirror_path)
+                if result.returncode != 0:
+                    print(f"[CCXManager Updater] 刷新镜像失败，使用已有镜像: {repo_info['node_name']}")
+                return True
+
+        os.makedirs(self.mirror_cache_path, exist_ok=True)
+        result = run_git(["clone", "--bare", "-b", repo_info["branch"]] + self.clone_args() + [repo_info["repo_url"], mirror_path])
+        if result.returncode == 0:
+            # 裸克隆默认没有fetch refspec；允许本地克隆时按--filter传输
+            result = run_git(["config", "remote.origin.fetch", self.mirror_refspec(repo_info)], cwd=mirror_path)
+            run_git(["config", "uploadpack.allowFilter", "true"], cwd=mirror_path)
+        if result.returncode != 0:
+            shutil.rmtree(mirror_path, ignore_errors=True)
+            print(f"[CCXManager Updater] 创建镜像失败: {repo_info['node_name']}")
+            return False
+        return True
+
+    def clone_from_mirror(self, repo_info, node_path):
+        """从本地镜像克隆（无需网络），再把origin指回真实仓库地址
+
+        通过file://协议克隆，--depth/--filter/--single-branch等clone_args()参数才会生效
+        """
+        mirror_url = Path(os.path.abspath(self.get_mirror_path(repo_info))).as_uri()
+        result = run_git(["clone", "-b", repo_info["branch"]] + self.clone_args() + [mirror_url, node_path])
+        if result.returncode != 0:
+            shutil.rmtree(node_path, ignore_errors=True)
+            return result
+        run_git(["remote", "set-url", "origin", repo_info["repo_url"]], cwd=node_path)
+        return result
+
+    def seed_from_mirror(self, repo_info, node_path):
+        """用镜像中的提交更新本地跟踪分支，随后的pull与远程协商时不再重复传输这些对象"""
+        branch = repo_info["branch"]
+        run_git(["fetch", self.get_mirror_path(repo_info), f"+refs/heads/{branch}:refs/remotes/origin/{branch}"], cwd=node_path)
+
+    def check_repo_with_host_limit(self, repo_info):
+        with self.host_slot(repo_info["repo_url"]):
+            return self.check_repo_for_update(repo_info)
+
+    def update_repo_with_host_limit(self, repo_info, force_override=False):
+        with self.host_slot(repo_info["repo_url"]):
+            return self.update_repo(repo_info, force_override)
+
+    def save_update_report(self):
+        """将本轮所有仓库的检查和更新结果写入一份汇总报告"""
+        repos = list(self.report.values())
+        report = {
+            "generated_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "total": len(repos),
+            "has_update": sum(1 for repo in repos if repo.get("has_update")),
+            "updated": sum(1 for repo in repos if repo.get("update_success") is True),
+            "failed": sum(1 for repo in repos if repo.get("update_success") is False),
+            "repos": repos
+        }
+        try:
+            with open(self.update_report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=4, ensure_ascii=False)
+        except Exception as e:
+            print(f"[CCXManager Updater] 保存更新报告失败: {str(e)}")
+
     def get_remote_sha(self, repo_url, branch="main"):
         """获取远程仓库的最新SHA"""
-        # 检查缓存
-        cache_key = f"{repo_url}:{branch}"
-        if cache_key in self.repo_cache:
-            cached_sha, cached_time = self.repo_cache[cache_key]
-            # 缓存5分钟
-            if (datetime.now() - cached_time).total_seconds() < 300:
-                return cached_sha
+        # 检查共享缓存
+        cache_key = normalize_repo_key(repo_url, branch)
+        cached_sha = self.revision_cache.get(cache_key)
+        if cached_sha:
+            return cached_sha
 
         # 尝试使用git命令直接获取（参考Comfy-NodeUpdater的方式）
         if self.is_git_installed():
             try:
-                result = subprocess.run(
-                    ["git", "ls-remote", repo_url, branch],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
+                result = run_git(["ls-remote", repo_url, branch])
                 if result.returncode == 0 and result.stdout:
                     sha = result.stdout.split()[0]
-                    self.repo_cache[cache_key] = (sha, datetime.now())
+                    self.revision_cache.put(cache_key, sha)
                     return sha
             except Exception as e:
                 # 不打印详细错误信息
                 pass
                 
-        # 尝试使用GitHub API（备选方案）
+        # 尝试使用GitHub API（备选方案，带ETag条件请求）
         try:
             parsed_url = urlparse(repo_url)
             if parsed_url.netloc == "github.com":
@@ -131,17 +316,13 @@ class GitHubRepoUpdater:
                     # 移除仓库名称中的.git后缀
                     if repo.endswith('.git'):
                         repo = repo[:-4]
-                    api_url = f"https://api.github.com/repos/{owner}/{repo}/commits/{branch}"
                     
                     # 添加错误处理和超时设置
                     try:
-                        response = requests.get(api_url, timeout=10)
-                        if response.status_code == 200:
-                            sha = response.json().get("sha", "")
-                            if sha:
-                                self.repo_cache[cache_key] = (sha, datetime.now())
-                                return sha
-                    except requests.RequestException:
+                        sha = self.revision_cache.github_commit(owner, repo, branch)
+                        if sha:
+                            return sha
+                    except (requests.RequestException, KeyError, ValueError):
                         # 捕获网络相关异常，不打印详细信息
                         pass
         except Exception as e:
@@ -167,44 +348,50 @@ class GitHubRepoUpdater:
             return node_name, True, "本地仓库不存在"
         
         try:
-            # 尝试使用本地git命令检查更新
-            try:
-                # 执行git fetch，移除重复的打印信息
-                fetch_result = subprocess.run(
-                    ["git", "-C", node_path, "fetch"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                
-                if fetch_result.returncode == 0:
-                    # 检查本地与远程的差异
-                    status_result = subprocess.run(
-                        ["git", "-C", node_path, "status", "-uno"],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True
-                    )
-                    
-                    has_updates = "Your branch is behind" in status_result.stdout
-                    return node_name, has_updates, "本地git检查成功"
-                else:
-                    # git fetch失败，记录错误但不打印到控制台
-                    error_msg = f"git fetch失败"
-                    return node_name, False, error_msg  # 立即返回错误，不继续执行
-            except Exception as e:
-                # 本地git操作异常，不打印详细错误到控制台
-                error_msg = f"本地git操作异常"
-                return node_name, False, error_msg  # 立即返回错误，不继续执行
-                
-            # 注意：以下代码在git操作失败时不会执行，因为上面已经返回了
-            current_sha = self.get_remote_sha(repo_info["repo_url"], repo_info["branch"])
-            has_update = current_sha != repo_info["last_commit_sha"] or repo_info["last_commit_sha"] == ""
-            return node_name, has_update, current_sha
+            if self.config.get("update_check_mode", "ls-remote") == "fetch":
+                return self.check_repo_by_fetch(node_name, node_path)
+            return self.check_repo_by_ls_remote(repo_info, node_path)
         except Exception as e:
             # 检查更新异常，不打印详细错误到控制台
             return node_name, False, "检查更新异常"
 
+    def check_repo_by_ls_remote(self, repo_info, node_path):
+        """只查询远程引用并与本地HEAD比较，不传输任何对象；真正更新时才由pull拉取"""
+        node_name = repo_info["node_name"]
+        local_sha, head_ref = read_head(node_path)
+        if not local_sha:
+            return node_name, False, "读取本地HEAD失败"
+
+        # 跟踪当前所在分支，游离HEAD时使用配置中的分支
+        branch = head_ref[len("refs/heads/"):] if head_ref and head_ref.startswith("refs/heads/") else repo_info["branch"]
+        result = run_git(["ls-remote", "origin", f"refs/heads/{branch}"], cwd=node_path)
+        if result.returncode != 0 or not result.stdout.strip():
+            return node_name, False, "git ls-remote失败"
+
+        remote_sha = result.stdout.split()[0]
+        self.revision_cache.put(normalize_repo_key(repo_info["repo_url"], branch), remote_sha)
+        if remote_sha == local_sha:
+            return node_name, False, "本地git检查成功"
+
+        # 远程提交已存在于本地历史中（本地领先于远程），无需更新
+        if run_git(["merge-base", "--is-ancestor", remote_sha, "HEAD"], cwd=node_path).returncode == 0:
+            return node_name, False, "本地git检查成功"
+        return node_name, True, remote_sha
+
+    def check_repo_by_fetch(self, node_name, node_path):
+        """旧的检查方式：先fetch再比较本地与上游的提交数"""
+        fetch_result = run_git(["fetch"], cwd=node_path)
+        if fetch_result.returncode != 0:
+            # git fetch失败，记录错误但不打印到控制台
+            return node_name, False, "git fetch失败"
+
+        # 通过提交数判断是否落后于上游，不依赖git输出的语言
+        count_result = run_git(["rev-list", "--count", "HEAD..@{upstream}"], cwd=node_path)
+        if count_result.returncode != 0:
+            return node_name, False, "本地git操作异常"
+        has_updates = int(count_result.stdout.strip() or 0) > 0
+        return node_name, has_updates, "本地git检查成功"
+
     def update_repo(self, repo_info, force_override=False):
         """更新单个仓库（参考Comfy-NodeUpdater的实现）"""
         node_name = repo_info["node_name"]
@@ -213,29 +400,34 @@ class GitHubRepoUpdater:
         branch = repo_info["branch"]
 
         try:
+            # 先增量刷新裸镜像，网络不可用时沿用已有镜像
+            mirror_ready = self.config.get("mirror_cache", True) and self.refresh_mirror(repo_info)
+
             # 检查目录是否存在
             if not os.path.exists(node_path):
                 # 目录不存在，执行克隆
                 print(f"[CCXManager Updater] 开始克隆仓库: {node_name}")
-                result = subprocess.run(
-                    ["git", "clone", "-b", branch, repo_url, node_path],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
+                result = self.clone_from_mirror(repo_info, node_path) if mirror_ready else None
+                if result is None or result.returncode != 0:
+                    result = run_git(["clone", "-b", branch] + self.clone_args() + [repo_url, node_path])
                 if result.returncode != 0:
+                    # 超时被强制终止的git无法自行清理，删除不完整的目录，避免下次对损坏的仓库执行pull
+                    shutil.rmtree(node_path, ignore_errors=True)
                     return False, f"克隆失败: {result.stderr}"
             else:
                 # 目录存在，执行pull（参考Comfy-NodeUpdater的错误处理）
                 print(f"[CCXManager Updater] 开始更新仓库: {node_name}")
+                # 舰队模式自动发现的仓库可能有用户自己的修改，除非明确强制覆盖，否则跳过有未提交更改的仓库
+                if repo_info.get("discovered") and not force_override:
+                    status_result = run_git(["status", "--porcelain", "--untracked-files=no"], cwd=node_path)
+                    if status_result.returncode != 0 or status_result.stdout.strip():
+                        print(f"[CCXManager Updater] {node_name}有未提交的本地更改，已跳过更新")
+                        return False, "有未提交的本地更改，已跳过（勾选强制覆盖后才会放弃本地更改）"
+                if mirror_ready:
+                    self.seed_from_mirror(repo_info, node_path)
                 
                 # 先尝试直接pull
-                result = subprocess.run(
-                    ["git", "-C", node_path, "pull"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
+                result = run_git(["pull"], cwd=node_path)
                 
                 if result.returncode != 0:
                     # 检查是否是因为本地更改冲突导致的失败
@@ -243,43 +435,23 @@ class GitHubRepoUpdater:
                         print(f"[CCXManager Updater] 检测到{node_name}有未提交的更改，正在自动放弃本地更改...")
                         
                         # 尝试常规的checkout
-                        checkout_result = subprocess.run(
-                            ["git", "-C", node_path, "checkout", "--", "."],
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            text=True
-                        )
+                        checkout_result = run_git(["checkout", "--", "."], cwd=node_path)
                         
                         if checkout_result.returncode != 0 or force_override:
                             # 如果常规checkout失败或用户选择强制覆盖，使用更强制的方法
                             print(f"[CCXManager Updater] 尝试强制清理{node_name}的未跟踪文件...")
                             # 清理未跟踪的文件和目录
-                            clean_result = subprocess.run(
-                                ["git", "-C", node_path, "clean", "-fd"],
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                text=True
-                            )
+                            clean_result = run_git(["clean", "-fd"], cwd=node_path)
                             if clean_result.returncode != 0:
                                 return False, f"强制清理失败: {clean_result.stderr}"
                             
                             # 再次尝试checkout
-                            checkout_result = subprocess.run(
-                                ["git", "-C", node_path, "checkout", "--", "."],
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                text=True
-                            )
+                            checkout_result = run_git(["checkout", "--", "."], cwd=node_path)
                         
                         if checkout_result.returncode == 0:
                             print(f"[CCXManager Updater] {node_name}本地更改已放弃，正在重新尝试更新...")
                             # 再次尝试git pull
-                            retry_result = subprocess.run(
-                                ["git", "-C", node_path, "pull"],
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                text=True
-                            )
+                            retry_result = run_git(["pull"], cwd=node_path)
                             if retry_result.returncode == 0:
                                 # 更新成功
                                 pass
@@ -290,14 +462,15 @@ class GitHubRepoUpdater:
                     else:
                         return False, f"更新失败: {result.stderr}"
 
-            # 更新SHA和时间
-            current_sha = self.get_remote_sha(repo_url, branch)
-            for repo in self.config["repos"]:
-                if repo["node_name"] == node_name:
-                    repo["last_commit_sha"] = current_sha
-                    repo["last_update_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    break
-            self.save_config()
+            # 更新SHA和时间（更新后的本地HEAD即为远程最新提交，无需再次查询远程）
+            current_sha = read_head(node_path)[0] or self.get_remote_sha(repo_url, branch)
+            with self.config_lock:
+                for repo in self.config["repos"]:
+                    if repo["node_name"] == node_name:
+                        repo["last_commit_sha"] = current_sha
+                        repo["last_update_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                        break
+                self.save_config()
 
             return True, "更新成功"
         except Exception as e:
@@ -313,15 +486,23 @@ class GitHubRepoUpdater:
             return [], "没有监控的仓库"
 
         self.updatable_repos = []
+        self.report = {}
         status_message = "检查仓库更新结果:\n"
         has_any_update = False
         has_any_disabled = False
 
         # 使用线程池并发检查
         with ThreadPoolExecutor(max_workers=self.config.get("max_workers", 5)) as executor:
-            results = list(executor.map(self.check_repo_for_update, self.config["repos"]))
-
-        for node_name, has_update, result in results:
+            results = list(executor.map(self.check_repo_with_host_limit, self.config["repos"]))
+
+        for repo_info, (node_name, has_update, result) in zip(self.config["repos"], results):
+            self.report[node_name] = {
+                "node_name": node_name,
+                "repo_url": repo_info["repo_url"],
+                "branch": repo_info["branch"],
+                "has_update": has_update,
+                "check_result": result
+            }
             if has_update:
                 # 查找对应的repo_info
                 repo_info = next((r for r in self.config["repos"] if r["node_name"] == node_name), None)
@@ -352,6 +533,7 @@ class GitHubRepoUpdater:
 
         self.config["last_check_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.save_config()
+        self.save_update_report()
         
         return self.updatable_repos, status_message
 
@@ -371,20 +553,26 @@ class GitHubRepoUpdater:
 
         # 使用线程池并发更新，并传递force_override参数（参考Comfy-NodeUpdater）
         with ThreadPoolExecutor(max_workers=self.config.get("max_workers", 5)) as executor:
-            results = list(executor.map(lambda repo: (repo, self.update_repo(repo, force_override)), self.updatable_repos))
+            results = list(executor.map(lambda repo: (repo, self.update_repo_with_host_limit(repo, force_override)), self.updatable_repos))
 
         for repo_info, (success, message) in results:
             node_name = repo_info["node_name"]
+            if node_name in self.report:
+                self.report[node_name].update({"update_success": success, "update_message": message})
             if success:
                 self.updated_count += 1
                 result_msg = f"✅ {node_name}: {message}\n"
-                print("[CCXManager Updater] SD-PPP节点更新成功")
+                if self.config.get("fleet_mode", False):
+                    print(f"[CCXManager Updater] {node_name}更新成功")
+                else:
+                    print("[CCXManager Updater] SD-PPP节点更新成功")
             else:
                 result_msg = f"❌ {node_name}: {message}\n"
                 print(f"[CCXManager Updater] {result_msg.strip()}")  # 打印每个节点的更新结果到控制台
             status_message += result_msg
             update_results.append(result_msg.strip())
 
+        self.save_update_report()
         return self.updated_count, status_message
 
     def run_auto_update(self, force_override=False, force_update=False):
@@ -415,8 +603,11 @@ class GitHubRepoUpdater:
 
         print("[CCXManager Updater] 正在SD-PPP节点检查更新...")
         
+        if self.config.get("fleet_mode", False):
+            # 舰队模式：管理custom_nodes下的所有Git仓库
+            self.discover_repos()
         # 确保只保留当前设置的仓库（如果有的话）
-        if len(self.config["repos"]) > 1:
+        elif len(self.config["repos"]) > 1:
             print("[CCXManager Updater] 检测到多个仓库配置，仅保留当前设置的仓库")
             # 保留最后一个仓库配置
             self.config["repos"] = [self.config["repos"][-1]]
@@ -506,24 +697,202 @@ class CCXRepoUpdaterNode:
         
         return (status_message,)
 
+class UpdateScheduler:
+    """后台更新调度器：按check_interval_days加随机抖动周期性检查更新，并持久化下次检查时间
+
+    重启时若未到期则继续等待，避免频繁重启引发集中的网络请求；长时间运行的服务也能定期获得更新
+    """
+    TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self, startup_delay=5.0):
+        self.startup_delay = startup_delay
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.forced = False
+        self.state = {"running": False, "checking": False, "next_run": "", "last_run": "", "last_result": ""}
+
+    def start(self):
+        """启动调度线程（重复调用无副作用）"""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._loop, name="CCXManager-update-scheduler", daemon=True)
+            self.state["running"] = True
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def run_now(self):
+        """立即执行一次检查（不等待到期）"""
+        self.forced = True
+        self.wake_event.set()
+
+    def get_state(self):
+        with self.lock:
+            return dict(self.state)
+
+    def _set_state(self, **values):
+        with self.lock:
+            self.state.update(values)
+
+    def _next_due(self, config, now):
+        """计算下次检查时间：间隔天数加随机抖动；间隔不大于0时只在启动时检查一次"""
+        interval_days = config.get("check_interval_days", 1)
+        if interval_days <= 0:
+            return None
+        jitter = random.uniform(0, max(0, config.get("check_jitter_minutes", 30)) * 60)
+        return now + timedelta(days=interval_days, seconds=jitter)
+
+    def _load_due(self, config, now):
+        """读取持久化的下次检查时间，缺失、无法解析或超出一个完整周期（时钟回拨）时视为立即到期"""
+        interval_days = config.get("check_interval_days", 1)
+        try:
+            due = datetime.strptime(config.get("next_check_time") or "", self.TIME_FORMAT)
+        except (TypeError, ValueError):
+            return now
+        max_due = now + timedelta(days=interval_days, minutes=max(0, config.get("check_jitter_minutes", 30)))
+        if interval_days <= 0 or due > max_due:
+            return now
+        return due
+
+    def _wait(self, seconds):
+        """等待指定秒数（None表示一直等待），期间可被stop()/run_now()唤醒；返回是否应退出"""
+        self.wake_event.wait(None if seconds is None else max(0.0, seconds))
+        self.wake_event.clear()
+        return self.stop_event.is_set()
+
+    def _loop(self):
+        if self._wait(self.startup_delay):
+            return
+        try:
+            while not self.stop_event.is_set():
+                updater = GitHubRepoUpdater()
+                now = datetime.now()
+                due = self._load_due(updater.config, now)
+                self._set_state(next_run=due.strftime(self.TIME_FORMAT))
+
+                if due > now:
+                    # 未到期，等待到期或被手动唤醒后重新读取配置
+                    if self._wait((due - now).total_seconds()):
+                        return
+                    if datetime.now() < due and not self.forced:
+                        continue
+
+                self.forced = False
+                self._set_state(checking=True)
+                auto_check_for_repo_updates(updater)
+                updater.config = updater.load_config()
+                now = datetime.now()
+                next_due = self._next_due(updater.config, now)
+                updater.config["next_check_time"] = next_due.strftime(self.TIME_FORMAT) if next_due else ""
+                updater.save_config()
+                self._set_state(
+                    checking=False,
+                    last_run=now.strftime(self.TIME_FORMAT),
+                    last_result=f"更新了{updater.updated_count}个仓库",
+                    next_run=updater.config["next_check_time"]
+                )
+
+                if next_due is None:
+                    # 未配置周期检查，只在启动时检查一次，之后仅响应手动触发
+                    print("[CCXManager Updater] 未设置检查间隔，仅在启动时检查一次")
+                    if self._wait(None):
+                        return
+                    continue
+                print(f"[CCXManager Updater] 下次检查时间: {updater.config['next_check_time']}")
+        except Exception as e:
+            print(f"[CCXManager Updater] 更新调度器异常: {str(e)}")
+        finally:
+            self._set_state(running=False, checking=False)
+
+
 # 全局自动更新函数
-def auto_check_for_repo_updates():
-    """ComfyUI启动时自动检查仓库更新"""
+def auto_check_for_repo_updates(updater=None):
+    """检查仓库更新（由UpdateScheduler按计划调用）"""
     try:
-        updater = GitHubRepoUpdater()
+        updater = updater or GitHubRepoUpdater()
         # 获取当前自动更新设置状态
         auto_update_status = updater.config.get("auto_update_on_start", True)
         # 在控制台显示自动更新状态
         print(f"[CCXManager Updater] Comfyui侧自动更新SD-PPP[{'启动成功' if auto_update_status else '更新禁用'}]")
         
         if auto_update_status:
-            # 自动更新时不使用强制覆盖，但使用强制更新模式（忽略时间间隔）
+            # 到期时间由调度器控制，这里使用强制更新模式（忽略run_auto_update自身的时间间隔检查）
             updater.run_auto_update(False, True)
         else:
             print("[CCXManager Updater] 由于自动更新功能已禁用，跳过更新检查")
     except Exception as e:
         print(f"[CCXManager Updater] 自动更新失败: {str(e)}")
 
+
+update_scheduler = UpdateScheduler()
+
+
+if PromptServer is not None and getattr(PromptServer, "instance", None) is not None:
+    routes = PromptServer.instance.routes
+
+    @routes.get("/ccx_updater/schedule")
+    async def get_update_schedule(request):
+        """返回调度器状态：是否运行、下次/上次检查时间和结果"""
+        return web.json_response({"status": "success", "schedule": update_scheduler.get_state()})
+
+    @routes.post("/ccx_updater/check_now")
+    async def check_updates_now(request):
+        """立即触发一次更新检查"""
+        update_scheduler.run_now()
+        return web.json_response({"status": "success", "message": "已触发更新检查"})
+
+    @routes.post("/ccx_updater/async_update")
+    async def start_async_update(request):
+        """在服务器事件循环上异步检查并更新所有受管仓库，返回任务ID"""
+        try:
+            data = await request.json() if request.can_read_body else {}
+            job_id = get_async_pipeline().submit_repo_update(PromptServer.instance.loop, GitHubRepoUpdater(), bool(data.get("force_override", False)))
+            return web.json_response({"status": "success", "job_id": job_id})
+        except Exception as e:
+            return web.json_response({"status": "error", "message": str(e)}, status=500)
+
+    @routes.post("/ccx_updater/async_download")
+    async def start_async_download(request):
+        """异步下载配置中的CCX到本地缓存，返回任务ID"""
+        try:
+            data = await request.json() if request.can_read_body else {}
+            config_filename = data.get("config", "config.json")
+            if config_filename not in ("config.json", "config_copy.json"):
+                return web.json_response({"status": "error", "message": "未知的配置文件"}, status=400)
+            from .ccx_downloader_node import CCXManagerNode
+            manager_node = CCXManagerNode(config_filename)
+            url = manager_node.config.get("source_path", "")
+            if not url.startswith(("http://", "https://")):
+                return web.json_response({"status": "error", "message": "配置中的源不是URL"}, status=400)
+            job_id = get_async_pipeline().submit_ccx_download(PromptServer.instance.loop, manager_node, url)
+            return web.json_response({"status": "success", "job_id": job_id})
+        except Exception as e:
+            return web.json_response({"status": "error", "message": str(e)}, status=500)
+
+    @routes.get("/ccx_updater/jobs")
+    async def list_async_jobs(request):
+        return web.json_response({"status": "success", "jobs": get_async_pipeline().get_status()})
+
+    @routes.get("/ccx_updater/jobs/{job_id}")
+    async def get_async_job(request):
+        job = get_async_pipeline().get_status(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"status": "error", "message": "任务不存在"}, status=404)
+        return web.json_response({"status": "success", "job": job})
+
+    @routes.post("/ccx_updater/jobs/{job_id}/cancel")
+    async def cancel_async_job(request):
+        """取消异步任务：下载立即中止，仓库任务在当前git命令结束后停止"""
+        if not get_async_pipeline().cancel(request.match_info["job_id"]):
+            return web.json_response({"status": "error", "message": "任务不存在或已结束"}, status=404)
+        return web.json_response({"status": "success", "message": "已请求取消"})
+
 # 节点注册映射
 NODE_CLASS_MAPPINGS = {
     "CCXRepoUpdaterNode": CCXRepoUpdaterNode
@@ -2,10 +2,14 @@ import os
 import shutil
 import json
 import zipfile
-import requests
-import hashlib
 from datetime import datetime
 from urllib.parse import urlparse
+from .py.ccx_download import SegmentedDownloader
+from .py.ccx_cache import CCXCache
+from .py.ccx_installer import DifferentialInstaller, parallel_extract
+from .py.startup_jobs import StartupOrchestrator
+from .py.revision_cache import get_revision_cache
+from .py.mirror_selector import get_mirror_selector, equivalent_mirrors
 
 __version__ = "3.8"
 # 更新说明：修复了auto_run_on_restart开关状态不同步的问题，现在日志显示会准确反映用户的实际设置
@@ -17,9 +21,13 @@ class CCXManagerNode:
         self.config_path = os.path.join(os.path.dirname(__file__), config_filename)
         self.config = self.load_config()
         self.status = "未运行"
-        self.temp_dir = os.path.join(os.path.dirname(__file__), "temp")
+        # 每个配置文件使用独立的临时目录，允许多个实例并发下载
+        self.temp_dir = os.path.join(os.path.dirname(__file__), "temp", os.path.splitext(config_filename)[0])
         # 创建临时目录
         os.makedirs(self.temp_dir, exist_ok=True)
+        self.cache = CCXCache(os.path.join(os.path.dirname(__file__), "ccx_cache"))
+        # 每个配置文件对应一份安装清单
+        self.installer = DifferentialInstaller(os.path.splitext(self.config_path)[0] + "_install_manifest.json")
 
     def load_config(self):
         """加载配置文件，如果不存在则创建默认配置"""
@@ -32,7 +40,14 @@ class CCXManagerNode:
             "github_repo_url": "https://github.com/zombieyang/sd-ppp.git",
             "last_commit_hash": "",
             "version": __version__,
-            "force_reinstall_on_next_restart": False
+            "force_reinstall_on_next_restart": False,
+            "download_segments": 4,
+            "parallel_extract_workers": 0,
+            "expected_sha256": "",
+            "expected_size": 0,
+            "mirrors": [],
+            "auto_mirrors": True,
+            "mirror_racing": True
         }
         try:
             if os.path.exists(self.config_path):
@@ -56,46 +71,93 @@ class CCXManagerNode:
             self.status = f"保存配置失败: {str(e)}"
             print(f"[CCXManager] 保存配置失败: {str(e)}")
 
+    def get_mirror_candidates(self, url):
+        """返回url及其等价镜像（配置的mirrors与自动推导的gitee/GitHub raw地址），已去重"""
+        candidates = [url] + list(self.config.get("mirrors") or [])
+        if self.config.get("auto_mirrors", True):
+            candidates += equivalent_mirrors(url)
+        return list(dict.fromkeys(candidate for candidate in candidates if candidate))
+
     def download_from_url(self, url):
-        """从URL下载CCX文件并返回本地临时路径"""
+        """从URL（或其等价镜像）下载CCX文件并返回本地缓存路径"""
         try:
-            # 添加时间戳参数
-            timestamp = int(datetime.now().timestamp() * 1000)
-            if '?' in url:
-                url += f"&_={timestamp}"
-            else:
-                url += f"?_={timestamp}"
-              
-            # 发送请求
-            print(f"[CCXManager] 开始下载: {url}")
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-              
             # 获取文件名
             filename = os.path.basename(urlparse(url).path)
             if not filename.endswith('.ccx'):
                 self.status = "URL不是有效的CCX文件"
                 return None, None
-              
+
             temp_path = os.path.join(self.temp_dir, filename)
-              
-            # 保存文件
-            with open(temp_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-              
-            print(f"[CCXManager] 下载完成: {temp_path}")
-            return temp_path, filename
+
+            # 多个镜像时先竞速首字节，胜出者优先，其余按历史统计排序作为备选
+            selector = get_mirror_selector()
+            candidates = self.get_mirror_candidates(url)
+            if len(candidates) > 1 and self.config.get("mirror_racing", True):
+                winner = selector.race(candidates)
+                ranked = selector.rank(candidates)
+                candidates = [winner] + [candidate for candidate in ranked if candidate != winner] if winner else ranked
+
+            last_error = None
+            for mirror_url in candidates:
+                try:
+                    return self._download_mirror(selector, mirror_url, temp_path), filename
+                except Exception as e:
+                    selector.record_failure(mirror_url, e)
+                    last_error = e
+                    if len(candidates) > 1:
+                        print(f"[CCXManager] 镜像下载失败，尝试下一个镜像: {mirror_url} ({str(e)})")
+            raise last_error
         except Exception as e:
             self.status = f"下载失败: {str(e)}"
             print(f"[CCXManager] 下载失败: {str(e)}")
             return None, None
 
-    def unzip_ccx(self, source_path, target_path):
-        """解压CCX文件到目标路径"""
+    def _download_mirror(self, selector, url, temp_path):
+        """从单个镜像下载CCX，返回缓存路径，失败时抛出异常"""
+        # 可选的期望校验值，未配置时只校验服务器声明的Content-Length
+        expected_sha256 = (self.config.get("expected_sha256") or "").strip().lower() or None
+        expected_size = int(self.config.get("expected_size") or 0) or None
+
+        # 有缓存时发送条件请求，304直接复用缓存内容
+        cached_entry = self.cache.lookup(url)
+        if cached_entry and expected_sha256 and cached_entry["sha256"] != expected_sha256:
+            cached_entry = None
+        headers = self.cache.conditional_headers(cached_entry)
+
+        # 写入.part文件，中断后通过Range续传，服务器支持时分段并行下载；下载时同步计算SHA-256
+        print(f"[CCXManager] 开始下载: {url}")
+        start_time = datetime.now()
+        downloader = SegmentedDownloader(segments=self.config.get("download_segments", 4))
+        result = downloader.download(url, temp_path, headers=headers, expected_sha256=expected_sha256, expected_size=expected_size)
+
+        if result["status"] == "not_modified":
+            cached_path = self.cache.blob_path(cached_entry["sha256"])
+            print(f"[CCXManager] 远程文件未变化，复用缓存: {cached_path}")
+            return cached_path
+
+        # 只读取中央目录，拒绝损坏或被截断的CCX，避免其进入插件目录
+        if not zipfile.is_zipfile(temp_path):
+            os.remove(temp_path)
+            raise ValueError("下载的文件不是有效的CCX压缩包")
+
+        selector.record_success(url, result["size"], (datetime.now() - start_time).total_seconds())
+        entry = self.cache.store(url, temp_path, result["etag"], result["last_modified"], sha256=result["sha256"])
+        cached_path = self.cache.blob_path(entry["sha256"])
+        print(f"[CCXManager] 下载完成: {cached_path} (sha256: {entry['sha256']}, {entry['size']}字节)")
+        return cached_path
+
+    def unzip_ccx(self, source_path, target_path, members=None):
+        """解压CCX文件到目标路径，members为None时解压全部成员
+
+        配置parallel_extract_workers大于1时使用多线程解压
+        """
         try:
-            with zipfile.ZipFile(source_path, 'r') as zip_ref:
-                zip_ref.extractall(target_path)
+            workers = int(self.config.get("parallel_extract_workers", 0) or 0)
+            if workers > 1:
+                parallel_extract(source_path, target_path, members, max_workers=workers)
+            else:
+                with zipfile.ZipFile(source_path, 'r') as zip_ref:
+                    zip_ref.extractall(target_path, members)
             return True
         except Exception as e:
             self.status = f"解压失败: {str(e)}"
@@ -141,15 +203,9 @@ class CCXManagerNode:
                 print(f"[CCXManager] 不支持的GitHub URL格式: {repo_url}")
                 return None
 
-            # 构建API URL
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/commits/{branch}"
-            print(f"[CCXManager] 获取GitHub最新commit: {api_url}")
-
-            # 发送请求
-            response = requests.get(api_url, timeout=10)
-            response.raise_for_status()
-            commit_data = response.json()
-            return commit_data['sha']
+            # 通过共享的远程版本缓存获取（与ComfyUI侧更新器共用，带ETag条件请求）
+            print(f"[CCXManager] 获取GitHub最新commit: {owner}/{repo}@{branch}")
+            return get_revision_cache().github_commit(owner, repo, branch)
         except Exception as e:
             print(f"[CCXManager] 获取GitHub最新commit失败: {str(e)}")
             return None
@@ -205,25 +261,7 @@ class CCXManagerNode:
             print(f"[CCXManager] {self.status}")
             return self.status
 
-        # 清空目标文件夹内容（添加更多错误处理）
-        try:
-            if os.path.exists(target_path):
-                for item in os.listdir(target_path):
-                    item_path = os.path.join(target_path, item)
-                    try:
-                        if os.path.isfile(item_path) or os.path.islink(item_path):
-                            os.unlink(item_path)
-                        elif os.path.isdir(item_path):
-                            shutil.rmtree(item_path)
-                    except Exception as item_error:
-                        print(f"[CCXManager] 警告: 无法删除{item_path}: {str(item_error)}")
-            print(f"[CCXManager] 目标文件夹已清空: {target_path}")
-        except Exception as e:
-            self.status = f"清理目标文件夹失败: {str(e)}"
-            print(f"[CCXManager] 清理目标文件夹失败: {str(e)}")
-            return self.status
-
-        # 处理URL下载
+        # 处理URL下载（先下载再安装，下载失败时保留已安装的插件）
         local_path = source_path
         ccx_filename = None
         is_url = source_path and source_path.startswith(('http://', 'https://'))
@@ -240,11 +278,48 @@ class CCXManagerNode:
                 return self.status
             ccx_filename = os.path.basename(local_path)
 
-        # 解压文件
-        if self.unzip_ccx(local_path, target_path):
-            self.status = f"成功: {ccx_filename} 已解压到 {target_path}"
+        # 对比上次安装清单，生成差异安装计划
+        try:
+            plan = self.installer.plan(local_path, target_path)
+        except Exception as e:
+            self.status = f"失败: 无法读取 {ccx_filename}: {str(e)}"
+            print(f"[CCXManager] {self.status}")
+            return self.status
+
+        if plan["full"]:
+            # 没有可用的安装清单，清空目标文件夹后完整安装
+            try:
+                if os.path.exists(target_path):
+                    for item in os.listdir(target_path):
+                        item_path = os.path.join(target_path, item)
+                        try:
+                            if os.path.isfile(item_path) or os.path.islink(item_path):
+                                os.unlink(item_path)
+                            elif os.path.isdir(item_path):
+                                shutil.rmtree(item_path)
+                        except Exception as item_error:
+                            print(f"[CCXManager] 警告: 无法删除{item_path}: {str(item_error)}")
+                print(f"[CCXManager] 目标文件夹已清空: {target_path}")
+            except Exception as e:
+                self.status = f"清理目标文件夹失败: {str(e)}"
+                print(f"[CCXManager] 清理目标文件夹失败: {str(e)}")
+                return self.status
+            removed = 0
+        else:
+            removed = self.installer.remove_members(target_path, plan["remove"])
+
+        # 解压文件（增量安装时只写入新增或变化的成员）
+        members = None if plan["full"] else plan["write"]
+        if self.unzip_ccx(local_path, target_path, members):
+            self.installer.save_manifest(target_path, plan["members"])
+            if plan["full"]:
+                self.status = f"成功: {ccx_filename} 已解压到 {target_path}"
+            else:
+                self.status = f"成功: {ccx_filename} 已增量安装到 {target_path} (写入{len(plan['write'])}个，删除{removed}个，未变化{plan['unchanged']}个)"
             print(f"[CCXManager] {self.status}")
         else:
+            # 安装中途失败，下次强制完整安装
+            self.installer.discard_manifest()
             self.status = f"失败: 无法解压 {ccx_filename}"
             print(f"[CCXManager] {self.status}")
 
@@ -770,19 +845,11 @@ NODE_DISPLAY_NAME_MAPPINGS = {
 
 # 程序启动时自动检查并运行
 print(f"[CCXManager] Photoshop侧自动更新SD-PPP节点已加载 (版本: {__version__})")
+# 启动任务涉及GitHub API和CCX下载，放到后台执行，避免阻塞ComfyUI加载自定义节点
+startup_orchestrator = StartupOrchestrator("CCXManager")
 # 首先运行目录创建节点（优先级最高）
-dir_creator = CreateSDPPPInstallationDirectory()
-dir_creator.auto_run()
-
-# 然后运行其他节点的自动检查
-# 主节点（SDPPP2.0）自动运行检查
-manager = CCXManagerNode()
-manager.auto_run()
-
-# SDPPP1.0自动运行检查（使用独立配置文件）
-manager_copy = CCXManagerNode(config_filename="config_copy.json")
-manager_copy.auto_run()
-# 克隆节点自动运行检查
-manager_copy = CCXManagerNode(config_filename="config_copy.json")
-manager_copy.auto_run()
-
+startup_orchestrator.add_job("create_sdppp_directories", lambda: CreateSDPPPInstallationDirectory().auto_run())
+# 主节点（SDPPP2.0）与SDPPP1.0使用独立配置文件，两者互不依赖，可并发执行
+startup_orchestrator.add_job("ccx_auto_run:config.json", lambda: CCXManagerNode().auto_run(), depends_on=["create_sdppp_directories"])
+startup_orchestrator.add_job("ccx_auto_run:config_copy.json", lambda: CCXManagerNode(config_filename="config_copy.json").auto_run(), depends_on=["create_sdppp_directories"])
+startup_orchestrator.start()
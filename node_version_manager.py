@@ -1,10 +1,22 @@
 import os
 import sys
 import json
-import subprocess
+import asyncio
 import tempfile
 import shutil
 from datetime import datetime
+from .py.git_runner import run_git, is_git_installed, get_cat_file, is_shallow, ensure_depth, read_head, read_ref_sha, is_safe_ref
+from .py.history_index import CommitHistoryIndex
+
+try:
+    from server import PromptServer
+    from aiohttp import web
+except ImportError:
+    # 脱离ComfyUI运行时不注册路由
+    PromptServer = None
+
+# 进程内共享的提交历史索引
+history_index = CommitHistoryIndex()
 
 class NodeVersionController:
     """节点版本控制器，用于管理节点的版本切换功能"""
@@ -13,15 +25,11 @@ class NodeVersionController:
         self.custom_nodes_path = os.path.join(self.comfyui_path, "custom_nodes")
         
     def is_git_installed(self):
-        """检查Git是否安装"""
-        try:
-            subprocess.run(["git", "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            return True
-        except (subprocess.SubprocessError, FileNotFoundError):
-            return False
+        """检查Git是否安装（进程内只探测一次）"""
+        return is_git_installed()
 
-    def get_node_commit_history(self, node_name, max_count=None):
-        """获取节点的提交历史"""
+    def get_node_commit_history(self, node_name, max_count=None, offset=0, page=None, since=None, until=None, path=None):
+        """获取节点的提交历史（基于按HEAD缓存的历史索引，支持分页和按日期/路径过滤）"""
         try:
             node_path = os.path.join(self.custom_nodes_path, node_name)
             
@@ -33,53 +41,63 @@ class NodeVersionController:
             if not os.path.exists(os.path.join(node_path, ".git")):
                 return False, f"Node is not a Git repository: {node_name}"
             
-            # 获取当前分支
-            branch_result = subprocess.run(
-                ["git", "-C", node_path, "rev-parse", "--abbrev-ref", "HEAD"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            current_branch = branch_result.stdout.strip() if branch_result.returncode == 0 else "(detached HEAD)"
+            # 在进程内读取当前分支
+            _, head_ref = read_head(node_path)
+            current_branch = head_ref[len("refs/heads/"):] if head_ref and head_ref.startswith("refs/heads/") else "(detached HEAD)"
             
             # 获取提交历史
-            log_cmd = ["git", "-C", node_path, "log", "--pretty=format:%h|%an|%ad|%s", "--date=short"]
-            if max_count:
-                log_cmd.extend(["-n", str(max_count)])
-            
-            result = subprocess.run(
-                log_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            result = history_index.query(node_name, node_path, offset=offset, limit=max_count, page=page, since=since, until=until, path=path)
+            return True, {"branch": current_branch, "shallow": is_shallow(node_path), **result}
+        except Exception as e:
+            return False, f"Error getting commit history: {str(e)}"
 
-            if result.returncode != 0:
-                return False, f"Failed to get commit history: {result.stderr}"
+    def offset_base(self, node_path, branch):
+        """版本偏移的基准：最近一次获取到的远程分支，没有时使用本地分支"""
+        remote_ref = f"refs/remotes/origin/{branch}"
+        return remote_ref if read_ref_sha(node_path, remote_ref) else f"refs/heads/{branch}"
 
-            # 解析提交历史
-            commits = []
-            for line in result.stdout.strip().split("\n"):
-                if line:
-                    parts = line.split("|", 3)
-                    if len(parts) >= 4:
-                        commits.append({
-                            "hash": parts[0],
-                            "author": parts[1],
-                            "date": parts[2],
-                            "message": parts[3]
-                        })
+    def resolve_target(self, node_path, branch, version_offset, target_ref=None):
+        """在本地对象中解析目标提交，返回提交信息字典，本地不存在时返回None
 
-            return True, {"branch": current_branch, "commits": commits}
-        except Exception as e:
-            return False, f"Error getting commit history: {str(e)}"
+        偏移量相对于最近一次获取到的远程分支（refs/remotes/origin/<branch>），没有时相对于本地分支；
+        target_ref可以是SHA、标签或分支名
+        """
+        cat_file = get_cat_file(node_path)
+        if target_ref:
+            return cat_file.read_commit(target_ref)
+        base = self.offset_base(node_path, branch)
+        if version_offset == 1:
+            return cat_file.read_commit(base)
+        return cat_file.read_commit(f"{base}~{abs(version_offset)}")
+
+    def fetch_missing(self, node_path, branch, version_offset, target_ref=None):
+        """目标提交不在本地时才访问网络：最新版本需要fetch，浅克隆按需加深，SHA/标签从远程获取"""
+        # 常驻的cat-file进程不会感知浅克隆边界的变化，获取后需要重启
+        cat_file = get_cat_file(node_path)
+        if target_ref:
+            run_git(["fetch", "--tags", "origin"], cwd=node_path)
+            cat_file.close()
+            if cat_file.read_commit(target_ref) is None:
+                # 不在任何分支/标签上的SHA需要单独获取
+                run_git(["fetch", "--end-of-options", "origin", target_ref], cwd=node_path)
+                cat_file.close()
+            return
+        print(f"[NodeVersionController] Fetching latest code from origin/{branch}...")
+        fetch_result = run_git(["fetch", "origin", branch], cwd=node_path)
+        if fetch_result.returncode != 0:
+            print(f"[NodeVersionController] Failed to fetch code: {fetch_result.stderr}")
+        # 浅克隆仓库按需加深历史，保证目标提交在本地可用
+        if version_offset != 1 and not ensure_depth(node_path, abs(version_offset) + 1, self.offset_base(node_path, branch)):
+            print(f"[NodeVersionController] Failed to deepen shallow clone")
+        cat_file.close()
 
-    def switch_node_version(self, node_name, version_offset, auto_add_to_ignore=True):
+    def switch_node_version(self, node_name, version_offset, auto_add_to_ignore=True, target_ref=None):
         """切换节点版本
         
         Args:
             node_name: Node name
             version_offset: Version offset, 1 means latest version, negative numbers mean going back from latest version
+            target_ref: Optional commit SHA, tag or branch to switch to (takes precedence over version_offset)
         """
         try:
             node_path = os.path.join(self.custom_nodes_path, node_name)
@@ -92,146 +110,80 @@ class NodeVersionController:
             if not os.path.exists(os.path.join(node_path, ".git")):
                 return False, f"Node is not a Git repository: {node_name}"
             
-            # 获取当前分支
-            branch_result = subprocess.run(
-                ["git", "-C", node_path, "rev-parse", "--abbrev-ref", "HEAD"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            current_branch = branch_result.stdout.strip() if branch_result.returncode == 0 else "(detached HEAD)"
-            
-            # 如果当前是游离状态，使用默认分支
-            if current_branch == "HEAD" or current_branch == "(detached HEAD)":
-                # 尝试获取默认分支
-                default_branch_result = subprocess.run(
-                    ["git", "-C", node_path, "symbolic-ref", "refs/remotes/origin/HEAD"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
+            target_ref = (target_ref or "").strip() or None
+            if target_ref and not is_safe_ref(target_ref):
+                return False, f"Invalid target ref: {target_ref!r} (must not start with '-' or contain whitespace/control characters)"
+            # 新的版本切换逻辑：
+            # 1表示最新版本，负数表示从最新版本开始后退相应数量的版本
+            if not target_ref and version_offset != 1 and version_offset >= 0:
+                return False, "Error: Version offset can only be 1 (latest) or negative numbers (e.g., -2, -3)"
+
+            # 在进程内读取当前分支
+            _, head_ref = read_head(node_path)
+            if head_ref and head_ref.startswith("refs/heads/"):
+                current_branch = head_ref[len("refs/heads/"):]
+            else:
+                # 如果当前是游离状态，使用默认分支
+                default_branch_result = run_git(["symbolic-ref", "refs/remotes/origin/HEAD"], cwd=node_path)
                 if default_branch_result.returncode == 0:
                     # 从输出如"refs/remotes/origin/main"中提取"main"
                     current_branch = default_branch_result.stdout.strip().split("/")[-1]
                     # 切换到默认分支
-                    subprocess.run(["git", "-C", node_path, "checkout", current_branch], check=False)
+                    run_git(["checkout", current_branch], cwd=node_path)
                 else:
                     # 如果无法获取默认分支，创建一个临时分支
                     current_branch = f"temp_branch_{int(datetime.now().timestamp())}"
-                    subprocess.run(["git", "-C", node_path, "checkout", "-b", current_branch], check=False)
-            
+                    run_git(["checkout", "-b", current_branch], cwd=node_path)
+
+            # 目标提交已在本地时完全离线切换；切换到最新版本总是需要先获取远程
+            target = None if version_offset == 1 and not target_ref else self.resolve_target(node_path, current_branch, version_offset, target_ref)
+            if target is None:
+                self.fetch_missing(node_path, current_branch, version_offset, target_ref)
+                target = self.resolve_target(node_path, current_branch, version_offset, target_ref)
+                if target is None:
+                    return False, f"Failed to resolve target commit: {target_ref or version_offset}"
+
+            if target_ref:
+                print(f"[NodeVersionController] Switching node {node_name} to {target_ref}...")
+            elif version_offset == 1:
+                print(f"[NodeVersionController] Switching node {node_name} to latest version...")
+            else:  # 负数偏移量
+                print(f"[NodeVersionController] Going back {abs(version_offset)} versions from latest")
+
             # 检查是否有未提交的更改
-            status_result = subprocess.run(
-                ["git", "-C", node_path, "status", "--porcelain"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            status_result = run_git(["status", "--porcelain"], cwd=node_path)
             has_stashed_changes = False
             
             # 如果有未提交的更改，暂存它们
             if status_result.stdout.strip():
-                subprocess.run(["git", "-C", node_path, "stash", "push", "-m", "Auto-stash before version switch"], check=False)
+                run_git(["stash", "push", "-m", "Auto-stash before version switch"], cwd=node_path)
                 has_stashed_changes = True
-            
-            # 新的版本切换逻辑：
-            # 1表示最新版本，负数表示从最新版本开始后退相应数量的版本
-            if version_offset != 1 and version_offset >= 0:
-                return False, "Error: Version offset can only be 1 (latest) or negative numbers (e.g., -2, -3)"
-            
-            # 无论选择什么版本，都先拉取最新代码以确保有完整的提交历史
-            print(f"[NodeVersionController] Pulling latest code for node {node_name}...")
-            fetch_result = subprocess.run(
-                ["git", "-C", node_path, "fetch"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            if fetch_result.returncode != 0:
-                print(f"[NodeVersionController] Failed to pull code: {fetch_result.stderr}")
-            
-            # 尝试合并最新代码
-            pull_result = subprocess.run(
-                ["git", "-C", node_path, "pull"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            if pull_result.returncode != 0:
-                print(f"[NodeVersionController] Failed to merge latest code, using local latest commit: {pull_result.stderr}")
-            
-            # 确定目标提交
-            if version_offset == 1:
-                target_commit = "HEAD"
-                print(f"[NodeVersionController] Switching node {node_name} to latest version...")
-            else:  # 负数偏移量
-                target_commit = f"HEAD~{abs(version_offset)}"
-                print(f"[NodeVersionController] Going back {abs(version_offset)} versions from latest")
-            
-            # 创建临时分支指向目标提交
-            temp_branch = f"temp_version_switch_{int(datetime.now().timestamp())}"
-            checkout_result = subprocess.run(
-                ["git", "-C", node_path, "checkout", "-b", temp_branch, target_commit],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            if checkout_result.returncode != 0:
-                # 如果切换失败，恢复stash（如果有）
-                if has_stashed_changes:
-                    subprocess.run(["git", "-C", node_path, "stash", "pop"], check=False)
-                return False, f"Failed to switch to target commit: {checkout_result.stderr}"
-            
-            # 切换回原来的分支
-            subprocess.run(["git", "-C", node_path, "checkout", current_branch], check=False)
-            
-            # 强制将原来的分支重置到临时分支的位置
-            reset_result = subprocess.run(
-                ["git", "-C", node_path, "reset", "--hard", temp_branch],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # 删除临时分支
-            subprocess.run(["git", "-C", node_path, "branch", "-D", temp_branch], check=False)
-            
+
+            # 一次reset即可把当前分支移动到目标提交
+            reset_result = run_git(["reset", "--hard", target["hash"]], cwd=node_path)
             if reset_result.returncode != 0:
                 # 如果重置失败，恢复stash（如果有）
                 if has_stashed_changes:
-                    subprocess.run(["git", "-C", node_path, "stash", "pop"], check=False)
+                    run_git(["stash", "pop"], cwd=node_path)
                 return False, f"Failed to reset branch: {reset_result.stderr}"
             
             # 操作成功后输出日志
-            if version_offset == 1:
+            if target_ref:
+                print(f"[NodeVersionController] Successfully switched node {node_name} to {target_ref}")
+            elif version_offset == 1:
                 print(f"[NodeVersionController] Successfully switched node {node_name} to latest version")
             else:  # 负数偏移量
                 print(f"[NodeVersionController] Successfully went back {abs(version_offset)} versions from latest")
 
-            # 获取切换后的提交信息
-            new_commit_result = subprocess.run(
-                ["git", "-C", node_path, "log", "-1", "--pretty=format:%h|%an|%ad|%s", "--date=short"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            if new_commit_result.returncode != 0:
-                return False, "Failed to get new commit information"
-
-            new_commit_info = new_commit_result.stdout.strip().split("|", 3)
-            if len(new_commit_info) >= 4:
-                new_commit_hash = new_commit_info[0]
-                new_commit_message = new_commit_info[3]
-                new_commit_date = new_commit_info[2]
-            else:
-                return False, "Failed to parse new commit information"
+            # 切换后的提交信息即目标提交
+            new_commit_hash = target["hash"][:7]
+            new_commit_message = target["message"]
+            new_commit_date = target["date"]
 
             # 根据版本偏移量构建更明确的消息
-            if version_offset == 1:
+            if target_ref:
+                message = f"Successfully switched node {node_name} to {target_ref}: {new_commit_hash}\nCommit message: {new_commit_message}\nCommit date: {new_commit_date}\nBranch: {current_branch}\n"
+            elif version_offset == 1:
                 message = f"Successfully switched node {node_name} to latest version: {new_commit_hash}\nCommit message: {new_commit_message}\nCommit date: {new_commit_date}\nBranch: {current_branch}\n"
             else:  # 负数偏移量
                 message = f"Successfully went back {abs(version_offset)} versions to: {new_commit_hash}\nCommit message: {new_commit_message}\nCommit date: {new_commit_date}\nBranch: {current_branch}\n"
@@ -253,6 +205,11 @@ class NodeVersionManager:
                 "version_offset": ("INT", {"default": 1, "min": -99999, "max": 1, "step": 1, "placeholder": "1=Latest version, -2,-3 etc=Go back from latest"}),
                 "show_history": ("BOOLEAN", {"default": False, "label_on": "Show History", "label_off": "Don't Show History"}),
             },
+            "optional": {
+                "target_ref": ("STRING", {"default": "", "multiline": False, "placeholder": "Optional commit SHA or tag (overrides version offset)"}),
+                "history_page": ("INT", {"default": 1, "min": 1, "max": 99999, "step": 1}),
+                "history_page_size": ("INT", {"default": 50, "min": 1, "max": 1000, "step": 1}),
+            },
         }
 
     RETURN_TYPES = ("STRING",)
@@ -260,7 +217,7 @@ class NodeVersionManager:
     FUNCTION = "process"
     CATEGORY = "Update of SD-PPP Plugin"
 
-    def process(self, node_name, version_offset, show_history):
+    def process(self, node_name, version_offset, show_history, target_ref="", history_page=1, history_page_size=50):
         controller = NodeVersionController()
         status_message = ""
 
@@ -274,19 +231,22 @@ class NodeVersionManager:
 
         # 如果请求显示历史
         if show_history:
-            success, result = controller.get_node_commit_history(node_name)
+            success, result = controller.get_node_commit_history(node_name, max_count=history_page_size, page=history_page)
             if success:
                 status_message += f"Commit history for node {node_name} (branch: {result['branch']}):\n"
-                for i, commit in enumerate(result['commits']):
+                if result.get("shallow"):
+                    status_message += "Note: shallow clone, only locally available commits are shown (older versions are fetched on demand when switching)\n"
+                status_message += f"Showing {len(result['commits'])} of {result['total']} commits (page {history_page})\n"
+                for i, commit in enumerate(result['commits'], start=result['offset']):
                     status_message += f"[{i}] {commit['hash'][:7]} | {commit['date']} | {commit['message'][:50]}...\n"
             else:
                 return (f"Failed to get history: {result}",)
         else:
             # 执行版本切换
-            if version_offset == 0:
+            if version_offset == 0 and not target_ref.strip():
                 return ("Error: Version offset cannot be 0",)
             
-            success, message = controller.switch_node_version(node_name, version_offset)
+            success, message = controller.switch_node_version(node_name, version_offset, target_ref=target_ref)
             if success:
                 status_message += message
             else:
@@ -294,6 +254,38 @@ class NodeVersionManager:
 
         return (status_message,)
 
+if PromptServer is not None and getattr(PromptServer, "instance", None) is not None:
+    routes = PromptServer.instance.routes
+
+    @routes.get("/ccx_version/history/{node_name}")
+    async def get_node_history(request):
+        """分页查询节点提交历史，参数：page/offset/limit/since/until/path"""
+        node_name = request.match_info["node_name"]
+        if not node_name or os.path.basename(node_name) != node_name or node_name in (".", ".."):
+            return web.json_response({"status": "error", "message": "无效的节点名称"}, status=400)
+        try:
+            query = request.rel_url.query
+            page = int(query["page"]) if query.get("page") else None
+            offset = int(query.get("offset") or 0)
+            limit = int(query.get("limit") or 50)
+        except ValueError:
+            return web.json_response({"status": "error", "message": "分页参数必须为整数"}, status=400)
+
+        # git命令在线程中执行，不阻塞事件循环
+        success, result = await asyncio.to_thread(
+            NodeVersionController().get_node_commit_history,
+            node_name,
+            max_count=limit,
+            offset=offset,
+            page=page,
+            since=query.get("since") or None,
+            until=query.get("until") or None,
+            path=query.get("path") or None
+        )
+        if not success:
+            return web.json_response({"status": "error", "message": result}, status=404)
+        return web.json_response({"status": "success", **result})
+
 # 节点注册映射
 NODE_CLASS_MAPPINGS = {
     "NodeVersionManager": NodeVersionManager
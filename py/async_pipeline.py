@@ -0,0 +1,254 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+import zipfile
+import aiohttp
+from datetime import datetime
+from urllib.parse import urlparse
+from .http_client import get_http_client
+from .mirror_selector import get_mirror_selector
+
+# 只保留最近结束的若干个任务记录
+MAX_FINISHED_JOBS = 50
+
+
+class AsyncUpdatePipeline:
+    """基于asyncio的更新流水线：在PromptServer的事件循环上调度检查、拉取和CCX下载
+
+    仓库检查和更新复用GitHubRepoUpdater（在线程中执行），CCX下载使用aiohttp；
+    磁盘I/O都放到线程中，不阻塞服务UI和WebSocket的事件循环。
+    任务可从UI取消：下载会立即中止；仓库任务中已开始的git命令会执行完毕，之后的仓库不再处理
+    """
+    def __init__(self, chunk_size=64 * 1024, write_buffer_size=1024 * 1024):
+        self.chunk_size = chunk_size
+        self.write_buffer_size = write_buffer_size
+        self.jobs = {}
+
+    def _start(self, loop, kind, coro_factory):
+        """创建任务记录并把协程调度到指定事件循环（可在其他线程调用）"""
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": "pending",
+            "message": "",
+            "results": {},
+            "created_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "finish_time": None,
+            "loop": loop,
+            "task": None
+        }
+        self.jobs[job_id] = job
+
+        def create_task():
+            job["task"] = loop.create_task(self._run_job(job, coro_factory(job)))
+            # 任务在开始运行前就被取消时，_run_job不会执行，在回调中补记状态
+            job["task"].add_done_callback(lambda task: self._on_task_done(job, task))
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            create_task()
+        else:
+            loop.call_soon_threadsafe(create_task)
+        return job_id
+
+    async def _run_job(self, job, coro):
+        job["status"] = "running"
+        start = time.perf_counter()
+        try:
+            job["message"] = await coro
+            job["status"] = "done"
+        except asyncio.CancelledError:
+            job["status"] = "cancelled"
+            job["message"] = "任务已取消"
+            print(f"[CCXManager Updater] 异步任务已取消: {job['id']}")
+        except Exception as e:
+            job["status"] = "failed"
+            job["message"] = str(e)
+            print(f"[CCXManager Updater] 异步任务失败: {job['id']} {str(e)}")
+        finally:
+            job["elapsed"] = round(time.perf_counter() - start, 3)
+
+    def _on_task_done(self, job, task):
+        """任务结束回调（事件循环线程）：补记开始前就被取消的任务状态，并清理旧的任务记录"""
+        if task.cancelled() and job["status"] == "pending":
+            job.update(status="cancelled", message="任务已取消")
+        job["finish_time"] = time.time()
+        finished = [item for item in list(self.jobs.values()) if item["finish_time"] is not None]
+        finished.sort(key=lambda item: item["finish_time"])
+        for item in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self.jobs.pop(item["id"], None)
+
+    def cancel(self, job_id):
+        """取消任务：下载立即中止，仓库任务在当前git命令结束后停止；返回是否找到可取消的任务"""
+        job = self.jobs.get(job_id)
+        if not job or job["status"] in ("done", "failed", "cancelled"):
+            return False
+        # 在事件循环线程中取消；任务创建同样经由call_soon_threadsafe排队，此时已存在
+        job["loop"].call_soon_threadsafe(lambda: job["task"] and job["task"].cancel())
+        return True
+
+    def get_status(self, job_id=None):
+        """返回任务状态（不含内部的loop/task对象），job_id为空时返回全部任务"""
+        def public(job):
+            return {key: value for key, value in job.items() if key not in ("loop", "task", "finish_time")}
+        if job_id is None:
+            return [public(job) for job in list(self.jobs.values())]
+        job = self.jobs.get(job_id)
+        return public(job) if job else None
+
+    # ---------- 仓库检查与更新 ----------
+
+    def submit_repo_update(self, loop, updater, force_override=False):
+        """提交一次异步检查并更新所有受管仓库的任务，返回任务ID"""
+        return self._start(loop, "repos", lambda job: self._update_all(job, updater, force_override))
+
+    async def _update_all(self, job, updater, force_override):
+        repos = [repo for repo in updater.config["repos"] if repo.get("auto_update", True)]
+        if not repos:
+            return "没有监控的仓库"
+
+        # 主机级并发由更新器的host_slot限制，这里只限制总并发
+        limit = asyncio.Semaphore(max(1, updater.config.get("max_workers", 5)))
+        updater.report = {}
+
+        async def process(repo_info):
+            async with limit:
+                job["results"][repo_info["node_name"]] = {"status": "checking"}
+                result = await self._update_one(updater, repo_info, force_override)
+                job["results"][repo_info["node_name"]] = result
+
+        await asyncio.gather(*(process(repo_info) for repo_info in repos))
+        updated = sum(1 for result in job["results"].values() if result.get("status") == "updated")
+        with updater.config_lock:
+            updater.config["last_check_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        await asyncio.to_thread(updater.save_config)
+        await asyncio.to_thread(updater.save_update_report)
+        return f"检查{len(repos)}个仓库，更新{updated}个"
+
+    async def _update_one(self, updater, repo_info, force_override):
+        """检查单个仓库，有更新时拉取；返回结果字典
+
+        直接复用同步更新器的检查和更新（检查模式、镜像缓存、强制覆盖、更新报告），在线程中执行不阻塞事件循环；
+        线程中的git命令无法从外部终止，任务取消后会运行到结束，但不再进行后续步骤
+        """
+        node_name, has_update, check_result = await asyncio.to_thread(updater.check_repo_with_host_limit, repo_info)
+        updater.report[node_name] = {
+            "node_name": node_name,
+            "repo_url": repo_info["repo_url"],
+            "branch": repo_info["branch"],
+            "has_update": has_update,
+            "check_result": check_result
+        }
+        if not has_update:
+            status = "up_to_date" if isinstance(check_result, str) and "成功" in check_result else "failed"
+            return {"status": status, "message": check_result}
+
+        success, message = await asyncio.to_thread(updater.update_repo_with_host_limit, repo_info, force_override)
+        updater.report[node_name].update({"update_success": success, "update_message": message})
+        if success:
+            print(f"[CCXManager Updater] {node_name}更新成功")
+        return {"status": "updated" if success else "failed", "message": message}
+
+    # ---------- CCX下载 ----------
+
+    def submit_ccx_download(self, loop, manager_node, url):
+        """提交异步下载CCX到缓存的任务，安装时同步流程的条件请求会直接命中缓存"""
+        return self._start(loop, "ccx", lambda job: self._download_ccx(job, manager_node, url))
+
+    async def _download_ccx(self, job, manager_node, url):
+        filename = os.path.basename(urlparse(url).path)
+        if not filename.endswith('.ccx'):
+            raise ValueError("URL不是有效的CCX文件")
+        # 与同步下载分开的临时目录，两者同时运行时互不覆盖
+        temp_dir = os.path.join(manager_node.temp_dir, "async")
+        await asyncio.to_thread(os.makedirs, temp_dir, exist_ok=True)
+        temp_path = os.path.join(temp_dir, filename)
+        expected_sha256 = (manager_node.config.get("expected_sha256") or "").strip().lower() or None
+
+        connect_timeout, read_timeout = get_http_client().timeout
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        # 镜像统计的读写都是磁盘I/O，放到线程中执行
+        selector = await asyncio.to_thread(get_mirror_selector)
+        last_error = None
+        async with aiohttp.ClientSession(timeout=timeout, headers={"User-Agent": "ComfyUI-CCXManager"}) as session:
+            for mirror_url in selector.rank(manager_node.get_mirror_candidates(url)):
+                job["results"]["url"] = mirror_url
+                try:
+                    cached_path = await self._download_mirror(job, session, selector, manager_node.cache, mirror_url, temp_path, expected_sha256)
+                    job["results"]["cached_path"] = cached_path
+                    return f"下载完成: {cached_path}"
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    await asyncio.to_thread(selector.record_failure, mirror_url, e)
+                    last_error = e
+                    print(f"[CCXManager] 镜像下载失败，尝试下一个镜像: {mirror_url} ({str(e)})")
+                finally:
+                    await asyncio.to_thread(self._remove_file, temp_path)
+        raise last_error or ValueError("没有可用的下载地址")
+
+    @staticmethod
+    def _remove_file(path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    async def _download_mirror(self, job, session, selector, cache, url, temp_path, expected_sha256):
+        cached_entry = await asyncio.to_thread(cache.lookup, url)
+        if cached_entry and expected_sha256 and cached_entry["sha256"] != expected_sha256:
+            cached_entry = None
+
+        start = time.perf_counter()
+        async with session.get(url, headers=cache.conditional_headers(cached_entry)) as response:
+            if response.status == 304 and cached_entry:
+                return cache.blob_path(cached_entry["sha256"])
+            response.raise_for_status()
+            total = response.content_length or 0
+            sha256 = hashlib.sha256()
+            size = 0
+            # 文件打开和写入在线程中执行，数据攒到write_buffer_size再写，减少线程切换
+            buffer = bytearray()
+            f = await asyncio.to_thread(open, temp_path, 'wb')
+            try:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    buffer.extend(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    job["results"]["progress"] = {"downloaded": size, "total": total}
+                    if len(buffer) >= self.write_buffer_size:
+                        await asyncio.to_thread(f.write, bytes(buffer))
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(f.write, bytes(buffer))
+            finally:
+                await asyncio.to_thread(f.close)
+            etag = response.headers.get("ETag", "")
+            last_modified = response.headers.get("Last-Modified", "")
+
+        digest = sha256.hexdigest()
+        if total and size != total:
+            raise ValueError(f"下载不完整: {size}/{total}字节")
+        if expected_sha256 and digest != expected_sha256:
+            raise ValueError(f"SHA-256校验失败: {digest}")
+        if not await asyncio.to_thread(zipfile.is_zipfile, temp_path):
+            raise ValueError("下载的文件不是有效的CCX压缩包")
+
+        await asyncio.to_thread(selector.record_success, url, size, time.perf_counter() - start)
+        entry = await asyncio.to_thread(cache.store, url, temp_path, etag, last_modified, digest)
+        return cache.blob_path(entry["sha256"])
+
+
+_shared_pipeline = None
+
+
+def get_async_pipeline():
+    """获取进程内共享的异步更新流水线"""
+    global _shared_pipeline
+    if _shared_pipeline is None:
+        _shared_pipeline = AsyncUpdatePipeline()
+    return _shared_pipeline
@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+_index_lock = threading.Lock()
+
+
+class CCXCache:
+    """按SHA-256内容寻址的CCX缓存，记录每个URL的ETag和Last-Modified用于条件请求"""
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+    def load_index(self):
+        """加载缓存索引"""
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"[CCXManager] 加载缓存索引失败: {str(e)}")
+        return {}
+
+    def save_index(self, index):
+        """保存缓存索引"""
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def blob_path(self, sha256):
+        return os.path.join(self.blob_dir, f"{sha256}.ccx")
+
+    def lookup(self, url):
+        """返回url对应的缓存条目，缓存文件丢失时返回None"""
+        with _index_lock:
+            entry = self.load_index().get(url)
+        if entry and os.path.exists(self.blob_path(entry["sha256"])):
+            return entry
+        return None
+
+    def conditional_headers(self, entry):
+        """根据缓存条目构建If-None-Match/If-Modified-Since请求头"""
+        headers = {}
+        if not entry:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, file_path, etag="", last_modified="", sha256=None):
+        """将下载完成的文件移入缓存，返回缓存条目
+
+        下载时已计算出sha256的可直接传入，避免再读一遍文件
+        """
+        digest = sha256
+        if not digest:
+            hasher = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+        size = os.path.getsize(file_path)
+
+        entry = {
+            "sha256": digest,
+            "size": size,
+            "etag": etag,
+            "last_modified": last_modified,
+            "filename": os.path.basename(file_path),
+            "cached_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        # 移入缓存与更新索引放在同一把锁内，避免并发任务清理时误删刚写入的文件
+        with _index_lock:
+            os.replace(file_path, self.blob_path(digest))
+            index = self.load_index()
+            index[url] = entry
+            self.save_index(index)
+            self._prune(index)
+        return entry
+
+    def _prune(self, index):
+        """删除没有被任何URL引用的缓存文件"""
+        referenced = {f"{entry['sha256']}.ccx" for entry in index.values()}
+        for name in os.listdir(self.blob_dir):
+            if name not in referenced:
+                try:
+                    os.remove(os.path.join(self.blob_dir, name))
+                except OSError:
+                    pass
@@ -0,0 +1,283 @@
+import os
+import json
+import hashlib
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from .http_client import get_http_client
+
+
+class DownloadVerificationError(Exception):
+    """下载内容与期望的大小或SHA-256不一致"""
+    pass
+
+
+class SegmentedDownloader:
+    """断点续传下载器：先写入.part文件，支持Range续传，服务器支持时可分段并行下载"""
+    def __init__(self, segments=4, min_segment_size=1024 * 1024, chunk_size=64 * 1024, max_retries=3, client=None):
+        self.segments = max(1, int(segments))
+        self.min_segment_size = min_segment_size
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        # 共享连接池，分段请求复用同一主机的keep-alive连接
+        self.client = client or get_http_client()
+        self.state_lock = threading.Lock()
+
+    def probe(self, url, headers=None):
+        """探测文件大小、ETag以及服务器是否支持Range请求"""
+        probe_headers = dict(headers or {})
+        probe_headers["Range"] = "bytes=0-0"
+        response = self.client.get(url, headers=probe_headers, stream=True)
+        try:
+            info = {
+                "status_code": response.status_code,
+                "size": None,
+                "accept_ranges": False,
+                "etag": response.headers.get("ETag", ""),
+                "last_modified": response.headers.get("Last-Modified", "")
+            }
+            if response.status_code == 206:
+                # Content-Range: bytes 0-0/12345
+                content_range = response.headers.get("Content-Range", "")
+                total = content_range.rsplit("/", 1)[-1] if "/" in content_range else ""
+                if total.isdigit():
+                    info["size"] = int(total)
+                    info["accept_ranges"] = True
+            elif response.status_code == 200:
+                length = response.headers.get("Content-Length", "")
+                if length.isdigit():
+                    info["size"] = int(length)
+            elif response.status_code != 304:
+                response.raise_for_status()
+            return info
+        finally:
+            response.close()
+
+    def download(self, url, dest_path, headers=None, expected_sha256=None, expected_size=None):
+        """下载url到dest_path，返回包含status/size/sha256/etag/last_modified的结果字典
+
+        status为"ok"表示下载完成，为"not_modified"表示服务器返回304（仅在headers带条件请求时出现）。
+        下载过程中同步计算SHA-256，与expected_sha256/expected_size不一致时删除文件并抛出DownloadVerificationError
+        """
+        part_path = dest_path + ".part"
+        state_path = part_path + ".json"
+        info = self.probe(url, headers)
+
+        if info["status_code"] == 304:
+            return {"status": "not_modified", "size": None, "sha256": None, "etag": info["etag"], "last_modified": info["last_modified"]}
+
+        if expected_size is not None and info["size"] is not None and info["size"] != expected_size:
+            raise DownloadVerificationError(f"远程文件大小{info['size']}与期望的{expected_size}字节不一致")
+
+        # 需要校验SHA-256时使用单连接，边下载边计算，校验失败时不会多读一遍文件；
+        # 分段下载的SHA-256需要把写入的分段按顺序读回来计算（见_download_segmented），只在没有期望哈希时使用
+        use_segments = bool(
+            not expected_sha256
+            and info["accept_ranges"]
+            and info["size"]
+            and self.segments > 1
+            and info["size"] >= self.min_segment_size * 2
+        )
+
+        # 之前的.part与当前远程文件不一致时，丢弃重新下载
+        state = self._load_state(state_path)
+        if state and (state.get("url") != url or state.get("size") != info["size"] or state.get("etag") != info["etag"]):
+            print(f"[CCXManager] 远程文件已变化，丢弃旧的断点数据")
+            self._discard(part_path, state_path)
+            state = None
+        elif state and bool(state.get("segments")) != use_segments:
+            # 分段下载的.part已预分配为完整大小，长度不代表已下载的字节数，不能按单连接续传（反之亦然）
+            print(f"[CCXManager] 下载方式已变化，丢弃旧的断点数据")
+            self._discard(part_path, state_path)
+            state = None
+        elif not state and os.path.exists(part_path):
+            # 没有状态文件的.part来源不明，不能用于续传
+            self._discard(part_path, state_path)
+
+        # 已按顺序计入哈希的前缀，同一次下载内重试时从这里继续，不重读已下载的部分
+        progress = {"sha256": hashlib.sha256(), "offset": 0}
+        last_error = None
+        digest = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                if use_segments:
+                    digest = self._download_segmented(url, part_path, state_path, info, state, progress)
+                else:
+                    digest = self._download_single(url, part_path, state_path, info, progress)
+                last_error = None
+                break
+            except (requests.RequestException, IOError) as e:
+                last_error = e
+                state = self._load_state(state_path)
+                print(f"[CCXManager] 下载中断({attempt + 1}/{self.max_retries + 1})，将从断点继续: {str(e)}")
+
+        if last_error is not None:
+            raise last_error
+
+        size = os.path.getsize(part_path)
+        if info["size"] is not None and size != info["size"]:
+            raise IOError(f"下载大小不一致: 期望{info['size']}字节，实际{size}字节")
+
+        # 校验失败的内容不能用于续传，直接丢弃
+        if expected_size is not None and size != expected_size:
+            self._discard(part_path, state_path)
+            raise DownloadVerificationError(f"下载大小{size}与期望的{expected_size}字节不一致")
+        if expected_sha256 and digest != expected_sha256.lower():
+            self._discard(part_path, state_path)
+            raise DownloadVerificationError(f"SHA-256校验失败: 期望{expected_sha256}，实际{digest}")
+
+        os.replace(part_path, dest_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        return {"status": "ok", "size": size, "sha256": digest, "etag": info["etag"], "last_modified": info["last_modified"]}
+
+    def _download_single(self, url, part_path, state_path, info, progress):
+        """单连接下载，已有.part时通过Range续传，返回边下载边计算的SHA-256"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if info["size"] is not None and offset >= info["size"]:
+            return self._hash_prefix(part_path, progress, offset)
+
+        self._save_state(state_path, {"url": url, "size": info["size"], "etag": info["etag"], "segments": None})
+
+        request_headers = {}
+        if offset and info["accept_ranges"]:
+            request_headers["Range"] = f"bytes={offset}-"
+            print(f"[CCXManager] 从{offset}字节处续传")
+        response = self.client.get(url, headers=request_headers, stream=True)
+        try:
+            response.raise_for_status()
+            # 服务器忽略Range时只能从头开始
+            if response.status_code == 206:
+                # 续传时只补算尚未计入哈希的已下载部分（上次运行留下的.part）
+                self._hash_prefix(part_path, progress, offset)
+                mode = "ab"
+            else:
+                self._reset_progress(progress)
+                mode = "wb"
+            sha256 = progress["sha256"]
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        sha256.update(chunk)
+                        progress["offset"] += len(chunk)
+            return sha256.hexdigest()
+        finally:
+            response.close()
+
+    def _download_segmented(self, url, part_path, state_path, info, state, progress):
+        """按字节范围分段并行下载，每段的进度记录在状态文件中以便续传
+
+        各分段乱序写入，无法边下载边计算哈希：分段按顺序完成后从.part读回并计入哈希（与后续分段的下载重叠），
+        返回整个文件的SHA-256。读回刚写入的数据通常命中系统页缓存，以多一次顺序读换取多连接并行下载的吞吐
+        """
+        size = info["size"]
+        if not state or not state.get("segments"):
+            segment_count = min(self.segments, max(1, size // self.min_segment_size))
+            segment_size = size // segment_count
+            segments = []
+            for i in range(segment_count):
+                start = i * segment_size
+                end = size - 1 if i == segment_count - 1 else start + segment_size - 1
+                # [起始, 结束, 已完成字节数]
+                segments.append([start, end, 0])
+            state = {"url": url, "size": size, "etag": info["etag"], "segments": segments}
+            # 预分配文件，各线程按偏移写入
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+            self._reset_progress(progress)
+        elif not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+            for segment in state["segments"]:
+                segment[2] = 0
+            self._reset_progress(progress)
+
+        self._save_state(state_path, state)
+        pending = [segment for segment in state["segments"] if segment[0] + segment[2] <= segment[1]]
+        print(f"[CCXManager] 分段下载: 共{len(state['segments'])}段，剩余{len(pending)}段")
+
+        with ThreadPoolExecutor(max_workers=len(pending) or 1) as executor:
+            futures = {id(segment): executor.submit(self._fetch_segment, url, part_path, state_path, state, segment) for segment in pending}
+            errors = []
+            for segment in state["segments"]:
+                future = futures.get(id(segment))
+                if future is not None:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append(e)
+                # 前面的分段都已完整时才能继续累加哈希
+                if not errors:
+                    self._hash_prefix(part_path, progress, segment[1] + 1)
+        self._save_state(state_path, state)
+        if errors:
+            raise errors[0]
+        return progress["sha256"].hexdigest()
+
+    def _fetch_segment(self, url, part_path, state_path, state, segment):
+        """下载单个分段"""
+        start, end, done = segment
+        response = self.client.get(url, headers={"Range": f"bytes={start + done}-{end}"}, stream=True)
+        try:
+            if response.status_code != 206:
+                response.raise_for_status()
+                raise IOError(f"服务器未按Range返回分段数据: HTTP {response.status_code}")
+            unsaved = 0
+            with open(part_path, "r+b") as f:
+                f.seek(start + done)
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    segment[2] += len(chunk)
+                    unsaved += len(chunk)
+                    # 每写入约1MB持久化一次进度
+                    if unsaved >= 1024 * 1024:
+                        f.flush()
+                        self._save_state(state_path, state)
+                        unsaved = 0
+            if start + segment[2] <= end:
+                raise IOError(f"分段 {start}-{end} 未下载完整")
+        finally:
+            response.close()
+
+    def _hash_prefix(self, path, progress, end):
+        """把文件中[已计入偏移, end)的部分累加进progress的哈希，返回当前的SHA-256"""
+        if progress["offset"] > end:
+            self._reset_progress(progress)
+        with open(path, 'rb') as f:
+            f.seek(progress["offset"])
+            while progress["offset"] < end:
+                chunk = f.read(min(1024 * 1024, end - progress["offset"]))
+                if not chunk:
+                    break
+                progress["sha256"].update(chunk)
+                progress["offset"] += len(chunk)
+        return progress["sha256"].hexdigest()
+
+    @staticmethod
+    def _reset_progress(progress):
+        progress["sha256"] = hashlib.sha256()
+        progress["offset"] = 0
+
+    def _load_state(self, state_path):
+        try:
+            if os.path.exists(state_path):
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception:
+            pass
+        return None
+
+    def _save_state(self, state_path, state):
+        with self.state_lock:
+            tmp_path = state_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, state_path)
+
+    def _discard(self, part_path, state_path):
+        for path in (part_path, state_path):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,156 @@
+import os
+import json
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DifferentialInstaller:
+    """差异安装器：对比zip中央目录（文件名、大小、CRC32）与上次安装清单，只写入变化的成员"""
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+
+    def load_manifest(self):
+        """加载上次安装的清单"""
+        try:
+            if os.path.exists(self.manifest_path):
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"[CCXManager] 加载安装清单失败: {str(e)}")
+        return None
+
+    def save_manifest(self, target_path, members):
+        """保存本次安装的清单"""
+        manifest = {
+            "target_path": os.path.normpath(target_path),
+            "members": members
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def discard_manifest(self):
+        """删除清单，下次安装将执行完整安装"""
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+    def read_members(self, zip_path):
+        """读取zip中央目录中的文件成员信息（不解压）"""
+        members = {}
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                if info.is_dir():
+                    continue
+                members[info.filename] = {"size": info.file_size, "crc": info.CRC}
+        return members
+
+    def plan(self, zip_path, target_path):
+        """生成安装计划
+
+        返回字典: full表示需要完整安装，write为需要写入的成员，remove为需要删除的成员，
+        unchanged为未变化的成员数量，members为新的清单内容
+        """
+        members = self.read_members(zip_path)
+        manifest = self.load_manifest()
+
+        # 没有清单或目标路径变化时，只能完整安装
+        if not manifest or manifest.get("target_path") != os.path.normpath(target_path):
+            return {"full": True, "write": list(members), "remove": [], "unchanged": 0, "members": members}
+
+        old_members = manifest.get("members", {})
+        write = []
+        unchanged = 0
+        for name, info in members.items():
+            old_info = old_members.get(name)
+            member_path = self._member_path(target_path, name)
+            # 清单一致但磁盘上的文件丢失或大小不符时同样重新写入
+            if (old_info != info
+                    or member_path is None
+                    or not os.path.isfile(member_path)
+                    or os.path.getsize(member_path) != info["size"]):
+                write.append(name)
+            else:
+                unchanged += 1
+
+        remove = [name for name in old_members if name not in members]
+        return {"full": False, "write": write, "remove": remove, "unchanged": unchanged, "members": members}
+
+    def remove_members(self, target_path, names):
+        """删除新版本中已不存在的成员，并清理随之变空的目录"""
+        removed = 0
+        # 与_member_path一致使用绝对路径，只清理目标目录内部的空目录
+        target_root = os.path.normpath(os.path.abspath(target_path))
+        for name in names:
+            member_path = self._member_path(target_path, name)
+            if member_path is None:
+                continue
+            try:
+                if os.path.isfile(member_path) or os.path.islink(member_path):
+                    os.unlink(member_path)
+                    removed += 1
+                parent = os.path.dirname(member_path)
+                while parent.startswith(target_root + os.sep) and os.path.isdir(parent) and not os.listdir(parent):
+                    os.rmdir(parent)
+                    parent = os.path.dirname(parent)
+            except Exception as e:
+                print(f"[CCXManager] 警告: 无法删除{member_path}: {str(e)}")
+        return removed
+
+    def _member_path(self, target_path, name):
+        """将zip成员名映射为目标路径下的文件路径，越界的路径返回None"""
+        target_root = os.path.normpath(os.path.abspath(target_path))
+        member_path = os.path.normpath(os.path.join(target_root, *name.split('/')))
+        if not member_path.startswith(target_root + os.sep):
+            return None
+        return member_path
+
+
+def parallel_extract(zip_path, target_path, members=None, max_workers=4):
+    """多线程解压：每个线程持有独立的ZipFile句柄，zlib解压时会释放GIL
+
+    members为None时解压全部成员，返回写入的成员数量
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        infos = zip_ref.infolist()
+    if members is not None:
+        wanted = set(members)
+        infos = [info for info in infos if info.filename in wanted]
+    if not infos:
+        return 0
+
+    # 先在主线程创建所有目录，避免多个线程同时创建同一目录时出错
+    files = []
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for info in infos:
+            if info.is_dir():
+                zip_ref.extract(info, target_path)
+                continue
+            files.append(info)
+            parent = os.path.dirname(os.path.normpath(os.path.join(target_path, *info.filename.split('/'))))
+            if os.path.normpath(os.path.abspath(parent)).startswith(os.path.normpath(os.path.abspath(target_path))):
+                os.makedirs(parent, exist_ok=True)
+
+    # 大文件优先，尽量让各线程的负载均衡
+    files.sort(key=lambda info: info.file_size, reverse=True)
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def extract(info):
+        zip_handle = getattr(local, "zip_ref", None)
+        if zip_handle is None:
+            zip_handle = zipfile.ZipFile(zip_path, 'r')
+            local.zip_ref = zip_handle
+            with handles_lock:
+                handles.append(zip_handle)
+        zip_handle.extract(info, target_path)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as executor:
+            list(executor.map(extract, files))
+    finally:
+        for zip_handle in handles:
+            zip_handle.close()
+    return len(infos)
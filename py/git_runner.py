@@ -0,0 +1,273 @@
+import os
+import time
+import atexit
+import threading
+import subprocess
+
+# 本地命令与网络命令的默认超时（秒）；大仓库经慢速代理克隆可能需要很久，网络命令的上限要足够宽松
+LOCAL_TIMEOUT = 30
+NETWORK_TIMEOUT = 3600
+NETWORK_COMMANDS = {"clone", "fetch", "pull", "push", "ls-remote"}
+
+_git_installed = None
+_probe_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def is_git_installed():
+    """检查Git是否安装，结果在进程生命周期内缓存"""
+    global _git_installed
+    with _probe_lock:
+        if _git_installed is None:
+            try:
+                subprocess.run(["git", "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, timeout=LOCAL_TIMEOUT)
+                _git_installed = True
+            except (subprocess.SubprocessError, FileNotFoundError):
+                _git_installed = False
+        return _git_installed
+
+
+def set_network_timeout(seconds):
+    """设置网络命令（clone/fetch/pull等）的默认超时，小于等于0表示不限时"""
+    global NETWORK_TIMEOUT
+    NETWORK_TIMEOUT = seconds if seconds and seconds > 0 else None
+
+
+def _record(command, elapsed_ms, failed):
+    with _stats_lock:
+        entry = _stats.setdefault(command, {"count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        if failed:
+            entry["failures"] += 1
+
+
+def get_git_stats():
+    """返回各git子命令的调用次数、失败次数和耗时统计"""
+    with _stats_lock:
+        return {
+            command: {**entry, "avg_ms": entry["total_ms"] / entry["count"] if entry["count"] else 0.0}
+            for command, entry in _stats.items()
+        }
+
+
+def run_git(args, cwd=None, timeout=None, env=None):
+    """执行git命令并记录耗时，返回subprocess.CompletedProcess
+
+    cwd对应git -C，timeout默认按命令类型区分本地/网络；超时时返回码为124
+    """
+    command = args[0] if args else ""
+    if timeout is None:
+        timeout = NETWORK_TIMEOUT if command in NETWORK_COMMANDS else LOCAL_TIMEOUT
+    cmd = ["git"] + (["-C", cwd] if cwd else []) + list(args)
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=timeout,
+            env=env
+        )
+    except subprocess.TimeoutExpired as e:
+        result = subprocess.CompletedProcess(cmd, 124, e.stdout or "", f"git {command} 超时({timeout}秒)")
+    except FileNotFoundError:
+        result = subprocess.CompletedProcess(cmd, 127, "", "未安装Git")
+    _record(command, (time.perf_counter() - start) * 1000, result.returncode != 0)
+    return result
+
+
+def is_safe_ref(ref):
+    """检查用户输入的引用（SHA/标签/分支名）能否安全传给git：不能以-开头（会被当作选项），不能含空白或控制字符"""
+    return bool(ref) and not ref.startswith("-") and not any(ch.isspace() or ord(ch) < 32 or ord(ch) == 127 for ch in ref)
+
+
+def _git_dir(repo_path):
+    """返回仓库的.git目录，兼容worktree/子模块使用的"gitdir: ..."文件"""
+    git_path = os.path.join(repo_path, ".git")
+    if os.path.isfile(git_path):
+        with open(git_path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        if content.startswith("gitdir:"):
+            git_path = os.path.normpath(os.path.join(repo_path, content[7:].strip()))
+    return git_path
+
+
+def _common_dir(git_dir):
+    """worktree的refs存放在commondir指向的主仓库目录中"""
+    commondir_path = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_path):
+        with open(commondir_path, 'r', encoding='utf-8') as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    return git_dir
+
+
+def read_ref_sha(repo_path, ref):
+    """在进程内读取引用（如refs/heads/main）指向的SHA，依次查找松散引用和packed-refs，找不到时返回None"""
+    git_dir = _git_dir(repo_path)
+    for base_dir in (git_dir, _common_dir(git_dir)):
+        ref_path = os.path.join(base_dir, *ref.split("/"))
+        if os.path.isfile(ref_path):
+            with open(ref_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            if content.startswith("ref:"):
+                return read_ref_sha(repo_path, content[4:].strip())
+            return content or None
+
+    packed_refs_path = os.path.join(_common_dir(git_dir), "packed-refs")
+    if os.path.isfile(packed_refs_path):
+        with open(packed_refs_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # 跳过注释和"^sha"（附注标签指向的提交）行
+                if line.startswith(("#", "^")):
+                    continue
+                parts = line.split()
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    return None
+
+
+def read_head(repo_path):
+    """在进程内读取HEAD，返回 (SHA, 当前分支引用)；游离HEAD时分支为None，读取失败时返回 (None, None)"""
+    try:
+        with open(os.path.join(_git_dir(repo_path), "HEAD"), 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        if content.startswith("ref:"):
+            ref = content[4:].strip()
+            return read_ref_sha(repo_path, ref), ref
+        return content or None, None
+    except OSError:
+        return None, None
+
+
+def is_shallow(repo_path):
+    """判断是否为浅克隆仓库（存在.git/shallow文件）"""
+    return os.path.isfile(os.path.join(_common_dir(_git_dir(repo_path)), "shallow"))
+
+
+def ensure_depth(repo_path, commits, rev="HEAD"):
+    """浅克隆仓库中rev可达的提交不足commits个时按需加深历史，返回是否成功"""
+    if not is_shallow(repo_path):
+        return True
+    count_result = run_git(["rev-list", "--count", rev], cwd=repo_path)
+    available = int(count_result.stdout.strip() or 0) if count_result.returncode == 0 else 0
+    if available >= commits:
+        return True
+    print(f"[CCXManager] 浅克隆仓库历史不足，正在加深{commits - available}个提交: {repo_path}")
+    return run_git(["fetch", f"--deepen={commits - available}"], cwd=repo_path).returncode == 0
+
+
+def read_remote_url(repo_path, remote="origin"):
+    """在进程内从.git/config读取远程仓库地址，找不到时返回None"""
+    config_path = os.path.join(_common_dir(_git_dir(repo_path)), "config")
+    section = f'[remote "{remote}"]'
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            in_section = False
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    in_section = line == section
+                elif in_section and line.startswith("url"):
+                    key, _, value = line.partition("=")
+                    if key.strip() == "url":
+                        return value.strip()
+    except OSError:
+        pass
+    return None
+
+
+class GitCatFileBatch:
+    """常驻的git cat-file --batch进程，批量读取对象，避免每次查询都fork一个git进程"""
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.lock = threading.Lock()
+        self.process = None
+
+    def _ensure_process(self):
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(
+                ["git", "-C", self.repo_path, "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+
+    def read(self, rev):
+        """读取对象，返回 (sha, 类型, 内容bytes)，对象不存在时返回None"""
+        # 换行会破坏batch协议的请求/响应对应关系
+        if "\n" in rev or "\r" in rev:
+            return None
+        with self.lock:
+            start = time.perf_counter()
+            self._ensure_process()
+            self.process.stdin.write(rev.encode("utf-8") + b"\n")
+            self.process.stdin.flush()
+            header = self.process.stdout.readline().decode("utf-8", errors="replace").rstrip("\n")
+            # "<rev> missing" / "<rev> ambiguous" 中的rev可能含空格，先按后缀判断
+            parts = header.rsplit(" ", 2)
+            if header.endswith((" missing", " ambiguous")) or len(parts) != 3 or not parts[2].isdigit():
+                _record("cat-file", (time.perf_counter() - start) * 1000, True)
+                return None
+            sha, obj_type, size = parts[0], parts[1], int(parts[2])
+            data = self.process.stdout.read(size)
+            self.process.stdout.read(1)  # 对象内容后的换行
+            _record("cat-file", (time.perf_counter() - start) * 1000, False)
+            return sha, obj_type, data
+
+    def read_commit(self, rev):
+        """读取并解析commit对象，返回包含hash/author/date/message/parents的字典，不存在时返回None"""
+        obj = self.read(f"{rev}^{{commit}}")
+        if obj is None:
+            return None
+        sha, _, data = obj
+        header, _, message = data.decode("utf-8", errors="replace").partition("\n\n")
+        commit = {"hash": sha, "author": "", "timestamp": 0, "date": "", "message": message.strip().split("\n", 1)[0], "parents": []}
+        for line in header.split("\n"):
+            if line.startswith("parent "):
+                commit["parents"].append(line[7:])
+            elif line.startswith("author "):
+                # author Name <email> 1700000000 +0800
+                name_part, _, time_part = line[7:].rpartition("> ")
+                commit["author"] = name_part.split(" <")[0]
+                timestamp = time_part.split()[0] if time_part else "0"
+                commit["timestamp"] = int(timestamp) if timestamp.isdigit() else 0
+                commit["date"] = time.strftime("%Y-%m-%d", time.localtime(commit["timestamp"]))
+        return commit
+
+    def close(self):
+        with self.lock:
+            if self.process is not None:
+                try:
+                    self.process.stdin.close()
+                    self.process.wait(timeout=5)
+                except Exception:
+                    self.process.kill()
+                self.process = None
+
+
+_batch_processes = {}
+_batch_lock = threading.Lock()
+
+
+def get_cat_file(repo_path):
+    """获取仓库对应的常驻cat-file进程（按路径复用）"""
+    key = os.path.normcase(os.path.abspath(repo_path))
+    with _batch_lock:
+        batch = _batch_processes.get(key)
+        if batch is None:
+            batch = GitCatFileBatch(repo_path)
+            _batch_processes[key] = batch
+        return batch
+
+
+@atexit.register
+def close_all_cat_files():
+    """进程退出时关闭所有常驻cat-file进程"""
+    with _batch_lock:
+        for batch in _batch_processes.values():
+            batch.close()
+        _batch_processes.clear()
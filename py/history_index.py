@@ -0,0 +1,204 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from .git_runner import run_git, read_head
+
+DEFAULT_HISTORY_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "history_cache")
+
+# git log字段分隔符，提交说明中不会出现
+FIELD_SEPARATOR = "\x1f"
+LOG_FORMAT = "%H%x1f%h%x1f%an%x1f%ad%x1f%at%x1f%s"
+
+
+def _parse_log(output):
+    commits = []
+    for line in output.split("\n"):
+        parts = line.split(FIELD_SEPARATOR)
+        if len(parts) == 6:
+            commits.append({
+                "hash": parts[0],
+                "short_hash": parts[1],
+                "author": parts[2],
+                "date": parts[3],
+                "timestamp": int(parts[4]) if parts[4].isdigit() else 0,
+                "message": parts[5]
+            })
+    return commits
+
+
+class CommitHistoryIndex:
+    """按节点缓存的提交历史索引
+
+    每个节点只保存一份提交列表（最近使用的HEAD所在的那条历史线），每个HEAD只记录其历史在列表中的起始位置：
+    HEAD前进时只读取新增的提交（git log old..new）并拼接到列表前面，回退到列表中的旧提交时直接切片，
+    都不需要重新遍历整个历史；查询支持分页和按日期/路径过滤。
+    每个节点的缓存文件只在首次访问时加载到内存，之后只在新增HEAD或路径条目时写回；
+    git命令只在节点自己的锁内执行，查询不同节点互不阻塞
+    """
+    def __init__(self, cache_dir=DEFAULT_HISTORY_CACHE_DIR, max_heads=5):
+        self.cache_dir = cache_dir
+        self.max_heads = max_heads
+        self.nodes = {}
+        self.lock = threading.Lock()
+
+    def _cache_path(self, node_name):
+        return os.path.join(self.cache_dir, f"{node_name}.json")
+
+    def _load(self, node_name):
+        """读取缓存文件，返回 (提交列表, HEAD -> {"start", "paths"})；旧格式或读取失败时返回空缓存"""
+        try:
+            cache_path = self._cache_path(node_name)
+            if os.path.exists(cache_path):
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data.get("commits"), list) and isinstance(data.get("heads"), dict):
+                    return data["commits"], OrderedDict(data["heads"])
+        except Exception as e:
+            print(f"[NodeVersionController] 加载历史缓存失败: {str(e)}")
+        return [], OrderedDict()
+
+    def _state(self, node_name):
+        """返回节点的缓存状态，首次访问时从磁盘加载；之后读写都在节点自己的锁内进行"""
+        with self.lock:
+            state = self.nodes.get(node_name)
+            if state is None:
+                commits, heads = self._load(node_name)
+                state = self.nodes[node_name] = {"lock": threading.Lock(), "commits": commits, "heads": heads, "positions": None}
+            return state
+
+    def _save(self, node_name, state):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_path = self._cache_path(node_name)
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"commits": state["commits"], "heads": state["heads"]}, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"[NodeVersionController] 保存历史缓存失败: {str(e)}")
+
+    def _positions(self, state):
+        """提交SHA -> 在提交列表中的位置，列表变化后重新建立"""
+        if state["positions"] is None:
+            state["positions"] = {commit["hash"]: index for index, commit in enumerate(state["commits"])}
+        return state["positions"]
+
+    def _replace(self, state, head, prefix, keep_from):
+        """新HEAD的历史为 prefix + commits[keep_from:]，据此重建列表
+
+        起始位置在keep_from之后的HEAD仍在新列表上，调整位置后保留；其余HEAD不在新的历史线上，丢弃
+        """
+        heads = OrderedDict()
+        for cached_head, info in state["heads"].items():
+            if info["start"] >= keep_from:
+                heads[cached_head] = dict(info, start=info["start"] - keep_from + len(prefix))
+        heads[head] = {"start": 0, "paths": {}}
+        state["commits"] = prefix + state["commits"][keep_from:]
+        state["heads"] = heads
+        state["positions"] = None
+
+    def _build(self, node_path, head, state):
+        """为新的HEAD建立索引（调用方持有节点锁）
+
+        HEAD已在提交列表中（回退到旧版本）时直接切片，只用rev-list --count确认切片就是它的完整历史；
+        否则以已缓存的祖先HEAD为基础增量读取，没有可用祖先时完整读取
+        """
+        position = self._positions(state).get(head)
+        if position is not None:
+            # 有合并提交时按日期排序的列表中可能夹有其他分支的提交，数量不一致时不能切片
+            result = run_git(["rev-list", "--count", head], cwd=node_path)
+            if result.returncode == 0 and result.stdout.strip() == str(len(state["commits"]) - position):
+                state["heads"][head] = {"start": position, "paths": {}}
+                return
+
+        for cached_head in reversed(state["heads"]):
+            if run_git(["merge-base", "--is-ancestor", cached_head, head], cwd=node_path).returncode == 0:
+                result = run_git(["log", f"--pretty=format:{LOG_FORMAT}", "--date=short", f"{cached_head}..{head}"], cwd=node_path)
+                if result.returncode == 0:
+                    self._replace(state, head, _parse_log(result.stdout), state["heads"][cached_head]["start"])
+                    return
+                break
+
+        result = run_git(["log", f"--pretty=format:{LOG_FORMAT}", "--date=short", head], cwd=node_path)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or "git log失败")
+        self._replace(state, head, _parse_log(result.stdout), len(state["commits"]))
+
+    def _evict(self, state):
+        """只保留最近使用的几个HEAD，并去掉列表中已不属于任何HEAD历史的前部"""
+        while len(state["heads"]) > self.max_heads:
+            state["heads"].popitem(last=False)
+        keep_from = min(info["start"] for info in state["heads"].values())
+        if keep_from:
+            for info in state["heads"].values():
+                info["start"] -= keep_from
+            state["commits"] = state["commits"][keep_from:]
+            state["positions"] = None
+
+    def _lookup(self, node_name, node_path):
+        """返回 (HEAD SHA, 提交列表, HEAD历史在列表中的起始位置)，HEAD未变化时直接读缓存
+
+        提交列表只会整体替换、不会原地修改，返回后可以在锁外读取
+        """
+        head, _ = read_head(node_path)
+        if not head:
+            raise RuntimeError("读取HEAD失败")
+        state = self._state(node_name)
+        with state["lock"]:
+            if head in state["heads"]:
+                # 命中只调整内存中的使用顺序，下次写回时一并保存
+                state["heads"].move_to_end(head)
+            else:
+                self._build(node_path, head, state)
+                self._evict(state)
+                self._save(node_name, state)
+            return head, state["commits"], state["heads"][head]["start"]
+
+    def get_commits(self, node_name, node_path):
+        """返回 (HEAD SHA, 提交列表)"""
+        head, commits, start = self._lookup(node_name, node_path)
+        return head, commits[start:]
+
+    def _path_hashes(self, node_name, node_path, head, path):
+        """返回修改过指定路径的提交SHA集合（按HEAD缓存）"""
+        state = self._state(node_name)
+        with state["lock"]:
+            cached = state["heads"].get(head, {}).get("paths", {}).get(path)
+            if cached is not None:
+                return set(cached)
+            result = run_git(["log", "--pretty=format:%H", head, "--", path], cwd=node_path)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or "git log失败")
+            hashes = [line for line in result.stdout.split("\n") if line]
+            if head in state["heads"]:
+                state["heads"][head].setdefault("paths", {})[path] = hashes
+                self._save(node_name, state)
+            return set(hashes)
+
+    def query(self, node_name, node_path, offset=0, limit=None, page=None, since=None, until=None, path=None):
+        """分页查询提交历史
+
+        since/until为YYYY-MM-DD格式的日期（含边界），path只返回修改过该路径的提交；
+        page从1开始，指定时覆盖offset
+        """
+        head, commits, start = self._lookup(node_name, node_path)
+        if page and limit:
+            offset = (max(1, page) - 1) * limit
+        offset = max(0, offset or 0)
+        if not (since or until or path):
+            # 不过滤时只切出请求的一页，不复制整个历史
+            end = start + offset + limit if limit else len(commits)
+            return {"head": head, "total": len(commits) - start, "offset": offset, "limit": limit, "commits": commits[start + offset:end]}
+
+        commits = commits[start:]
+        if since:
+            commits = [commit for commit in commits if commit["date"] >= since]
+        if until:
+            commits = [commit for commit in commits if commit["date"] <= until]
+        if path:
+            hashes = self._path_hashes(node_name, node_path, head, path)
+            commits = [commit for commit in commits if commit["hash"] in hashes]
+
+        selected = commits[offset:offset + limit] if limit else commits[offset:]
+        return {"head": head, "total": len(commits), "offset": offset, "limit": limit, "commits": selected}
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "http_config.json")
+
+# 遇到这些状态码时按退避策略重试
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class HTTPClient:
+    """包内共享的HTTP客户端：连接池复用keep-alive连接，按主机限制连接数，带指数退避和抖动的重试"""
+    def __init__(self, config_path=HTTP_CONFIG_PATH):
+        self.config_path = config_path
+        self.config = self.load_config()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config.get("pool_connections", 10),
+            pool_maxsize=self.config.get("max_connections_per_host", 8),
+            pool_block=True,
+            max_retries=0
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = "ComfyUI-CCXManager"
+
+    def load_config(self):
+        """加载HTTP配置文件，如果不存在则创建默认配置"""
+        default_config = {
+            "connect_timeout": 10,
+            "read_timeout": 30,
+            "max_retries": 3,
+            "backoff_base": 0.5,
+            "backoff_max": 8,
+            "pool_connections": 10,
+            "max_connections_per_host": 8
+        }
+        try:
+            if os.path.exists(self.config_path):
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    return {**default_config, **json.load(f)}
+            else:
+                with open(self.config_path, 'w', encoding='utf-8') as f:
+                    json.dump(default_config, f, indent=4, ensure_ascii=False)
+                return default_config
+        except Exception as e:
+            print(f"[CCXManager] 加载HTTP配置失败: {str(e)}")
+            return default_config
+
+    @property
+    def timeout(self):
+        """默认超时（连接超时, 读取超时）"""
+        return (self.config.get("connect_timeout", 10), self.config.get("read_timeout", 30))
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """第attempt次重试前的等待时间：指数退避加全抖动，服务器给出Retry-After时优先使用"""
+        if retry_after is not None:
+            return min(retry_after, self.config.get("backoff_max", 8))
+        cap = min(self.config.get("backoff_max", 8), self.config.get("backoff_base", 0.5) * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def request(self, method, url, max_retries=None, **kwargs):
+        """发送请求，连接失败、超时和可重试的状态码会自动重试
+
+        stream=True时只重试建立连接阶段，响应体读取中断需要调用方自行续传
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if max_retries is None:
+            max_retries = self.config.get("max_retries", 3)
+
+        for attempt in range(max_retries + 1):
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"[CCXManager] 请求失败，{delay:.1f}秒后重试({attempt + 1}/{max_retries}): {url} {str(e)}")
+                time.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+                retry_after = response.headers.get("Retry-After", "")
+                delay = self.backoff_delay(attempt, int(retry_after) if retry_after.isdigit() else None)
+                response.close()
+                print(f"[CCXManager] 服务器返回{response.status_code}，{delay:.1f}秒后重试({attempt + 1}/{max_retries}): {url}")
+                time.sleep(delay)
+                continue
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """获取包内共享的HTTP客户端实例"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = HTTPClient()
+        return _shared_client
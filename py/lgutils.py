@@ -5,76 +5,78 @@ import threading
 import time
 import uuid
 import asyncio
-import random
 import re
+from collections import deque
 from aiohttp import web
+from .prompt_graph import SubgraphPlanCache, ValidationCache, hash_prompt, structural_hash
 import execution
 import nodes
 
 CATEGORY_TYPE = "Update of SD-PPP Plugin"
 
+# 后台提交的 prompt 使用的 client_id：ComfyUI 只在 prompt 带有 client_id 时才通过 send_sync 发送
+# execution_success/execution_error 等事件，该 id 没有对应的 WebSocket，消息会被直接丢弃
+BACKEND_CLIENT_ID = "ccx_group_executor_backend"
+
+# 表示 prompt 执行结束的事件（executing 且 node 为 None 也表示结束）
+PROMPT_FINISH_EVENTS = ("execution_success", "execution_error", "execution_interrupted")
+
+# 事件丢失时的兜底检查间隔（秒），只做一次历史记录字典查找
+COMPLETION_FALLBACK_INTERVAL = 30.0
+
+# 重复提交处理策略：off 全部提交；skip 跳过与上一次成功完成的提交完全相同的 prompt；
+# collapse 另外把与仍在队列中的相同 prompt 合并为一次执行
+DUPLICATE_POLICIES = ("off", "skip", "collapse")
+
+# 保留的已结束任务记录数
+MAX_FINISHED_JOBS = 50
+
+# 任务状态中不对外返回的内部字段
+JOB_PRIVATE_KEYS = ("thread", "pause_event", "wake_event", "execution_list", "full_api_prompt")
+
 # ============ 后台执行辅助函数 ============
 
-def recursive_add_nodes(node_id, old_output, new_output):
-    """从输出节点递归收集所有依赖节点（与前端 queueManager.recursiveAddNodes 逻辑完全一致）"""
-    current_id = str(node_id)
-    current_node = old_output.get(current_id)
-    
-    if not current_node:
-        print(f"[CCXGroupExecutor] 节点 {current_id} 在输出中不存在")
-        return new_output
-    
-    if new_output.get(current_id) is None:
-        print(f"[CCXGroupExecutor] 添加节点: {current_id} (类型: {current_node.get('class_type', 'unknown')})")
-        new_output[current_id] = current_node
-        inputs = current_node.get("inputs", {})
-        
-        for input_name, input_value in inputs.items():
-            if isinstance(input_value, list):
-                # 标准输入格式: [source_node_id, output_index]
-                source_node_id = input_value[0]
-                if source_node_id is not None and source_node_id != "":
-                    print(f"[CCXGroupExecutor] 节点 {current_id} 的输入 {input_name} 来自节点 {source_node_id}")
-                    recursive_add_nodes(source_node_id, old_output, new_output)
-                else:
-                    print(f"[CCXGroupExecutor] 节点 {current_id} 的输入 {input_name} 没有源节点")
-            elif isinstance(input_value, dict) and "link_id" in input_value:
-                # 某些节点可能使用link_id格式
-                link_id = input_value["link_id"]
-                if link_id:
-                    print(f"[CCXGroupExecutor] 节点 {current_id} 的输入 {input_name} 来自link_id {link_id}")
-                    recursive_add_nodes(link_id, old_output, new_output)
-    
-    return new_output
+# 编译后的子图缓存，同一工作流的多次提交共享依赖索引和节点列表
+subgraph_plan_cache = SubgraphPlanCache()
+
+# 验证结果缓存，只有种子不同的重复提交不再占用服务器事件循环做验证
+validation_cache = ValidationCache()
+
+def node_definitions_fingerprint():
+    """节点定义指纹：节点类被重新加载或增删后指纹改变，旧的验证结果不再命中"""
+    return hash(tuple((name, id(node_class)) for name, node_class in nodes.NODE_CLASS_MAPPINGS.items()))
 
-def filter_prompt_for_nodes(full_prompt, output_node_ids):
-    """从完整的 API prompt 中筛选出指定输出节点及其依赖"""
-    filtered_prompt = {}
+def compile_prompt_template(full_prompt, output_node_ids, prompt_hash=None):
+    """把指定输出节点及其依赖编译为 PromptTemplate
     
-    for node_id in output_node_ids:
-        # 确保node_id是字符串
-        node_id_str = str(node_id)
-        
-        # 首先检查该节点是否存在
-        if node_id_str not in full_prompt:
-            print(f"[CCXGroupExecutor] 警告：输出节点 {node_id_str} 不在完整prompt中")
-            continue
-            
-        print(f"[CCXGroupExecutor] 开始筛选节点，输出节点: {node_id_str}")
-        
-        # 递归收集所有依赖节点
-        recursive_add_nodes(node_id_str, full_prompt, filtered_prompt)
-        
-    print(f"[CCXGroupExecutor] 筛选完成，共收集 {len(filtered_prompt)} 个节点")
-    return filtered_prompt
+    依赖关系和种子槽位按 (完整 prompt 哈希, 输出节点) 编译缓存，prompt_hash 为空时现场计算
+    """
+    output_node_ids = [str(node_id) for node_id in output_node_ids]
+    missing = [node_id for node_id in output_node_ids if node_id not in full_prompt]
+    if missing:
+        print(f"[CCXGroupExecutor] 警告：输出节点 {missing} 不在完整prompt中")
+    return subgraph_plan_cache.get_template(full_prompt, output_node_ids, prompt_hash)
 
 class GroupExecutorBackend:
-    """后台执行管理器"""
+    """后台执行管理器：按任务 ID 调度执行计划
     
-    def __init__(self):
-        self.running_tasks = {}
+    提交的计划先进入等待队列（同一提交者内按优先级、再按先后顺序），不同提交者之间轮转调度；
+    每个提交者同时只运行一个任务，最多同时运行 max_running_jobs 个任务，
+    运行中的任务各自只保持少量 prompt 在队列中，因此不同提交者的 prompt 在 ComfyUI 队列中交替执行
+    """
+    
+    def __init__(self, max_running_jobs=4):
+        self.jobs = {}  # job_id -> 任务状态
+        self.pending = {}  # 提交者 -> 等待中的 job_id 列表
+        self.owner_order = deque()  # 提交者轮转顺序
+        self.max_running_jobs = max_running_jobs
         self.task_lock = threading.Lock()
-        self.interrupted_prompts = set()  # 记录被中断的 prompt_id
+        self.interrupted_prompts = set()  # 记录被中断的 prompt_id（只记录后台提交的 prompt，等待时消费）
+        # 每个等待中的 prompt_id 对应一个完成事件，由执行事件触发
+        self.prompt_events = {}
+        self.prompt_results = {}
+        self.prompt_owners = {}  # prompt_id -> job_id
+        self.prompt_lock = threading.Lock()
         self._setup_interrupt_handler()
     
     def _setup_interrupt_handler(self):
@@ -88,16 +90,20 @@ class GroupExecutorBackend:
             
             def patched_send_sync(event, data, sid=None):
                 try:
-                    # 调用原始方法，添加错误处理
-                    original_send_sync(event, data, sid)
-                    
+                    # 先记录执行结束事件，即使后续发送消息失败也不会丢失完成通知
+                    if isinstance(data, dict) and data.get("prompt_id"):
+                        if event in PROMPT_FINISH_EVENTS or (event == "executing" and data.get("node") is None):
+                            backend_instance._on_prompt_finished(data["prompt_id"], event)
+
                     # 监听 execution_interrupted 事件
                     if event == "execution_interrupted":
                         prompt_id = data.get("prompt_id")
                         if prompt_id:
-                            backend_instance.interrupted_prompts.add(prompt_id)
-                            # 取消所有后台任务
-                            backend_instance._cancel_all_on_interrupt()
+                            # 只取消被中断的 prompt 所属的后台任务
+                            backend_instance._cancel_on_interrupt(prompt_id)
+
+                    # 调用原始方法，添加错误处理
+                    original_send_sync(event, data, sid)
                 except Exception as e:
                     # 忽略所有WebSocket和连接相关的错误
                     error_str = str(e)
@@ -113,80 +119,251 @@ class GroupExecutorBackend:
             import traceback
             traceback.print_exc()
     
-    def _cancel_all_on_interrupt(self):
-        """响应全局中断，取消所有正在运行的后台任务"""
-        with self.task_lock:
-            for node_id, task_info in list(self.running_tasks.items()):
-                if task_info.get("status") == "running" and not task_info.get("cancel"):
-                    task_info["cancel"] = True
+    def _cancel_on_interrupt(self, prompt_id):
+        """响应中断：取消被中断的 prompt 所属的后台任务，其他任务继续执行"""
+        with self.prompt_lock:
+            job_id = self.prompt_owners.get(prompt_id)
+            if job_id is not None:
+                self.interrupted_prompts.add(prompt_id)
+        if job_id is None:
+            return
+        print(f"[CCXGroupExecutor] 任务 {job_id} 的 prompt 被中断，取消该任务")
+        self.cancel_job(job_id, interrupt=False)
+
+    def _register_prompt(self, prompt_id, job_id=None):
+        """在提交到队列之前注册完成事件，避免执行过快导致事件早于等待到达"""
+        with self.prompt_lock:
+            self.prompt_events[prompt_id] = threading.Event()
+            self.prompt_results.pop(prompt_id, None)
+            if job_id is not None:
+                self.prompt_owners[prompt_id] = job_id
+
+    def _unregister_prompt(self, prompt_id):
+        """注销完成事件，返回记录到的结束事件名（未结束时为 None）"""
+        with self.prompt_lock:
+            self.prompt_events.pop(prompt_id, None)
+            self.prompt_owners.pop(prompt_id, None)
+            self.interrupted_prompts.discard(prompt_id)
+            return self.prompt_results.pop(prompt_id, None)
+
+    def _on_prompt_finished(self, prompt_id, event):
+        """执行结束事件回调：记录结束类型并唤醒等待线程（只记录后台提交的 prompt）"""
+        with self.prompt_lock:
+            done_event = self.prompt_events.get(prompt_id)
+            if done_event is None:
+                return
+            # execution_success/error/interrupted 比 executing(None) 更具体，不被其覆盖
+            if event != "executing" or prompt_id not in self.prompt_results:
+                self.prompt_results[prompt_id] = event
+            done_event.set()
+
+    def _wake_job_waiters(self, job_id):
+        """取消任务时唤醒该任务的等待线程，由其自行检查取消标志"""
+        with self.prompt_lock:
+            for prompt_id, owner_job_id in self.prompt_owners.items():
+                if owner_job_id == job_id and prompt_id in self.prompt_events:
+                    self.prompt_events[prompt_id].set()
     
-    def execute_in_background(self, node_id, execution_list, full_api_prompt):
-        """启动后台执行线程
+    def submit_job(self, owner, execution_list, full_api_prompt, priority=0):
+        """提交执行计划，返回任务 ID；计划先进入等待队列，由调度器按优先级和提交者轮转启动
         
         Args:
-            node_id: 节点 ID
+            owner: 提交者（Sender 节点 ID 或客户端），同一提交者的计划依次执行
             execution_list: 执行列表，每项包含 group_name, repeat_count, delay_seconds, output_node_ids
             full_api_prompt: 前端生成的完整 API prompt（已经是正确格式）
+            priority: 优先级，数值越大越先执行
         """
+        job_id = uuid.uuid4().hex[:12]
+        pause_event = threading.Event()
+        pause_event.set()
         with self.task_lock:
-            # 检查是否有真正运行的线程
-            if node_id in self.running_tasks:
-                task = self.running_tasks[node_id]
-                # 检查线程是否还在运行
-                if task.get("thread") and task["thread"].is_alive():
-                    print(f"[CCXGroupExecutor] 任务 {node_id} 已经在运行，拒绝重复启动")
-                    return False
-                # 如果线程已经结束，清理旧任务状态
-                print(f"[CCXGroupExecutor] 清理任务 {node_id} 的旧状态")
-                del self.running_tasks[node_id]
-            
-            # 清理可能存在的中断状态（即使是其他任务的）
-            if hasattr(self, "interrupted_prompts"):
-                print(f"[CCXGroupExecutor] 清理所有旧的中断状态")
-                self.interrupted_prompts.clear()
-            
-            thread = threading.Thread(
-                target=self._execute_task,
-                args=(node_id, execution_list, full_api_prompt),
-                daemon=True
-            )
-            thread.start()
-            
-            self.running_tasks[node_id] = {
-                "thread": thread,
-                "status": "running",
+            self.jobs[job_id] = {
+                "id": job_id,
+                "owner": str(owner),
+                "priority": int(priority),
+                "status": "queued",
                 "cancel": False,
-                "start_time": time.time()  # 添加开始时间，便于调试
+                "created_time": time.time(),
+                "start_time": None,
+                "finish_time": None,
+                "current_item": None,
+                "completed": 0,
+                "skipped_duplicates": 0,
+                "last_result": None,
+                "thread": None,
+                "pause_event": pause_event,  # 未暂停时为 set 状态
+                "wake_event": threading.Event(),  # 取消时 set，用于提前结束延迟等待
+                "execution_list": execution_list,
+                "full_api_prompt": full_api_prompt
             }
+            self.pending.setdefault(str(owner), []).append(job_id)
+            if str(owner) not in self.owner_order:
+                self.owner_order.append(str(owner))
+            print(f"[CCXGroupExecutor] 任务 {job_id} 已加入队列（提交者: {owner}, 优先级: {priority}）")
+            self._dispatch()
+        return job_id
+    
+    def _dispatch(self):
+        """启动等待中的任务直到达到并发上限（调用方持有 task_lock）
+        
+        优先级最高的先启动，优先级相同时按提交者轮转；已有运行中任务的提交者本轮跳过
+        """
+        while True:
+            active = [job for job in self.jobs.values() if job["status"] in ("running", "paused")]
+            if len(active) >= self.max_running_jobs:
+                return
+            busy_owners = {job["owner"] for job in active}
             
-            print(f"[CCXGroupExecutor] 成功启动任务 {node_id}，线程 ID: {thread.ident}")
-            return True
+            best = None
+            for owner in self.owner_order:
+                if owner in busy_owners or not self.pending.get(owner):
+                    continue
+                # 同一提交者内：优先级高的在前，相同优先级按提交顺序
+                job_id = max(self.pending[owner], key=lambda pending_id: self.jobs[pending_id]["priority"])
+                if best is None or self.jobs[job_id]["priority"] > self.jobs[best]["priority"]:
+                    best = job_id
+            if best is None:
+                return
+            
+            job = self.jobs[best]
+            self.pending[job["owner"]].remove(best)
+            if not self.pending[job["owner"]]:
+                del self.pending[job["owner"]]
+            # 被调度的提交者移到轮转队尾
+            self.owner_order.remove(job["owner"])
+            if job["owner"] in self.pending:
+                self.owner_order.append(job["owner"])
+            
+            job["status"] = "running"
+            job["start_time"] = time.time()
+            job["thread"] = threading.Thread(target=self._run_job, args=(best,), daemon=True)
+            job["thread"].start()
+            print(f"[CCXGroupExecutor] 启动任务 {best}（提交者: {job['owner']}），线程 ID: {job['thread'].ident}")
+    
+    def _run_job(self, job_id):
+        """任务线程入口：执行计划，结束后记录状态并调度下一个任务"""
+        job = self.jobs[job_id]
+        status = "done"
+        try:
+            self._execute_task(job_id, job["execution_list"], job["full_api_prompt"])
+            if job["cancel"]:
+                status = "cancelled"
+        except Exception as e:
+            status = "failed"
+            print(f"[CCXGroupExecutor] 任务 {job_id} 执行失败: {e}")
+        finally:
+            with self.task_lock:
+                job["status"] = status
+                job["finish_time"] = time.time()
+                job["thread"] = None
+                # 释放计划和 prompt，只保留状态
+                job["execution_list"] = None
+                job["full_api_prompt"] = None
+                self._prune_finished_jobs()
+                self._dispatch()
+            print(f"[CCXGroupExecutor] 任务 {job_id} 结束，状态: {status}")
     
-    def cancel_task(self, node_id):
-        """取消任务"""
+    def _prune_finished_jobs(self):
+        """只保留最近结束的若干个任务记录（调用方持有 task_lock）"""
+        finished = [job for job in self.jobs.values() if job["status"] in ("done", "cancelled", "failed")]
+        finished.sort(key=lambda job: job["finish_time"] or 0)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job["id"]]
+    
+    def cancel_job(self, job_id, interrupt=True):
+        """取消任务：等待中的任务直接移出队列，运行中的任务删除其排队的 prompt
+        
+        interrupt 为 True 且正在执行的 prompt 属于该任务时中断当前执行；返回是否找到可取消的任务
+        """
         with self.task_lock:
-            if node_id in self.running_tasks:
-                self.running_tasks[node_id]["cancel"] = True
-                
-                # 中断当前正在执行的任务
-                try:
-                    server = PromptServer.instance
-                    server.send_sync("interrupt", {})
-                except Exception as e:
-                    print(f"[CCXGroupExecutor] 发送中断信号失败: {e}")
-                
+            job = self.jobs.get(job_id)
+            if not job or job["status"] not in ("queued", "running", "paused"):
+                return False
+            job["cancel"] = True
+            job["wake_event"].set()
+            job["pause_event"].set()
+            if job["status"] == "queued":
+                job["status"] = "cancelled"
+                job["finish_time"] = time.time()
+                self.pending[job["owner"]].remove(job_id)
+                if not self.pending[job["owner"]]:
+                    del self.pending[job["owner"]]
+                    self.owner_order.remove(job["owner"])
                 return True
-            return False
+        self._wake_job_waiters(job_id)
+        
+        if interrupt:
+            # 只在当前执行的 prompt 属于该任务时中断，避免打断其他用户的任务
+            try:
+                running, _ = PromptServer.instance.prompt_queue.get_current_queue()
+                with self.prompt_lock:
+                    owns_running = any(len(item) >= 2 and self.prompt_owners.get(item[1]) == job_id for item in running)
+                if owns_running:
+                    nodes.interrupt_processing()
+            except Exception as e:
+                print(f"[CCXGroupExecutor] 发送中断信号失败: {e}")
+        return True
     
-    def _execute_task(self, node_id, execution_list, full_api_prompt):
+    def pause_job(self, job_id):
+        """暂停任务：已在队列中的 prompt 继续执行，之后不再提交新的 prompt，直到恢复"""
+        with self.task_lock:
+            job = self.jobs.get(job_id)
+            if not job or job["status"] != "running":
+                return False
+            job["status"] = "paused"
+            job["pause_event"].clear()
+        print(f"[CCXGroupExecutor] 任务 {job_id} 已暂停")
+        return True
+    
+    def resume_job(self, job_id):
+        """恢复暂停的任务"""
+        with self.task_lock:
+            job = self.jobs.get(job_id)
+            if not job or job["status"] != "paused":
+                return False
+            job["status"] = "running"
+            job["pause_event"].set()
+        print(f"[CCXGroupExecutor] 任务 {job_id} 已恢复")
+        return True
+    
+    def get_job_status(self, job_id=None):
+        """返回任务状态（不含线程、事件和 prompt），job_id 为空时返回全部任务"""
+        def public(job):
+            return {key: value for key, value in job.items() if key not in JOB_PRIVATE_KEYS}
+        with self.task_lock:
+            if job_id is None:
+                return [public(job) for job in self.jobs.values()]
+            job = self.jobs.get(job_id)
+            return public(job) if job else None
+    
+    def _wait_if_paused(self, job_id):
+        """提交新 prompt 前调用：任务暂停时阻塞到恢复或取消，返回任务是否已取消"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return True
+        if not job["pause_event"].is_set():
+            print(f"[CCXGroupExecutor] 任务 {job_id} 暂停中，等待恢复")
+            job["pause_event"].wait()
+        return job["cancel"]
+    
+    def _sleep(self, job_id, seconds):
+        """可被取消打断的延迟，返回任务是否已取消"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return True
+        if seconds > 0:
+            job["wake_event"].wait(seconds)
+        return job["cancel"]
+    
+    def _execute_task(self, job_id, execution_list, full_api_prompt):
         """后台执行任务的核心逻辑
         
         Args:
-            node_id: 节点 ID
+            job_id: 任务 ID
             execution_list: 执行列表
             full_api_prompt: 前端生成的完整 API prompt
         """
-        print(f"[CCXGroupExecutor] 开始执行任务 node_id={node_id}, 执行列表长度={len(execution_list)}")
+        print(f"[CCXGroupExecutor] 开始执行任务 job_id={job_id}, 执行列表长度={len(execution_list)}")
         print(f"[CCXGroupExecutor] 完整执行列表: {execution_list}")
         
         # 验证执行列表
@@ -217,21 +394,15 @@ class GroupExecutorBackend:
             return
         
         try:
-            # 确保任务开始时的状态是干净的
-            with self.task_lock:
-                if node_id in self.running_tasks:
-                    print(f"[CCXGroupExecutor] 重置任务 {node_id} 的取消标志")
-                    self.running_tasks[node_id]["cancel"] = False
-                    
-            # 清理可能存在的旧中断状态
-            if hasattr(self, "interrupted_prompts"):
-                print(f"[CCXGroupExecutor] 清理旧的中断状态")
-                self.interrupted_prompts.clear()
+            # 完整 prompt 在整个任务中不变，只计算一次哈希
+            full_prompt_hash = hash_prompt(full_api_prompt)
+            # 重复提交检测状态：上一次成功完成的 prompt 哈希、在途 prompt_id -> 哈希
+            dedup_state = {"last_completed": None, "in_flight": {}}
             
             # 遍历执行列表中的每个执行项
             for item_index, exec_item in enumerate(execution_list):
                 # 检查取消标志
-                if self.running_tasks.get(node_id, {}).get("cancel"):
+                if self.jobs.get(job_id, {}).get("cancel"):
                     print(f"[CCXGroupExecutor] 任务被取消")
                     break
                 
@@ -239,7 +410,11 @@ class GroupExecutorBackend:
                 repeat_count = int(exec_item.get("repeat_count", 1))
                 delay_seconds = float(exec_item.get("delay_seconds", 0))
                 output_node_ids = exec_item.get("output_node_ids", [])
+                duplicate_policy = exec_item.get("duplicate_policy", "off")
+                if duplicate_policy not in DUPLICATE_POLICIES:
+                    duplicate_policy = "off"
                 
+                self.jobs[job_id]["current_item"] = item_index
                 print(f"\n[CCXGroupExecutor] ====== 处理执行项 {item_index+1}/{len(execution_list)} ======")
                 print(f"[CCXGroupExecutor] group_name={group_name}, repeat_count={repeat_count}, delay_seconds={delay_seconds}")
                 print(f"[CCXGroupExecutor] output_node_ids={output_node_ids}")
@@ -252,22 +427,22 @@ class GroupExecutorBackend:
                 # 处理延迟
                 if group_name == "__delay__":
                     print(f"[CCXGroupExecutor] 执行延迟: {delay_seconds}秒")
-                    if delay_seconds > 0 and not self.running_tasks.get(node_id, {}).get("cancel"):
-                        # 分段延迟，以便能快速响应取消
-                        delay_steps = int(delay_seconds * 2)  # 每 0.5 秒检查一次
-                        for step in range(delay_steps):
-                            if self.running_tasks.get(node_id, {}).get("cancel"):
-                                print(f"[CCXGroupExecutor] 延迟期间任务被取消")
-                                break
-                            time.sleep(0.5)
-                            if (step + 1) % 2 == 0:  # 每1秒打印一次延迟进度
-                                print(f"[CCXGroupExecutor] 延迟进度: {int((step + 1) * 0.5)}秒/{delay_seconds}秒")
+                    # 取消时立即结束等待
+                    if self._sleep(job_id, delay_seconds):
+                        print(f"[CCXGroupExecutor] 延迟期间任务被取消")
+                    continue
+                
+                # 流水线模式：保持多个 prompt 在队列中，不使用组内延迟
+                pipeline_depth = int(exec_item.get("pipeline_depth", 0) or 0)
+                if pipeline_depth > 1 and repeat_count > 1:
+                    if self._execute_pipelined(job_id, group_name, repeat_count, pipeline_depth, output_node_ids, full_api_prompt, full_prompt_hash, duplicate_policy, dedup_state):
+                        return
                     continue
                 
                 # 执行 repeat_count 次
                 for repeat_index in range(repeat_count):
-                    # 检查取消标志
-                    if self.running_tasks.get(node_id, {}).get("cancel"):
+                    # 检查取消标志（暂停时在此等待恢复）
+                    if self._wait_if_paused(job_id):
                         print(f"[CCXGroupExecutor] 任务被取消")
                         break
                     
@@ -276,66 +451,42 @@ class GroupExecutorBackend:
                     else:
                         print(f"[CCXGroupExecutor] 执行组 '{group_name}'")
                     
-                    # 从完整 prompt 中筛选出该组需要的节点
-                    print(f"[CCXGroupExecutor] 从完整 prompt 中筛选节点，输出节点 ID: {output_node_ids}")
-                    prompt = filter_prompt_for_nodes(full_api_prompt, output_node_ids)
-                    
+                    prompt = self._build_group_prompt(full_api_prompt, output_node_ids, full_prompt_hash)
                     if not prompt:
-                        print(f"[CCXGroupExecutor] 筛选 prompt 失败，跳过此执行")
                         continue
                     
-                    print(f"[CCXGroupExecutor] 筛选出 {len(prompt)} 个节点")
-                    
-                    # 处理随机种子：为每个有 seed 参数的节点生成新的随机值
-                    print(f"[CCXGroupExecutor] 处理随机种子")
-                    seed_nodes = 0
-                    for node_id_str, node_data in prompt.items():
-                        if "seed" in node_data.get("inputs", {}):
-                            new_seed = random.randint(0, 0xffffffffffffffff)
-                            prompt[node_id_str]["inputs"]["seed"] = new_seed
-                            seed_nodes += 1
-                        # 也处理 noise_seed（某些节点使用这个名称）
-                        if "noise_seed" in node_data.get("inputs", {}):
-                            new_seed = random.randint(0, 0xffffffffffffffff)
-                            prompt[node_id_str]["inputs"]["noise_seed"] = new_seed
-                            seed_nodes += 1
-                    
-                    if seed_nodes > 0:
-                        print(f"[CCXGroupExecutor] 更新了 {seed_nodes} 个节点的随机种子")
+                    # 与刚完成的提交完全相同（没有随机种子的确定性组）时不再重复执行
+                    submission_hash = hash_prompt(prompt) if duplicate_policy != "off" else None
+                    if self._is_duplicate(job_id, submission_hash, duplicate_policy, dedup_state):
+                        continue
                     
                     # 提交到队列
                     print(f"[CCXGroupExecutor] 提交 prompt 到队列")
-                    task_info = self._queue_prompt(prompt)
+                    task_info = self._queue_prompt(prompt, job_id)
                     
                     if task_info:
                         number, prompt_id = task_info
                         print(f"[CCXGroupExecutor] Prompt 提交成功，number={number}, ID: {prompt_id}")
+                        dedup_state["in_flight"][prompt_id] = submission_hash
                         # 等待执行完成（返回是否检测到中断）
-                        was_interrupted = self._wait_for_completion(task_info, node_id)
+                        was_interrupted = self._wait_for_completion(task_info, job_id)
                         
                         # 如果等待期间检测到中断，立即退出
                         if was_interrupted:
                             print(f"[CCXGroupExecutor] 执行中断")
                             # 使用return而不是break，确保能正确清理资源
                             return
+                        self._record_completion(job_id, prompt_id, dedup_state)
                     else:
                         print(f"[CCXGroupExecutor] 提交 prompt 失败")
                     
                     # 延迟（支持中断）
                     if delay_seconds > 0 and repeat_index < repeat_count - 1:
                         print(f"[CCXGroupExecutor] 组执行之间的延迟: {delay_seconds}秒")
-                        if not self.running_tasks.get(node_id, {}).get("cancel"):
-                            # 分段延迟，以便能快速响应取消
-                            delay_steps = int(delay_seconds * 2)  # 每 0.5 秒检查一次
-                            for step in range(delay_steps):
-                                if self.running_tasks.get(node_id, {}).get("cancel"):
-                                    print(f"[CCXGroupExecutor] 延迟期间任务被取消")
-                                    break
-                                time.sleep(0.5)
-                                if (step + 1) % 2 == 0:  # 每1秒打印一次延迟进度
-                                    print(f"[CCXGroupExecutor] 延迟进度: {int((step + 1) * 0.5)}秒/{delay_seconds}秒")
-            
-            if self.running_tasks.get(node_id, {}).get("cancel"):
+                        if self._sleep(job_id, delay_seconds):
+                            print(f"[CCXGroupExecutor] 延迟期间任务被取消")
+            
+            if self.jobs.get(job_id, {}).get("cancel"):
                 print(f"[CCXGroupExecutor] 任务已取消")
             else:
                 print(f"[CCXGroupExecutor] 所有执行项处理完成，任务执行结束")
@@ -344,22 +495,112 @@ class GroupExecutorBackend:
             print(f"[CCXGroupExecutor] 后台执行出错: {e}")
             import traceback
             traceback.print_exc()
-        finally:
-            with self.task_lock:
-                # 任务完成后从 running_tasks 中删除
-                if node_id in self.running_tasks:
-                    print(f"[CCXGroupExecutor] 从 running_tasks 中删除任务 {node_id}")
-                    del self.running_tasks[node_id]
-                
-                # 确保中断状态也被清理
-                if hasattr(self, "interrupted_prompts"):
-                    print(f"[CCXGroupExecutor] 清理最终的中断状态")
-                    self.interrupted_prompts.clear()
-                
-                print(f"[CCXGroupExecutor] 任务 {node_id} 的所有状态已清理")
     
-    def _queue_prompt(self, prompt):
-        """提交 prompt 到队列"""
+    def _build_group_prompt(self, full_api_prompt, output_node_ids, full_prompt_hash=None):
+        """由编译好的组模板生成一次提交用的 prompt（刷新随机种子），失败时返回 None
+        
+        只复制写入种子的节点，其余节点与完整 prompt 共享；完整 prompt 不会被修改，同时在途的多个提交互不影响
+        """
+        template = compile_prompt_template(full_api_prompt, output_node_ids, full_prompt_hash)
+        if not template.prompt:
+            print(f"[CCXGroupExecutor] 筛选 prompt 失败，跳过此执行")
+            return None
+        
+        prompt = template.instantiate()
+        print(f"[CCXGroupExecutor] 组包含 {len(prompt)} 个节点，更新了 {len(template.seed_slots)} 个随机种子")
+        return prompt
+
+    def _execute_pipelined(self, job_id, group_name, repeat_count, pipeline_depth, output_node_ids, full_api_prompt, full_prompt_hash=None, duplicate_policy="off", dedup_state=None):
+        """流水线模式执行 repeat_count 次：队列中最多保持 pipeline_depth 个本组的 prompt
+        
+        以在途数量作为背压代替固定延迟，工作线程执行当前 prompt 时下一个已在队列中等待
+        返回: True 如果检测到中断或取消，False 正常完成
+        """
+        in_flight = deque()
+        submitted = 0
+        if dedup_state is None:
+            dedup_state = {"last_completed": None, "in_flight": {}}
+        print(f"[CCXGroupExecutor] 流水线执行组 '{group_name}'，共 {repeat_count} 次，最多 {pipeline_depth} 个在途")
+        
+        while submitted < repeat_count or in_flight:
+            if self.jobs.get(job_id, {}).get("cancel"):
+                self._discard_prompts(in_flight)
+                print(f"[CCXGroupExecutor] 任务被取消")
+                return True
+            
+            # 暂停时等待已提交的 prompt 执行完，之后阻塞到恢复
+            if not in_flight and self._wait_if_paused(job_id):
+                print(f"[CCXGroupExecutor] 任务被取消")
+                return True
+            
+            # 补足在途 prompt（暂停期间不再提交）
+            while submitted < repeat_count and len(in_flight) < pipeline_depth and self.jobs[job_id]["pause_event"].is_set():
+                submitted += 1
+                print(f"[CCXGroupExecutor] 执行组 '{group_name}' ({submitted}/{repeat_count})")
+                prompt = self._build_group_prompt(full_api_prompt, output_node_ids, full_prompt_hash)
+                if not prompt:
+                    continue
+                submission_hash = hash_prompt(prompt) if duplicate_policy != "off" else None
+                if self._is_duplicate(job_id, submission_hash, duplicate_policy, dedup_state):
+                    continue
+                task_info = self._queue_prompt(prompt, job_id)
+                if task_info:
+                    in_flight.append(task_info)
+                    dedup_state["in_flight"][task_info[1]] = submission_hash
+                else:
+                    print(f"[CCXGroupExecutor] 提交 prompt 失败")
+            
+            if not in_flight:
+                break
+            
+            # 队列按提交顺序执行，等待最早提交的 prompt 完成后再补充下一个
+            task_info = in_flight.popleft()
+            if self._wait_for_completion(task_info, job_id):
+                self._discard_prompts(in_flight)
+                print(f"[CCXGroupExecutor] 执行中断")
+                return True
+            self._record_completion(job_id, task_info[1], dedup_state)
+        return False
+
+    def _is_duplicate(self, job_id, submission_hash, duplicate_policy, dedup_state):
+        """按策略判断本次提交是否与刚完成（collapse 时还包括在途）的提交相同，相同则计入任务状态"""
+        if duplicate_policy == "off" or submission_hash is None:
+            return False
+        duplicate = submission_hash == dedup_state["last_completed"]
+        if not duplicate and duplicate_policy == "collapse":
+            duplicate = submission_hash in dedup_state["in_flight"].values()
+        if duplicate:
+            with self.task_lock:
+                if job_id in self.jobs:
+                    self.jobs[job_id]["skipped_duplicates"] += 1
+            print(f"[CCXGroupExecutor] 跳过重复提交（策略: {duplicate_policy}）")
+        return duplicate
+
+    def _record_completion(self, job_id, prompt_id, dedup_state):
+        """记录 prompt 完成：更新任务状态，成功时作为后续重复检测的基准"""
+        submission_hash = dedup_state["in_flight"].pop(prompt_id, None)
+        with self.task_lock:
+            task = self.jobs.get(job_id)
+            if task is None:
+                return
+            task["completed"] += 1
+            succeeded = task.get("last_result") != "execution_error"
+        if succeeded and submission_hash is not None:
+            dedup_state["last_completed"] = submission_hash
+
+    def _discard_prompts(self, task_infos):
+        """从队列中删除尚未执行的 prompt 并注销其完成事件"""
+        server = PromptServer.instance
+        for number, prompt_id in task_infos:
+            try:
+                server.prompt_queue.delete_queue_item(lambda item, prompt_id=prompt_id: len(item) >= 2 and item[1] == prompt_id)
+            except Exception as e:
+                print(f"[CCXGroupExecutor] 删除队列项时出错: {e}")
+            self._unregister_prompt(prompt_id)
+        task_infos.clear()
+
+    def _queue_prompt(self, prompt, job_id=None):
+        """提交 prompt 到队列，job_id 为提交该 prompt 的任务"""
         try:
             # 基本验证：确保prompt不为空
             if not prompt or not isinstance(prompt, dict) or len(prompt) == 0:
@@ -371,20 +612,29 @@ class GroupExecutorBackend:
             
             print(f"[CCXGroupExecutor] 开始提交 prompt，包含 {len(prompt)} 个节点，prompt_id={prompt_id}")
             
-            # 验证 prompt（validate_prompt 是异步函数，需要在事件循环中运行）
-            try:
-                loop = server.loop
-                # 在事件循环中运行异步函数
-                print(f"[CCXGroupExecutor] 开始验证 prompt，包含节点: {list(prompt.keys())}")
-                valid = asyncio.run_coroutine_threadsafe(
-                    execution.validate_prompt(prompt_id, prompt, None),
-                    loop
-                ).result(timeout=30)
-            except Exception as validate_error:
-                print(f"[CCXGroupExecutor] Prompt 验证出错: {validate_error}")
-                import traceback
-                traceback.print_exc()
-                return None
+            # 结构相同（只有种子不同）且节点定义未变时直接复用之前的验证结果
+            cache_key = (node_definitions_fingerprint(), structural_hash(prompt))
+            cached_outputs = validation_cache.get(cache_key)
+            if cached_outputs is not None:
+                print(f"[CCXGroupExecutor] 命中验证缓存，跳过 validate_prompt")
+                valid = (True, None, cached_outputs, {})
+            else:
+                # 验证 prompt（validate_prompt 是异步函数，需要在事件循环中运行）
+                try:
+                    loop = server.loop
+                    # 在事件循环中运行异步函数
+                    print(f"[CCXGroupExecutor] 开始验证 prompt，包含节点: {list(prompt.keys())}")
+                    valid = asyncio.run_coroutine_threadsafe(
+                        execution.validate_prompt(prompt_id, prompt, None),
+                        loop
+                    ).result(timeout=30)
+                except Exception as validate_error:
+                    print(f"[CCXGroupExecutor] Prompt 验证出错: {validate_error}")
+                    import traceback
+                    traceback.print_exc()
+                    return None
+                if valid[0]:
+                    validation_cache.put(cache_key, valid[2])
             
             if not valid[0]:
                 print(f"[CCXGroupExecutor] Prompt 验证失败: {valid[1]}")
@@ -428,7 +678,7 @@ class GroupExecutorBackend:
             
             # 构建队列项（确保与ComfyUI的预期格式完全一致）
             # 格式：(number, prompt_id, prompt, extra_data, outputs_to_execute, sensitive)
-            extra_data = {}
+            extra_data = {"client_id": BACKEND_CLIENT_ID}
             sensitive = {}
             
             # 验证队列项格式（先使用临时number=0进行验证）
@@ -448,7 +698,8 @@ class GroupExecutorBackend:
             queue_item = (number, prompt_id, prompt, extra_data, outputs_to_execute, sensitive)
             print(f"[CCXGroupExecutor] 构建队列项完成: number={number}, prompt_id={prompt_id}, 输出节点={outputs_to_execute}")
             
-            # 提交到队列
+            # 提交到队列（先注册完成事件）
+            self._register_prompt(prompt_id, job_id)
             server.prompt_queue.put(queue_item)
             
             print(f"[CCXGroupExecutor] Prompt 成功提交到队列，number={number}, prompt_id={prompt_id}")
@@ -457,6 +708,8 @@ class GroupExecutorBackend:
             return (number, prompt_id)
             
         except Exception as e:
+            if 'prompt_id' in locals():
+                self._unregister_prompt(prompt_id)
             # 修复：在任何异常情况下都回滚server.number的递增
             if 'server' in locals() and hasattr(server, 'number'):
                 # 只有在已经递增过number的情况下才回滚
@@ -469,8 +722,14 @@ class GroupExecutorBackend:
             traceback.print_exc()
             return None
     
-    def _wait_for_completion(self, task_info, node_id):
+    def _prompt_in_queue(self, server, prompt_id):
+        """prompt 是否仍在运行或等待队列中（复制队列，只在兜底检查时调用）"""
+        running, pending = server.prompt_queue.get_current_queue()
+        return any(len(item) >= 2 and item[1] == prompt_id for item in list(running) + list(pending))
+    
+    def _wait_for_completion(self, task_info, job_id):
         """等待 prompt 执行完成，同时响应取消请求
+        由 execution_success/execution_error/execution_interrupted 事件驱动，没有总时长上限
         参数: task_info 是包含 (number, prompt_id) 的元组
         返回: True 如果检测到中断，False 正常完成
         """
@@ -479,100 +738,82 @@ class GroupExecutorBackend:
             number, prompt_id = task_info
             
             print(f"[CCXGroupExecutor] 等待任务完成: number={number}, prompt_id={prompt_id}")
-            
-            wait_start_time = time.time()
-            max_wait_time = 300  # 最大等待时间5分钟，避免无限等待
-            
-            # 连续检查的计数
-            consecutive_checks = 0
-            max_consecutive_checks = 5  # 最多连续检查5次
+            with self.prompt_lock:
+                done_event = self.prompt_events.get(prompt_id)
+            if done_event is None:
+                self._register_prompt(prompt_id, job_id)
+                with self.prompt_lock:
+                    done_event = self.prompt_events[prompt_id]
             
             while True:
-                # 检查是否超过最大等待时间
-                if time.time() - wait_start_time > max_wait_time:
-                    print(f"[CCXGroupExecutor] 任务等待超时 ({max_wait_time}秒): number={number}, prompt_id={prompt_id}")
-                    return False  # 超时视为正常完成，但实际上可能有问题
-                
-                # 检查任务是否已经被移除（可能任务已经完成但我们不知道）
-                if node_id not in self.running_tasks:
-                    print(f"[CCXGroupExecutor] 任务节点 {node_id} 已不在运行任务列表中，可能已被清理")
-                    return False
-                
-                # 检查这个 prompt 是否被中断
-                if prompt_id in self.interrupted_prompts:
-                    # 设置任务取消标志
-                    with self.task_lock:
-                        if node_id in self.running_tasks:
-                            self.running_tasks[node_id]["cancel"] = True
-                    # 从中断集合中移除
-                    self.interrupted_prompts.discard(prompt_id)
-                    print(f"[CCXGroupExecutor] 任务被中断: number={number}, prompt_id={prompt_id}")
-                    return True  # 返回中断状态
-                
-                # 检查是否被取消
-                if self.running_tasks.get(node_id, {}).get("cancel"):
-                    # 从队列中删除这个 prompt（如果还在队列中）
-                    try:
-                        def should_delete(item):
-                            return len(item) >= 2 and (item[1] == prompt_id or item[0] == number)
-                        server.prompt_queue.delete_queue_item(should_delete)
-                    except Exception as del_error:
-                        print(f"[CCXGroupExecutor] 删除队列项时出错: {del_error}")
-                    print(f"[CCXGroupExecutor] 任务被取消: number={number}, prompt_id={prompt_id}")
-                    return True  # 返回中断状态
-                
-                # 检查是否在历史记录中（表示已完成）
-                if prompt_id in server.prompt_queue.history:
-                    # 检查是否是因为中断而完成的
-                    if prompt_id in self.interrupted_prompts:
-                        self.interrupted_prompts.discard(prompt_id)
-                        print(f"[CCXGroupExecutor] 任务在历史记录中但被中断: number={number}, prompt_id={prompt_id}")
-                        return True
-                    print(f"[CCXGroupExecutor] 任务正常完成: number={number}, prompt_id={prompt_id}")
-                    return False  # 正常完成
-                
-                # 检查是否还在队列中
-                running, pending = server.prompt_queue.get_current_queue()
-                
-                in_queue = False
-                
-                # 检查运行队列
-                for item in running:
-                    if len(item) >= 2 and (item[1] == prompt_id or item[0] == number):
-                        in_queue = True
-                        print(f"[CCXGroupExecutor] 任务仍在运行队列中: number={number}, prompt_id={prompt_id}")
-                        consecutive_checks = 0  # 重置检查计数
-                        break
-                
-                # 检查等待队列
-                if not in_queue:
-                    for item in pending:
-                        if len(item) >= 2 and (item[1] == prompt_id or item[0] == number):
-                            in_queue = True
-                            print(f"[CCXGroupExecutor] 任务在等待队列中: number={number}, prompt_id={prompt_id}")
-                            consecutive_checks = 0  # 重置检查计数
+                if done_event.wait(COMPLETION_FALLBACK_INTERVAL):
+                    with self.prompt_lock:
+                        result = self.prompt_results.get(prompt_id)
+                        if result is not None or self.jobs.get(job_id, {}).get("cancel"):
                             break
-                
-                # 如果任务不在队列中且不在历史记录中，增加检查计数
-                if not in_queue and prompt_id not in server.prompt_queue.history:
-                    consecutive_checks += 1
-                    print(f"[CCXGroupExecutor] 任务不在队列中，已连续检查 {consecutive_checks}/{max_consecutive_checks} 次: number={number}, prompt_id={prompt_id}")
-                    
-                    # 只有连续检查次数达到最大值，才认为任务已经完成
-                    if consecutive_checks >= max_consecutive_checks:
-                        print(f"[CCXGroupExecutor] 任务连续 {max_consecutive_checks} 次不在队列中且不在历史记录中，认为已完成: number={number}, prompt_id={prompt_id}")
-                        return False
-                else:
-                    consecutive_checks = 0  # 重置检查计数
-                
-                # 正常等待，避免太频繁检查
-                time.sleep(1.0)  # 增加等待时间到1秒，减少检查频率
+                        # 被其他任务的取消唤醒，本任务继续等待（与完成回调在同一把锁内清除，不会丢失完成通知）
+                        done_event.clear()
+                    continue
+                # 兜底：事件丢失时通过历史记录确认完成（字典查找，不复制队列）
+                if prompt_id in server.prompt_queue.history:
+                    result = None
+                    break
+                # 既不在运行/等待队列中，也没有历史记录：prompt 已被删除（删除队列项或清空队列），不会再有事件，按取消处理
+                if not self._prompt_in_queue(server, prompt_id) and prompt_id not in server.prompt_queue.history:
+                    print(f"[CCXGroupExecutor] prompt 已从队列中移除，任务按取消处理: prompt_id={prompt_id}")
+                    with self.task_lock:
+                        if job_id in self.jobs:
+                            self.jobs[job_id]["cancel"] = True
+                    break
+                # 检查任务是否已经被移除
+                if job_id not in self.jobs:
+                    print(f"[CCXGroupExecutor] 任务节点 {job_id} 已不在运行任务列表中，可能已被清理")
+                    return False
+            
+            with self.prompt_lock:
+                result = self.prompt_results.get(prompt_id)
+            
+            # 检查这个 prompt 是否被中断
+            if result == "execution_interrupted" or prompt_id in self.interrupted_prompts:
+                # 设置任务取消标志
+                with self.task_lock:
+                    if job_id in self.jobs:
+                        self.jobs[job_id]["cancel"] = True
+                # 从中断集合中移除
+                self.interrupted_prompts.discard(prompt_id)
+                print(f"[CCXGroupExecutor] 任务被中断: number={number}, prompt_id={prompt_id}")
+                return True  # 返回中断状态
+            
+            # 被取消唤醒（prompt 尚未结束）
+            if result is None and self.jobs.get(job_id, {}).get("cancel"):
+                # 从队列中删除这个 prompt（如果还在队列中）
+                try:
+                    def should_delete(item):
+                        return len(item) >= 2 and (item[1] == prompt_id or item[0] == number)
+                    server.prompt_queue.delete_queue_item(should_delete)
+                except Exception as del_error:
+                    print(f"[CCXGroupExecutor] 删除队列项时出错: {del_error}")
+                print(f"[CCXGroupExecutor] 任务被取消: number={number}, prompt_id={prompt_id}")
+                return True  # 返回中断状态
+            
+            with self.task_lock:
+                if job_id in self.jobs:
+                    # 通过历史记录兜底确认时没有具体事件，按成功处理
+                    self.jobs[job_id]["last_result"] = result or "execution_success"
+            
+            if result == "execution_error":
+                print(f"[CCXGroupExecutor] 任务执行出错: number={number}, prompt_id={prompt_id}")
+            else:
+                print(f"[CCXGroupExecutor] 任务正常完成: number={number}, prompt_id={prompt_id}")
+            return False  # 正常完成
                 
         except Exception as e:
             print(f"[CCXGroupExecutor] 等待执行完成时出错: {e}")
             import traceback
             traceback.print_exc()
             return False
+        finally:
+            self._unregister_prompt(task_info[1])
 
 # 全局后台执行器实例
 _backend_executor = GroupExecutorBackend()
@@ -597,6 +838,10 @@ class CCXGroupExecutorSingle:
             },
             "optional": {
                 "signal": ("SIGNAL",),
+                # 后台执行时队列中保持的本组 prompt 数，大于1时启用流水线模式（忽略组内延迟）
+                "pipeline_depth": ("INT", {"default": 1, "min": 1, "max": 16, "step": 1}),
+                # 没有随机种子的组重复执行时如何处理完全相同的提交
+                "duplicate_policy": (list(DUPLICATE_POLICIES), {"default": "off"}),
             },
             "hidden": {
                 "unique_id": "UNIQUE_ID"
@@ -607,7 +852,7 @@ class CCXGroupExecutorSingle:
     FUNCTION = "execute_group"
     CATEGORY = "Update of SD-PPP Plugin"
 
-    def execute_group(self, group_name, repeat_count, delay_seconds, signal=None, unique_id=None):
+    def execute_group(self, group_name, repeat_count, delay_seconds, signal=None, unique_id=None, pipeline_depth=1, duplicate_policy="off"):
         try:
             # 使用锁确保只有一个执行请求通过
             with self.execution_lock:
@@ -630,7 +875,9 @@ class CCXGroupExecutorSingle:
                 execution_list.append({
                     "group_name": group,
                     "repeat_count": repeat_count,      
-                    "delay_seconds": delay_seconds     
+                    "delay_seconds": delay_seconds,
+                    "pipeline_depth": pipeline_depth,
+                    "duplicate_policy": duplicate_policy
                 })
 
             # 如果有信号输入，将信号追加到新执行列表后面（正确的执行顺序：新组先执行，然后执行信号中的组）
@@ -729,6 +976,7 @@ async def execute_backend(request):
         node_id = data.get("node_id")
         execution_list = data.get("execution_list", [])
         full_api_prompt = data.get("api_prompt", {})
+        client_id = data.get("client_id")
         
         if not node_id:
             return web.json_response({"status": "error", "message": "缺少 node_id"}, status=400)
@@ -741,17 +989,16 @@ async def execute_backend(request):
         
         print(f"[CCXGroupExecutor] 收到后台执行请求: node_id={node_id}, 执行项数={len(execution_list)}")
         
-        # 启动后台执行
-        success = _backend_executor.execute_in_background(
-            node_id,
+        # 加入任务队列：同一客户端的同一 Sender 节点为一个提交者，其计划依次执行
+        owner = f"{client_id}/{node_id}" if client_id else str(node_id)
+        job_id = _backend_executor.submit_job(
+            owner,
             execution_list,
-            full_api_prompt
+            full_api_prompt,
+            priority=int(data.get("priority", 0) or 0)
         )
         
-        if success:
-            return web.json_response({"status": "success", "message": "后台执行已启动"})
-        else:
-            return web.json_response({"status": "error", "message": "已有任务在执行中"}, status=409)
+        return web.json_response({"status": "success", "message": "后台执行已加入队列", "job_id": job_id})
             
     except Exception as e:
         print(f"[CCXGroupExecutor] 后台执行请求处理失败: {e}")
@@ -759,6 +1006,46 @@ async def execute_backend(request):
         traceback.print_exc()
         return web.json_response({"status": "error", "message": str(e)}, status=500)
 
+@routes.get("/ccx_group_executor/jobs")
+async def get_backend_jobs(request):
+    """返回所有后台任务的状态（排队/运行/暂停/已结束，已完成次数、跳过的重复提交次数等）"""
+    return web.json_response({"status": "success", "jobs": _backend_executor.get_job_status()})
+
+@routes.get("/ccx_group_executor/jobs/{job_id}")
+async def get_backend_job(request):
+    job = _backend_executor.get_job_status(request.match_info["job_id"])
+    if job is None:
+        return web.json_response({"status": "error", "message": "任务不存在"}, status=404)
+    return web.json_response({"status": "success", "job": job})
+
+@routes.post("/ccx_group_executor/jobs/{job_id}/{action}")
+async def control_backend_job(request):
+    """取消、暂停或恢复任务"""
+    job_id = request.match_info["job_id"]
+    action = request.match_info["action"]
+    handlers = {
+        "cancel": _backend_executor.cancel_job,
+        "pause": _backend_executor.pause_job,
+        "resume": _backend_executor.resume_job
+    }
+    if action not in handlers:
+        return web.json_response({"status": "error", "message": f"未知操作: {action}"}, status=400)
+    if not handlers[action](job_id):
+        return web.json_response({"status": "error", "message": "任务不存在或当前状态不支持该操作"}, status=409)
+    return web.json_response({"status": "success", "job": _backend_executor.get_job_status(job_id)})
+
+@routes.get("/ccx_group_executor/validation_cache")
+async def get_validation_cache_stats(request):
+    """返回验证缓存的条目数和命中统计"""
+    return web.json_response({"status": "success", "stats": validation_cache.get_stats()})
+
+@routes.post("/ccx_group_executor/validation_cache/invalidate")
+async def invalidate_validation_cache(request):
+    """清空验证缓存（例如重新加载自定义节点后）"""
+    cleared = validation_cache.invalidate()
+    print(f"[CCXGroupExecutor] 已清空验证缓存，共 {cleared} 条")
+    return web.json_response({"status": "success", "cleared": cleared})
+
 @routes.get("/ccx_group_executor/configs")
 async def get_configs(request):
     try:
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .http_client import get_http_client
+
+MIRROR_STATS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mirror_stats.json")
+
+# 指数加权平均的权重，新样本占比
+EWMA_ALPHA = 0.3
+
+
+def equivalent_mirrors(url):
+    """根据gitee/GitHub的raw地址推导出等价的镜像地址"""
+    parsed_url = urlparse(url)
+    parts = parsed_url.path.strip('/').split('/')
+    host = parsed_url.netloc.lower()
+    if host in ("gitee.com", "github.com") and len(parts) >= 5 and parts[2] == "raw":
+        # https://gitee.com/owner/repo/raw/branch/path
+        owner, repo, branch, path = parts[0], parts[1], parts[3], "/".join(parts[4:])
+    elif host == "raw.githubusercontent.com" and len(parts) >= 4:
+        # https://raw.githubusercontent.com/owner/repo/branch/path
+        owner, repo, branch, path = parts[0], parts[1], parts[2], "/".join(parts[3:])
+    else:
+        return []
+    return [
+        f"https://gitee.com/{owner}/{repo}/raw/{branch}/{path}",
+        f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{path}"
+    ]
+
+
+class MirrorSelector:
+    """镜像选择器：并发竞速首字节选出最快的镜像，并持久化各镜像的吞吐量和错误统计"""
+    def __init__(self, stats_path=MIRROR_STATS_PATH, client=None):
+        self.stats_path = stats_path
+        self.client = client or get_http_client()
+        # 计数的读取和写回需要在同一把锁内完成
+        self.lock = threading.RLock()
+        self.stats = self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.stats_path):
+                with open(self.stats_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"[CCXManager] 加载镜像统计失败: {str(e)}")
+        return {}
+
+    def _save(self):
+        try:
+            tmp_path = self.stats_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.stats, f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.stats_path)
+        except Exception as e:
+            print(f"[CCXManager] 保存镜像统计失败: {str(e)}")
+
+    def _key(self, url):
+        return urlparse(url).netloc.lower()
+
+    def _update(self, url, **values):
+        with self.lock:
+            entry = self.stats.setdefault(self._key(url), {
+                "successes": 0,
+                "failures": 0,
+                "ttfb_ms": None,
+                "throughput_bps": None,
+                "last_error": ""
+            })
+            for name, value in values.items():
+                if name in ("ttfb_ms", "throughput_bps"):
+                    old_value = entry.get(name)
+                    entry[name] = value if old_value is None else old_value * (1 - EWMA_ALPHA) + value * EWMA_ALPHA
+                else:
+                    entry[name] = value
+            entry["updated_time"] = time.time()
+            self._save()
+
+    def record_success(self, url, size, seconds):
+        """记录一次完整下载的吞吐量"""
+        with self.lock:
+            successes = self.stats.get(self._key(url), {}).get("successes", 0)
+            self._update(url, successes=successes + 1, throughput_bps=size / max(seconds, 1e-3))
+
+    def record_failure(self, url, error):
+        """记录一次失败"""
+        with self.lock:
+            failures = self.stats.get(self._key(url), {}).get("failures", 0)
+            self._update(url, failures=failures + 1, last_error=str(error)[:200])
+
+    def score(self, url):
+        """镜像得分，越大越优先：吞吐量越高、首字节越快、失败率越低越好；没有统计的镜像取中间值"""
+        with self.lock:
+            entry = self.stats.get(self._key(url))
+        if not entry:
+            return 0.0
+        total = entry.get("successes", 0) + entry.get("failures", 0)
+        success_rate = entry.get("successes", 0) / total if total else 0.5
+        throughput = entry.get("throughput_bps") or 0
+        ttfb = entry.get("ttfb_ms") or 1000
+        return success_rate * (throughput / 1024 + 1000.0 / (ttfb + 1))
+
+    def rank(self, urls):
+        """按历史统计对镜像排序（稳定排序，统计相同时保持原有顺序）"""
+        return sorted(urls, key=self.score, reverse=True)
+
+    def race(self, urls, headers=None, max_candidates=3):
+        """并发请求前几名镜像的首字节，返回最快响应的url，其余请求随即关闭；全部失败时返回None"""
+        candidates = self.rank(urls)[:max_candidates]
+        if len(candidates) <= 1:
+            return candidates[0] if candidates else None
+
+        finished = threading.Event()
+
+        def first_byte(url):
+            start = time.time()
+            request_headers = dict(headers or {})
+            request_headers["Range"] = "bytes=0-0"
+            # 竞速只尝试一次，失败的镜像直接淘汰
+            response = self.client.get(url, headers=request_headers, stream=True, max_retries=0)
+            try:
+                if response.status_code not in (200, 206, 304):
+                    response.raise_for_status()
+                if response.status_code != 304 and not finished.is_set():
+                    next(response.iter_content(chunk_size=1), b"")
+                return url, (time.time() - start) * 1000
+            finally:
+                response.close()
+
+        executor = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="CCXManager-mirror")
+        futures = {executor.submit(first_byte, url): url for url in candidates}
+        winner = None
+        try:
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    _, ttfb_ms = future.result()
+                except Exception as e:
+                    self.record_failure(url, e)
+                    continue
+                self._update(url, ttfb_ms=ttfb_ms)
+                winner = url
+                break
+        finally:
+            # 其余请求不再等待，完成后自行关闭连接
+            finished.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if winner:
+            print(f"[CCXManager] 镜像竞速胜出: {winner}")
+        return winner
+
+
+_shared_selector = None
+_shared_selector_lock = threading.Lock()
+
+
+def get_mirror_selector():
+    """获取进程内共享的镜像选择器，多个下载任务共用同一份统计，避免并发写入mirror_stats.json时互相覆盖"""
+    global _shared_selector
+    with _shared_selector_lock:
+        if _shared_selector is None:
+            _shared_selector = MirrorSelector()
+        return _shared_selector
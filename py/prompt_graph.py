@@ -0,0 +1,203 @@
+import json
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 每次提交时重新随机的种子输入名（noise_seed 为部分采样节点使用的名称）
+SEED_INPUTS = ("seed", "noise_seed")
+MAX_SEED = 0xffffffffffffffff
+
+
+def hash_prompt(prompt):
+    """计算 API prompt 的内容哈希（键排序后的 JSON），用作编译结果的缓存 key"""
+    return hashlib.sha1(json.dumps(prompt, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def structural_hash(prompt, seed_inputs=SEED_INPUTS):
+    """忽略种子取值的结构哈希：只有种子不同的两个 prompt 哈希相同"""
+    normalized = {}
+    for node_id, node_data in prompt.items():
+        inputs = node_data.get("inputs", {})
+        if any(name in inputs and not isinstance(inputs[name], list) for name in seed_inputs):
+            node_data = dict(node_data)
+            node_data["inputs"] = {
+                name: None if name in seed_inputs and not isinstance(value, list) else value
+                for name, value in inputs.items()
+            }
+        normalized[node_id] = node_data
+    return hash_prompt(normalized)
+
+
+def build_adjacency(prompt):
+    """预先建立依赖索引：节点 ID -> 按输入顺序排列的源节点 ID 列表"""
+    adjacency = {}
+    for node_id, node_data in prompt.items():
+        sources = []
+        for input_value in node_data.get("inputs", {}).values():
+            if isinstance(input_value, list):
+                # 标准输入格式: [source_node_id, output_index]
+                if input_value and input_value[0] is not None and input_value[0] != "":
+                    sources.append(str(input_value[0]))
+            elif isinstance(input_value, dict) and input_value.get("link_id"):
+                # 某些节点可能使用link_id格式
+                sources.append(str(input_value["link_id"]))
+        adjacency[str(node_id)] = sources
+    return adjacency
+
+
+def collect_dependencies(adjacency, output_node_ids):
+    """从输出节点收集所有依赖节点，返回节点 ID 元组
+
+    使用显式栈迭代遍历，深层工作流不会触发递归深度限制；
+    先序顺序与前端 queueManager.recursiveAddNodes 的递归遍历一致
+    """
+    collected = OrderedDict()
+    for output_id in output_node_ids:
+        stack = [str(output_id)]
+        while stack:
+            current_id = stack.pop()
+            if current_id in collected or current_id not in adjacency:
+                continue
+            collected[current_id] = None
+            stack.extend(reversed(adjacency[current_id]))
+    return tuple(collected)
+
+
+class PromptTemplate:
+    """编译后的 prompt 模板：一次性记录可替换的种子槽位
+
+    instantiate 以结构共享方式生成新 prompt，只复制被修改的节点，模板本身和来源 prompt 保持不变
+    """
+    def __init__(self, prompt, seed_inputs=SEED_INPUTS):
+        self.prompt = prompt
+        # 连线输入（[源节点, 输出索引]）不是种子值，不替换
+        self.seed_slots = tuple(
+            (node_id, input_name)
+            for node_id, node_data in prompt.items()
+            for input_name in seed_inputs
+            if input_name in node_data.get("inputs", {}) and not isinstance(node_data["inputs"][input_name], list)
+        )
+
+    def instantiate(self, rng=random):
+        """返回写入新随机种子的 prompt，未修改的节点与模板共享"""
+        prompt = dict(self.prompt)
+        copied = {}
+        for node_id, input_name in self.seed_slots:
+            node_data = copied.get(node_id)
+            if node_data is None:
+                node_data = dict(self.prompt[node_id])
+                node_data["inputs"] = dict(node_data["inputs"])
+                copied[node_id] = prompt[node_id] = node_data
+            node_data["inputs"][input_name] = rng.randint(0, MAX_SEED)
+        return prompt
+
+
+class SubgraphPlanCache:
+    """按 (完整 prompt 哈希, 输出节点) 缓存编译好的子图节点列表
+
+    同一个完整 prompt 的依赖索引只建立一次，由不同输出节点组合共享；重复执行时只需按节点列表取值
+    """
+    def __init__(self, max_prompts=8, max_plans=64):
+        self.max_prompts = max_prompts
+        self.max_plans = max_plans
+        self.adjacency = OrderedDict()
+        self.plans = OrderedDict()
+        self.templates = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _get_adjacency(self, full_prompt, prompt_hash):
+        adjacency = self.adjacency.get(prompt_hash)
+        if adjacency is None:
+            adjacency = build_adjacency(full_prompt)
+            self.adjacency[prompt_hash] = adjacency
+            while len(self.adjacency) > self.max_prompts:
+                self.adjacency.popitem(last=False)
+        else:
+            self.adjacency.move_to_end(prompt_hash)
+        return adjacency
+
+    def get_plan(self, full_prompt, output_node_ids, prompt_hash=None):
+        """返回输出节点及其依赖的节点 ID 元组；prompt_hash 为空时现场计算"""
+        if prompt_hash is None:
+            prompt_hash = hash_prompt(full_prompt)
+        key = (prompt_hash, tuple(str(node_id) for node_id in output_node_ids))
+        with self.lock:
+            plan = self.plans.get(key)
+            if plan is not None:
+                self.plans.move_to_end(key)
+                return plan
+            plan = collect_dependencies(self._get_adjacency(full_prompt, prompt_hash), key[1])
+            self.plans[key] = plan
+            while len(self.plans) > self.max_plans:
+                self.plans.popitem(last=False)
+            return plan
+
+    def get_template(self, full_prompt, output_node_ids, prompt_hash=None):
+        """返回子图的 PromptTemplate，与节点列表使用相同的缓存 key"""
+        if prompt_hash is None:
+            prompt_hash = hash_prompt(full_prompt)
+        key = (prompt_hash, tuple(str(node_id) for node_id in output_node_ids))
+        with self.lock:
+            template = self.templates.get(key)
+            if template is not None:
+                self.templates.move_to_end(key)
+                return template
+        plan = self.get_plan(full_prompt, key[1], prompt_hash)
+        template = PromptTemplate({node_id: full_prompt[node_id] for node_id in plan})
+        with self.lock:
+            self.templates[key] = template
+            while len(self.templates) > self.max_plans:
+                self.templates.popitem(last=False)
+        return template
+
+    def clear(self):
+        with self.lock:
+            self.adjacency.clear()
+            self.plans.clear()
+            self.templates.clear()
+
+
+class ValidationCache:
+    """validate_prompt 结果缓存（只缓存验证通过的 prompt 及其输出节点列表），带命中统计"""
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """返回缓存的输出节点列表（副本），未命中时返回None"""
+        with self.lock:
+            outputs = self.entries.get(key)
+            if outputs is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return list(outputs)
+
+    def put(self, key, outputs):
+        with self.lock:
+            self.entries[key] = tuple(outputs)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self):
+        """清空缓存（节点定义重新加载时调用），返回清除的条目数"""
+        with self.lock:
+            count = len(self.entries)
+            self.entries.clear()
+            return count
+
+    def get_stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import urlparse
+from .http_client import get_http_client
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "revision_cache.json")
+
+
+def normalize_repo_key(repo_url, branch="main"):
+    """将不同格式的仓库URL统一为缓存key，如 github.com/owner/repo@main"""
+    url = repo_url.strip()
+    if url.startswith("git@"):
+        # SSH格式: git@github.com:owner/repo.git
+        host, _, path = url[4:].partition(":")
+    else:
+        parsed_url = urlparse(url)
+        host, path = parsed_url.netloc, parsed_url.path
+    path = path.strip("/")
+    if path.endswith(".git"):
+        path = path[:-4]
+    return f"{host.lower()}/{path.lower()}@{branch}"
+
+
+class RemoteRevisionCache:
+    """进程内共享、持久化到磁盘的远程版本缓存
+
+    同时服务于CCX下载器和ComfyUI侧更新器，GitHub API请求携带ETag，304响应不计入速率限制
+    """
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, ttl_seconds=300):
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        # 每个key一把锁：并发查询同一仓库时只有一个线程请求GitHub API，其余等待后直接读缓存
+        self.key_locks = {}
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"[CCXManager] 加载远程版本缓存失败: {str(e)}")
+        return {}
+
+    def _save(self):
+        try:
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"[CCXManager] 保存远程版本缓存失败: {str(e)}")
+
+    def get(self, key, allow_stale=False):
+        """返回缓存的SHA，过期时返回None（allow_stale为True时仍返回）"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            if allow_stale or time.time() - entry.get("checked_time", 0) < self.ttl_seconds:
+                return entry.get("sha")
+            return None
+
+    def put(self, key, sha, etag=None):
+        """写入缓存；etag为None时若SHA未变则保留原有ETag"""
+        with self.lock:
+            old_entry = self.entries.get(key, {})
+            if etag is None:
+                etag = old_entry.get("etag", "") if old_entry.get("sha") == sha else ""
+            self.entries[key] = {"sha": sha, "etag": etag, "checked_time": time.time()}
+            self._save()
+
+    def invalidate(self, key=None):
+        """使指定key（或全部）缓存失效"""
+        with self.lock:
+            if key is None:
+                self.entries = {}
+            else:
+                self.entries.pop(key, None)
+            self._save()
+
+    def _key_lock(self, key):
+        with self.lock:
+            key_lock = self.key_locks.get(key)
+            if key_lock is None:
+                key_lock = self.key_locks[key] = threading.Lock()
+            return key_lock
+
+    def github_commit(self, owner, repo, branch="main"):
+        """通过GitHub API获取分支最新commit，带ETag条件请求；失败时抛出异常
+
+        同一key的查询、API请求和写入串行执行，并发调用只产生一次请求
+        """
+        key = normalize_repo_key(f"https://github.com/{owner}/{repo}", branch)
+        with self._key_lock(key):
+            return self._github_commit(key, owner, repo, branch)
+
+    def _github_commit(self, key, owner, repo, branch):
+        sha = self.get(key)
+        if sha:
+            return sha
+
+        with self.lock:
+            entry = dict(self.entries.get(key, {}))
+        headers = {}
+        if entry.get("etag") and entry.get("sha"):
+            headers["If-None-Match"] = entry["etag"]
+
+        api_url = f"https://api.github.com/repos/{owner}/{repo}/commits/{branch}"
+        response = get_http_client().get(api_url, headers=headers)
+        if response.status_code == 304:
+            # 内容未变化，刷新检查时间即可
+            self.put(key, entry["sha"], entry["etag"])
+            return entry["sha"]
+        response.raise_for_status()
+        sha = response.json()["sha"]
+        self.put(key, sha, response.headers.get("ETag", ""))
+        return sha
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_revision_cache():
+    """获取进程内共享的远程版本缓存实例"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = RemoteRevisionCache()
+        return _shared_cache
@@ -0,0 +1,104 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class StartupOrchestrator:
+    """启动任务编排器：在后台线程中执行启动任务，按key去重，无依赖关系的任务并发执行"""
+    def __init__(self, name="CCXManager", max_workers=4):
+        self.name = name
+        self.max_workers = max_workers
+        self.jobs = {}  # key -> 任务信息，保持注册顺序
+        self.lock = threading.Lock()
+        self.done_event = threading.Event()
+        self.thread = None
+
+    def add_job(self, key, func, depends_on=()):
+        """注册启动任务，同一个key只会执行一次，返回是否为新注册的任务"""
+        with self.lock:
+            if key in self.jobs:
+                print(f"[{self.name}] 启动任务 {key} 已注册，忽略重复任务")
+                return False
+            self.jobs[key] = {
+                "func": func,
+                "depends_on": list(depends_on),
+                "status": "pending",
+                "start_time": None,
+                "duration": None,
+                "error": None
+            }
+            return True
+
+    def start(self):
+        """在后台线程中开始执行所有已注册的任务，不阻塞调用方"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._run_all, name=f"{self.name}-startup", daemon=True)
+        self.thread.start()
+
+    def wait(self, timeout=None):
+        """等待所有任务完成，返回是否已全部完成"""
+        return self.done_event.wait(timeout)
+
+    def get_report(self):
+        """返回每个任务的状态和耗时"""
+        with self.lock:
+            return {
+                key: {
+                    "status": job["status"],
+                    "duration": job["duration"],
+                    "error": job["error"]
+                }
+                for key, job in self.jobs.items()
+            }
+
+    def _run_job(self, key):
+        job = self.jobs[key]
+        job["status"] = "running"
+        job["start_time"] = time.time()
+        try:
+            job["func"]()
+            job["status"] = "success"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            print(f"[{self.name}] 启动任务 {key} 失败: {str(e)}")
+        finally:
+            job["duration"] = time.time() - job["start_time"]
+
+    def _run_all(self):
+        total_start = time.time()
+        try:
+            with self.lock:
+                keys = list(self.jobs)
+            futures = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.name}-job") as executor:
+                # 依赖任务完成后才提交，不存在的依赖视为已满足
+                pending = list(keys)
+                while pending:
+                    ready = []
+                    for key in pending:
+                        deps = [dep for dep in self.jobs[key]["depends_on"] if dep in self.jobs]
+                        if all(dep in futures and futures[dep].done() for dep in deps):
+                            ready.append(key)
+                    for key in ready:
+                        futures[key] = executor.submit(self._run_job, key)
+                        pending.remove(key)
+                    if pending:
+                        running = [future for future in futures.values() if not future.done()]
+                        if running:
+                            wait(running, return_when=FIRST_COMPLETED)
+                        elif not ready:
+                            # 循环依赖，剩余任务直接执行
+                            for key in pending:
+                                futures[key] = executor.submit(self._run_job, key)
+                            pending = []
+
+            report = self.get_report()
+            summary = ", ".join(
+                f"{key}: {info['status']} {info['duration']:.2f}s" for key, info in report.items() if info["duration"] is not None
+            )
+            print(f"[{self.name}] 后台启动任务完成，总耗时{time.time() - total_start:.2f}s ({summary})")
+        finally:
+            self.done_event.set()
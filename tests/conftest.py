@@ -0,0 +1,318 @@
+import io
+import os
+import sys
+import time
+import types
+import asyncio
+import importlib
+import zipfile
+import threading
+import http.server
+import pytest
+from pathlib import Path
+from aiohttp import web
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ComfyUI以包的形式加载插件；测试时只注册包路径，不执行__init__.py（会启动更新调度器）
+if "ccxmanager" not in sys.modules:
+    package = types.ModuleType("ccxmanager")
+    package.__path__ = [REPO_ROOT]
+    sys.modules["ccxmanager"] = package
+
+from ccxmanager.py import http_client, revision_cache, startup_jobs, mirror_selector
+from ccxmanager.py.git_runner import run_git
+from ccxmanager.py.ccx_cache import CCXCache
+
+# ccx_downloader_node导入时会在后台启动自动运行任务（访问GitHub并在插件目录写配置），测试中不执行
+startup_jobs.StartupOrchestrator.start = lambda self: None
+
+
+class PluginRootCollector:
+    """插件根目录带__init__.py，按普通目录收集，避免pytest把它当作包导入（需要ComfyUI环境）"""
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collect_directory(self, path, parent):
+        if path == Path(REPO_ROOT):
+            return pytest.Dir.from_parent(parent, path=path)
+
+
+def pytest_configure(config):
+    # conftest中的钩子只作用于tests目录，根目录的收集需要全局注册
+    config.pluginmanager.register(PluginRootCollector(), "ccxmanager-root-collector")
+
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    """支持Range和If-None-Match的静态文件服务，记录每个请求的路径和Range头"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("Range")))
+        data = server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        if self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.send_header("ETag", server.etag)
+            self.end_headers()
+            return
+        delay = server.delays.get(self.path)
+        if delay:
+            threading.Event().wait(delay)
+
+        start, end = 0, len(data) - 1
+        range_header = self.headers.get("Range")
+        if range_header and range_header.startswith("bytes="):
+            first, last = range_header[len("bytes="):].split("-")
+            start = int(first)
+            end = min(int(last), end) if last else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            self.send_response(200)
+        body = data[start:end + 1]
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", server.etag)
+        self.end_headers()
+
+        # 模拟传输中断：只发送一半内容后断开连接
+        if server.truncate > 0 and len(body) > 1:
+            server.truncate -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def start_range_server():
+    """启动本地HTTP服务的工厂（每个服务的端口不同，可模拟多个镜像主机），测试结束时全部关闭
+
+    files为路径到内容的映射，truncate为需要中途断开的响应数，delays为各路径的响应延迟（秒）
+    """
+    servers = []
+
+    def start():
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+        server.files = {}
+        server.delays = {}
+        server.requests = []
+        server.truncate = 0
+        server.etag = '"v1"'
+        server.url = lambda path: f"http://127.0.0.1:{server.server_address[1]}{path}"
+        # 客户端提前关闭连接（竞速落败、模拟中断）属于预期情况，不输出异常
+        server.handle_error = lambda request, client_address: None
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def range_server(start_range_server):
+    return start_range_server()
+
+
+@pytest.fixture
+def ccx_archive():
+    """生成不压缩的CCX压缩包内容，payload_size为其中随机数据的字节数"""
+    def build(payload_size):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as zip_ref:
+            zip_ref.writestr("manifest.xml", "<manifest/>")
+            zip_ref.writestr("assets/payload.bin", os.urandom(payload_size))
+        return buffer.getvalue()
+    return build
+
+
+@pytest.fixture
+def node(tmp_path, monkeypatch):
+    """配置、临时目录和缓存都放在tmp_path下的CCXManagerNode"""
+    from ccxmanager import ccx_downloader_node
+    monkeypatch.setattr(ccx_downloader_node, "CCXCache", lambda cache_dir: CCXCache(str(tmp_path / "ccx_cache")))
+    return ccx_downloader_node.CCXManagerNode(str(tmp_path / "config.json"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """共享的HTTP客户端、远程版本缓存和镜像选择器改用临时目录，测试不在插件目录下写文件"""
+    monkeypatch.setattr(http_client, "_shared_client", http_client.HTTPClient(str(tmp_path / "http_config.json")))
+    monkeypatch.setattr(revision_cache, "_shared_cache", revision_cache.RemoteRevisionCache(str(tmp_path / "revision_cache.json")))
+    monkeypatch.setattr(mirror_selector, "_shared_selector", mirror_selector.MirrorSelector(str(tmp_path / "mirror_stats.json")))
+
+
+def git(args, cwd=None):
+    result = run_git(args, cwd=cwd)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """本地上游仓库：main分支3个提交，另有other分支；通过file://访问，使--depth/--filter生效"""
+    for name in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{name}_NAME", "test")
+        monkeypatch.setenv(f"GIT_{name}_EMAIL", "test@example.com")
+    bare_path = str(tmp_path / "upstream.git")
+    work_path = str(tmp_path / "work")
+    git(["init", "-q", "--bare", "-b", "main", bare_path])
+    git(["config", "uploadpack.allowFilter", "true"], cwd=bare_path)
+    git(["clone", "-q", bare_path, work_path])
+
+    def commit(message):
+        with open(os.path.join(work_path, "node.py"), 'a', encoding='utf-8') as f:
+            f.write(f"# {message}\n")
+        git(["add", "node.py"], cwd=work_path)
+        git(["commit", "-q", "-m", message], cwd=work_path)
+        git(["push", "-q", "origin", "HEAD:main"], cwd=work_path)
+        return git(["rev-parse", "HEAD"], cwd=work_path)
+
+    for i in range(3):
+        commit(f"commit {i}")
+    git(["push", "-q", "origin", "HEAD:other"], cwd=work_path)
+    return {"url": Path(bare_path).as_uri(), "commit": commit}
+
+
+class FakePromptQueue:
+    """ComfyUI PromptQueue的最小实现：按提交顺序执行，记录执行历史"""
+    def __init__(self):
+        self.queue = []
+        self.running = []
+        self.history = {}
+        self.put_items = []
+        self.max_pending = 0
+        self.condition = threading.Condition()
+
+    def put(self, item):
+        with self.condition:
+            self.queue.append(item)
+            self.put_items.append(item)
+            self.max_pending = max(self.max_pending, len(self.queue) + len(self.running))
+            self.condition.notify_all()
+
+    def get_current_queue(self):
+        with self.condition:
+            return list(self.running), list(self.queue)
+
+    def delete_queue_item(self, function):
+        with self.condition:
+            for item in self.queue:
+                if function(item):
+                    self.queue.remove(item)
+                    return True
+        return False
+
+
+class FakeComfyUI:
+    """替代server/execution/nodes模块：事件循环线程 + 模拟prompt_worker的执行线程
+
+    执行线程像ComfyUI一样只在prompt带client_id时发送执行事件；
+    duration为每个prompt的执行时长，outcome(item)返回结束事件名，hold清除时不再取出新的prompt
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.routes = web.RouteTableDef()
+        self.prompt_queue = FakePromptQueue()
+        self.number = 0
+        self.sent = []
+        self.validate_calls = 0
+        self.node_class_mappings = {"SaveImage": object}
+        self.interrupts = 0
+        self.duration = 0.02
+        self.outcome = lambda item: "execution_success"
+        self.hold = threading.Event()
+        self.hold.set()
+        self.stopped = False
+        self.threads = [
+            threading.Thread(target=self.loop.run_forever, daemon=True),
+            threading.Thread(target=self.work, daemon=True)
+        ]
+
+    def send_sync(self, event, data, sid=None):
+        self.sent.append((event, data, sid))
+
+    async def validate_prompt(self, prompt_id, prompt, partial_execution_list):
+        self.validate_calls += 1
+        outputs = [node_id for node_id, node_data in prompt.items() if node_data.get("class_type") == "SaveImage"]
+        if not outputs:
+            return (False, {"message": "Prompt has no outputs"}, [], {})
+        return (True, None, outputs, {})
+
+    def interrupt_processing(self, value=True):
+        self.interrupts += 1
+
+    def work(self):
+        prompt_queue = self.prompt_queue
+        while not self.stopped:
+            self.hold.wait(0.1)
+            with prompt_queue.condition:
+                if not self.hold.is_set() or not prompt_queue.queue:
+                    prompt_queue.condition.wait(0.05)
+                    continue
+                item = prompt_queue.queue.pop(0)
+                prompt_queue.running.append(item)
+            client_id = item[3].get("client_id")
+            if client_id:
+                self.send_sync("execution_start", {"prompt_id": item[1]}, client_id)
+            time.sleep(self.duration)
+            event = self.outcome(item)
+            if client_id or event == "execution_interrupted":
+                self.send_sync(event, {"prompt_id": item[1]}, client_id)
+            with prompt_queue.condition:
+                prompt_queue.running.remove(item)
+                prompt_queue.history[item[1]] = {"outputs": {}}
+            if client_id:
+                self.send_sync("executing", {"node": None, "prompt_id": item[1]}, client_id)
+
+    def install(self, monkeypatch):
+        """把伪造的模块放入sys.modules并重新导入lgutils，返回新导入的模块"""
+        server = types.ModuleType("server")
+        server.PromptServer = type("PromptServer", (), {"instance": self})
+        execution = types.ModuleType("execution")
+        execution.validate_prompt = self.validate_prompt
+        nodes = types.ModuleType("nodes")
+        nodes.NODE_CLASS_MAPPINGS = self.node_class_mappings
+        nodes.interrupt_processing = self.interrupt_processing
+        for name, module in (("server", server), ("execution", execution), ("nodes", nodes)):
+            monkeypatch.setitem(sys.modules, name, module)
+        monkeypatch.delitem(sys.modules, "ccxmanager.py.lgutils", raising=False)
+        lgutils = importlib.import_module("ccxmanager.py.lgutils")
+        monkeypatch.setitem(sys.modules, "ccxmanager.py.lgutils", lgutils)
+        for thread in self.threads:
+            thread.start()
+        return lgutils
+
+    def shutdown(self):
+        self.stopped = True
+        self.hold.set()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+
+@pytest.fixture
+def comfyui(monkeypatch):
+    """伪造的ComfyUI服务器，comfyui.lgutils为基于它导入的lgutils模块"""
+    fake = FakeComfyUI()
+    fake.lgutils = fake.install(monkeypatch)
+    yield fake
+    for job in fake.lgutils._backend_executor.get_job_status():
+        fake.lgutils._backend_executor.cancel_job(job["id"], interrupt=False)
+    fake.shutdown()
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
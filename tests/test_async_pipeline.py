@@ -0,0 +1,41 @@
+import asyncio
+
+from ccxmanager.py import async_pipeline
+from ccxmanager.py.async_pipeline import AsyncUpdatePipeline
+
+
+def test_cancel_running_job():
+    async def main():
+        pipeline = AsyncUpdatePipeline()
+
+        async def slow(job):
+            await asyncio.sleep(30)
+            return "done"
+
+        job_id = pipeline._start(asyncio.get_running_loop(), "slow", slow)
+        await asyncio.sleep(0.05)
+        assert pipeline.cancel(job_id)
+        await asyncio.sleep(0.05)
+        return pipeline.get_status(job_id)
+
+    status = asyncio.run(main())
+    assert status["status"] == "cancelled"
+    assert "finish_time" not in status
+
+
+def test_finished_jobs_are_pruned(monkeypatch):
+    monkeypatch.setattr(async_pipeline, "MAX_FINISHED_JOBS", 3)
+
+    async def main():
+        pipeline = AsyncUpdatePipeline()
+
+        async def quick(job):
+            return "ok"
+
+        job_ids = [pipeline._start(asyncio.get_running_loop(), "quick", quick) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        return job_ids, pipeline
+
+    job_ids, pipeline = asyncio.run(main())
+    assert list(pipeline.jobs) == job_ids[-3:]
+    assert all(job["status"] == "done" for job in pipeline.get_status())
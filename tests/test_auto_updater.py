@@ -0,0 +1,128 @@
+import os
+import subprocess
+import pytest
+
+from ccxmanager import auto_updater_node
+from ccxmanager.auto_updater_node import GitHubRepoUpdater
+from ccxmanager.py.git_runner import read_head, is_shallow, ensure_depth
+from conftest import git
+
+
+@pytest.fixture
+def updater(tmp_path, upstream):
+    updater = GitHubRepoUpdater()
+    updater.custom_nodes_path = str(tmp_path / "custom_nodes")
+    updater.updater_config_path = str(tmp_path / "updater_config.json")
+    updater.update_report_path = str(tmp_path / "update_report.json")
+    updater.mirror_cache_path = str(tmp_path / "mirror_cache")
+    updater.config = dict(updater.config, repos=[{
+        "repo_url": upstream["url"],
+        "node_name": "test-node",
+        "branch": "main",
+        "auto_update": True,
+        "last_commit_sha": "",
+        "last_update_time": ""
+    }], clone_depth=0, clone_filter="", single_branch=False, mirror_cache=False)
+    os.makedirs(updater.custom_nodes_path)
+    return updater
+
+
+def test_clone_args(updater):
+    assert updater.clone_args() == []
+    updater.config.update(clone_depth=1, clone_filter="blob:none", single_branch=True)
+    assert updater.clone_args() == ["--depth=1", "--filter=blob:none", "--single-branch"]
+
+
+@pytest.mark.parametrize("mirror_cache", [False, True])
+def test_shallow_single_branch_clone_and_update(updater, upstream, mirror_cache):
+    updater.config.update(clone_depth=1, single_branch=True, mirror_cache=mirror_cache)
+    repo_info = updater.config["repos"][0]
+    node_path = os.path.join(updater.custom_nodes_path, "test-node")
+
+    assert updater.update_repo(repo_info) == (True, "更新成功")
+    assert is_shallow(node_path)
+    assert git(["rev-list", "--count", "HEAD"], cwd=node_path) == "1"
+    assert git(["config", "remote.origin.fetch"], cwd=node_path) == "+refs/heads/main:refs/remotes/origin/main"
+    if mirror_cache:
+        mirror_path = updater.get_mirror_path(repo_info)
+        assert git(["for-each-ref", "--format=%(refname)"], cwd=mirror_path) == "refs/heads/main"
+
+    # 拉取时只增量获取新提交，仍保持浅克隆
+    new_sha = upstream["commit"]("commit 3")
+    assert updater.update_repo(repo_info) == (True, "更新成功")
+    assert read_head(node_path)[0] == new_sha
+    assert is_shallow(node_path)
+    assert git(["rev-list", "--count", "HEAD"], cwd=node_path) == "2"
+    assert repo_info["last_commit_sha"] == new_sha
+
+
+def test_partial_clone_filter(updater):
+    updater.config.update(clone_filter="blob:none")
+    repo_info = updater.config["repos"][0]
+    node_path = os.path.join(updater.custom_nodes_path, "test-node")
+
+    assert updater.update_repo(repo_info) == (True, "更新成功")
+    assert git(["config", "remote.origin.partialclonefilter"], cwd=node_path) == "blob:none"
+    with open(os.path.join(node_path, "node.py"), 'r', encoding='utf-8') as f:
+        assert f.read().count("\n") == 3
+
+
+def test_ensure_depth_deepens_shallow_clone(updater):
+    updater.config.update(clone_depth=1)
+    node_path = os.path.join(updater.custom_nodes_path, "test-node")
+    assert updater.update_repo(updater.config["repos"][0])[0]
+
+    assert ensure_depth(node_path, 3)
+    assert int(git(["rev-list", "--count", "HEAD"], cwd=node_path)) >= 3
+
+
+def test_fleet_mode_skips_dirty_discovered_repo(updater, upstream):
+    node_path = os.path.join(updater.custom_nodes_path, "patched-node")
+    git(["clone", "-q", upstream["url"], node_path])
+    updater.config.update(repos=[], fleet_mode=True)
+    assert updater.discover_repos() == 1
+    repo_info = updater.config["repos"][0]
+    assert repo_info["branch"] == "main"
+    assert repo_info["discovered"]
+
+    # 本地修改与上游的新提交冲突，不强制覆盖时保留本地修改
+    with open(os.path.join(node_path, "node.py"), 'a', encoding='utf-8') as f:
+        f.write("# local patch\n")
+    upstream["commit"]("commit 3")
+    success, message = updater.update_repo(repo_info)
+    assert not success
+    assert "本地更改" in message
+    with open(os.path.join(node_path, "node.py"), 'r', encoding='utf-8') as f:
+        assert "# local patch" in f.read()
+
+    assert updater.update_repo(repo_info, force_override=True) == (True, "更新成功")
+    with open(os.path.join(node_path, "node.py"), 'r', encoding='utf-8') as f:
+        assert "# local patch" not in f.read()
+
+
+def test_fleet_mode_detached_head_uses_remote_default_branch(updater, upstream):
+    pinned_path = os.path.join(updater.custom_nodes_path, "pinned-node")
+    git(["clone", "-q", upstream["url"], pinned_path])
+    git(["checkout", "-q", "--detach", "HEAD~1"], cwd=pinned_path)
+    orphan_path = os.path.join(updater.custom_nodes_path, "orphan-node")
+    git(["clone", "-q", upstream["url"], orphan_path])
+    git(["checkout", "-q", "--detach"], cwd=orphan_path)
+    git(["remote", "set-head", "origin", "--delete"], cwd=orphan_path)
+    updater.config.update(repos=[], fleet_mode=True)
+
+    assert updater.discover_repos() == 1
+    assert [(repo["node_name"], repo["branch"]) for repo in updater.config["repos"]] == [("pinned-node", "main")]
+
+
+def test_timed_out_clone_removes_partial_directory(updater, monkeypatch):
+    node_path = os.path.join(updater.custom_nodes_path, "test-node")
+
+    def timed_out_clone(args, cwd=None, timeout=None, env=None):
+        os.makedirs(os.path.join(args[-1], ".git"))
+        return subprocess.CompletedProcess(["git"] + args, 124, "", "git clone 超时(3600秒)")
+
+    monkeypatch.setattr(auto_updater_node, "run_git", timed_out_clone)
+    success, message = updater.update_repo(updater.config["repos"][0])
+    assert not success
+    assert "超时" in message
+    assert not os.path.exists(node_path)
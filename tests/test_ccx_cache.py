@@ -0,0 +1,47 @@
+import os
+
+from ccxmanager.py.ccx_cache import CCXCache
+
+
+def test_store_lookup_and_conditional_headers(tmp_path):
+    cache = CCXCache(str(tmp_path / "cache"))
+    url = "https://example.com/plugin.ccx"
+    assert cache.lookup(url) is None
+    assert cache.conditional_headers(None) == {}
+
+    download = tmp_path / "plugin.ccx"
+    download.write_bytes(b"v1")
+    entry = cache.store(url, str(download), etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    assert not download.exists()
+    assert cache.lookup(url) == entry
+    assert cache.conditional_headers(entry) == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+    # 同一URL的新内容替换旧条目，不再被引用的旧文件被清理
+    download.write_bytes(b"v2")
+    new_entry = cache.store(url, str(download), etag='"v2"')
+    assert new_entry["sha256"] != entry["sha256"]
+    assert not os.path.exists(cache.blob_path(entry["sha256"]))
+
+    # 缓存文件丢失时视为未命中
+    os.remove(cache.blob_path(new_entry["sha256"]))
+    assert cache.lookup(url) is None
+
+
+def test_download_from_url_reuses_cache_on_304(range_server, node, ccx_archive):
+    range_server.files["/plugin.ccx"] = ccx_archive(16 * 1024)
+    url = range_server.url("/plugin.ccx")
+    cached_path, _ = node.download_from_url(url)
+
+    range_server.requests.clear()
+    assert node.download_from_url(url) == (cached_path, "plugin.ccx")
+    # 只发出一次条件请求，服务器返回304后直接复用缓存
+    assert len(range_server.requests) == 1
+
+    new_data = ccx_archive(16 * 1024)
+    range_server.files["/plugin.ccx"] = new_data
+    range_server.etag = '"v2"'
+    new_path, _ = node.download_from_url(url)
+    assert new_path != cached_path
+    with open(new_path, 'rb') as f:
+        assert f.read() == new_data
+    assert not os.path.exists(cached_path)
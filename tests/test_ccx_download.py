@@ -0,0 +1,88 @@
+import os
+import hashlib
+import pytest
+
+from ccxmanager.py.ccx_download import SegmentedDownloader, DownloadVerificationError
+
+
+def test_resume_uses_range_after_interrupt(range_server, tmp_path):
+    data = os.urandom(300 * 1024)
+    range_server.files["/plugin.ccx"] = data
+    range_server.truncate = 1
+    dest_path = str(tmp_path / "plugin.ccx")
+
+    with pytest.raises(Exception):
+        SegmentedDownloader(segments=1, max_retries=0).download(range_server.url("/plugin.ccx"), dest_path)
+    part_size = os.path.getsize(dest_path + ".part")
+    assert 0 < part_size < len(data)
+
+    result = SegmentedDownloader(segments=1).download(range_server.url("/plugin.ccx"), dest_path, expected_sha256=hashlib.sha256(data).hexdigest())
+    assert result["status"] == "ok"
+    assert range_server.requests[-1] == ("/plugin.ccx", f"bytes={part_size}-")
+    with open(dest_path, 'rb') as f:
+        assert f.read() == data
+    assert not os.path.exists(dest_path + ".part")
+    assert not os.path.exists(dest_path + ".part.json")
+
+
+def test_segmented_download(range_server, tmp_path):
+    data = os.urandom(512 * 1024 + 7)
+    range_server.files["/plugin.ccx"] = data
+    dest_path = str(tmp_path / "plugin.ccx")
+
+    result = SegmentedDownloader(segments=4, min_segment_size=64 * 1024).download(range_server.url("/plugin.ccx"), dest_path)
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
+    segment_requests = [header for _, header in range_server.requests if header != "bytes=0-0"]
+    assert len(segment_requests) == 4
+    with open(dest_path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_sha256_mismatch_discards_part(range_server, tmp_path):
+    range_server.files["/plugin.ccx"] = os.urandom(64 * 1024)
+    dest_path = str(tmp_path / "plugin.ccx")
+
+    with pytest.raises(DownloadVerificationError):
+        SegmentedDownloader().download(range_server.url("/plugin.ccx"), dest_path, expected_sha256="0" * 64)
+    assert not os.path.exists(dest_path)
+    assert not os.path.exists(dest_path + ".part")
+
+
+def test_download_from_url_resumes_part_from_previous_run(range_server, node, ccx_archive):
+    data = ccx_archive(256 * 1024)
+    range_server.files["/plugin.ccx"] = data
+    url = range_server.url("/plugin.ccx")
+    node.config["download_segments"] = 1
+
+    # 第一次运行的每次尝试都被中断，留下.part
+    range_server.truncate = 100
+    assert node.download_from_url(url) == (None, None)
+    part_size = os.path.getsize(os.path.join(node.temp_dir, "plugin.ccx.part"))
+
+    # 再次运行时URL不变，沿用上次的.part从断点续传
+    range_server.truncate = 0
+    cached_path, filename = node.download_from_url(url)
+    assert filename == "plugin.ccx"
+    assert range_server.requests[-1] == ("/plugin.ccx", f"bytes={part_size}-")
+    assert all(path == "/plugin.ccx" for path, _ in range_server.requests)
+    with open(cached_path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_segmented_part_is_not_resumed_by_single_connection(range_server, tmp_path):
+    data = os.urandom(512 * 1024)
+    range_server.files["/plugin.ccx"] = data
+    range_server.truncate = 4
+    dest_path = str(tmp_path / "plugin.ccx")
+
+    with pytest.raises(Exception):
+        SegmentedDownloader(segments=4, min_segment_size=64 * 1024, max_retries=0).download(range_server.url("/plugin.ccx"), dest_path)
+    # 分段下载预分配的.part已是完整大小
+    assert os.path.getsize(dest_path + ".part") == len(data)
+
+    range_server.requests.clear()
+    result = SegmentedDownloader(segments=1).download(range_server.url("/plugin.ccx"), dest_path)
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
+    assert range_server.requests[-1] == ("/plugin.ccx", None)
+    with open(dest_path, 'rb') as f:
+        assert f.read() == data
@@ -0,0 +1,94 @@
+import os
+import zipfile
+import pytest
+
+from ccxmanager.py.ccx_installer import DifferentialInstaller, parallel_extract
+
+
+def make_ccx(path, files):
+    with zipfile.ZipFile(path, 'w') as zip_ref:
+        for name, content in files.items():
+            zip_ref.writestr(name, content)
+    return str(path)
+
+
+@pytest.fixture
+def installed(tmp_path):
+    """已完整安装过一次的目标目录及对应的安装器"""
+    target_path = str(tmp_path / "plugin")
+    installer = DifferentialInstaller(str(tmp_path / "manifest.json"))
+    zip_path = make_ccx(tmp_path / "v1.ccx", {
+        "manifest.xml": b"v1",
+        "js/main.js": b"main v1",
+        "js/old/legacy.js": b"legacy",
+        "assets/icon.png": b"icon"
+    })
+    plan = installer.plan(zip_path, target_path)
+    assert plan["full"]
+    parallel_extract(zip_path, target_path, max_workers=2)
+    installer.save_manifest(target_path, plan["members"])
+    return installer, target_path
+
+
+def test_plan_writes_only_changed_members(installed, tmp_path):
+    installer, target_path = installed
+    zip_path = make_ccx(tmp_path / "v2.ccx", {
+        "manifest.xml": b"v1",
+        "js/main.js": b"main v2",
+        "assets/icon.png": b"icon",
+        "js/new.js": b"new"
+    })
+
+    plan = installer.plan(zip_path, target_path)
+    assert not plan["full"]
+    assert sorted(plan["write"]) == ["js/main.js", "js/new.js"]
+    assert plan["remove"] == ["js/old/legacy.js"]
+    assert plan["unchanged"] == 2
+
+
+def test_plan_rewrites_missing_or_resized_files(installed, tmp_path):
+    installer, target_path = installed
+    os.remove(os.path.join(target_path, "assets", "icon.png"))
+    with open(os.path.join(target_path, "manifest.xml"), 'wb') as f:
+        f.write(b"edited locally")
+
+    plan = installer.plan(make_ccx(tmp_path / "same.ccx", {
+        "manifest.xml": b"v1",
+        "js/main.js": b"main v1",
+        "js/old/legacy.js": b"legacy",
+        "assets/icon.png": b"icon"
+    }), target_path)
+    assert sorted(plan["write"]) == ["assets/icon.png", "manifest.xml"]
+
+
+def test_target_change_invalidates_manifest(installed, tmp_path):
+    installer, _ = installed
+    plan = installer.plan(make_ccx(tmp_path / "v2.ccx", {"manifest.xml": b"v1"}), str(tmp_path / "elsewhere"))
+    assert plan["full"]
+    assert plan["remove"] == []
+
+
+def test_remove_members_prunes_empty_dirs_inside_target(installed, tmp_path, monkeypatch):
+    installer, target_path = installed
+    # 相对路径的目标目录同样不能越过目标目录清理
+    monkeypatch.chdir(tmp_path)
+    assert installer.remove_members("plugin", ["js/old/legacy.js", "assets/icon.png"]) == 2
+    assert not os.path.exists(os.path.join(target_path, "js", "old"))
+    assert not os.path.exists(os.path.join(target_path, "assets"))
+    assert os.path.isfile(os.path.join(target_path, "js", "main.js"))
+
+    assert installer.remove_members("plugin", ["manifest.xml", "js/main.js"]) == 2
+    assert os.path.isdir(target_path)
+    assert os.listdir(target_path) == []
+
+
+def test_member_path_rejects_traversal(installed, tmp_path):
+    installer, target_path = installed
+    outside = tmp_path / "outside.txt"
+    outside.write_bytes(b"keep")
+
+    assert installer._member_path(target_path, "../outside.txt") is None
+    assert installer._member_path(target_path, "js/../../outside.txt") is None
+    assert installer._member_path(target_path, "js/main.js") == os.path.join(target_path, "js", "main.js")
+    assert installer.remove_members(target_path, ["../outside.txt"]) == 0
+    assert outside.read_bytes() == b"keep"
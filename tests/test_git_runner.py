@@ -0,0 +1,20 @@
+import subprocess
+
+from ccxmanager.py import git_runner
+from ccxmanager.py.git_runner import run_git, set_network_timeout
+
+
+def test_network_timeout_is_configurable(monkeypatch):
+    monkeypatch.setattr(git_runner, "NETWORK_TIMEOUT", git_runner.NETWORK_TIMEOUT)
+    set_network_timeout(7200)
+    assert git_runner.NETWORK_TIMEOUT == 7200
+    set_network_timeout(0)
+    assert git_runner.NETWORK_TIMEOUT is None
+    # remote set-url等本地子命令不使用网络超时
+    assert "remote" not in git_runner.NETWORK_COMMANDS
+
+
+def test_run_git_timeout_returns_124():
+    result = run_git(["-c", "alias.z=!sleep 5", "z"], timeout=0.5)
+    assert result.returncode == 124
+    assert "超时" in result.stderr
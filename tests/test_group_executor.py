@@ -0,0 +1,279 @@
+import time
+import pytest
+
+from conftest import wait_until
+
+SEEDED = {
+    "1": {"class_type": "KSampler", "inputs": {"seed": 1, "steps": 20}},
+    "2": {"class_type": "SaveImage", "inputs": {"images": ["1", 0]}}
+}
+
+# 没有随机种子的确定性组，每次提交的 prompt 完全相同
+DETERMINISTIC = {
+    "1": {"class_type": "Upscale", "inputs": {"scale": 2}},
+    "2": {"class_type": "SaveImage", "inputs": {"images": ["1", 0]}}
+}
+
+
+def plan(repeat_count=1, **values):
+    return [{"group_name": "g", "repeat_count": repeat_count, "delay_seconds": 0, "output_node_ids": ["2"], **values}]
+
+
+def finished(backend, job_id):
+    return backend.get_job_status(job_id)["status"] in ("done", "cancelled", "failed")
+
+
+def test_completion_is_event_driven(comfyui, monkeypatch):
+    # 兜底检查间隔远大于超时，只有执行事件能及时唤醒等待
+    monkeypatch.setattr(comfyui.lgutils, "COMPLETION_FALLBACK_INTERVAL", 60.0)
+    backend = comfyui.lgutils._backend_executor
+    job_id = backend.submit_job("a", plan(3), SEEDED)
+
+    assert wait_until(lambda: finished(backend, job_id))
+    job = backend.get_job_status(job_id)
+    assert job["status"] == "done"
+    assert job["completed"] == 3
+    assert job["last_result"] == "execution_success"
+    assert backend.prompt_events == {} and backend.prompt_owners == {}
+
+
+def test_execution_error_is_recorded(comfyui):
+    comfyui.outcome = lambda item: "execution_error"
+    backend = comfyui.lgutils._backend_executor
+    job_id = backend.submit_job("a", plan(2), SEEDED)
+
+    assert wait_until(lambda: finished(backend, job_id))
+    job = backend.get_job_status(job_id)
+    assert job["status"] == "done"
+    assert job["last_result"] == "execution_error"
+
+
+def test_lost_events_fall_back_to_history(comfyui, monkeypatch):
+    # 结束事件全部丢失时由历史记录确认完成
+    monkeypatch.setattr(comfyui.lgutils, "COMPLETION_FALLBACK_INTERVAL", 0.05)
+    monkeypatch.setattr(comfyui.lgutils, "PROMPT_FINISH_EVENTS", ())
+    monkeypatch.setattr(comfyui, "send_sync", lambda event, data, sid=None: None)
+    backend = comfyui.lgutils._backend_executor
+    job_id = backend.submit_job("a", plan(2), SEEDED)
+
+    assert wait_until(lambda: finished(backend, job_id))
+    assert backend.get_job_status(job_id)["completed"] == 2
+
+
+def test_prompt_removed_from_queue_cancels_job(comfyui, monkeypatch):
+    monkeypatch.setattr(comfyui.lgutils, "COMPLETION_FALLBACK_INTERVAL", 0.05)
+    comfyui.hold.clear()
+    backend = comfyui.lgutils._backend_executor
+    job_id = backend.submit_job("a", plan(3), SEEDED)
+    assert wait_until(lambda: comfyui.prompt_queue.queue)
+
+    # 用户在ComfyUI中清空队列：不会再有执行事件，也不会有历史记录
+    comfyui.prompt_queue.delete_queue_item(lambda item: True)
+    assert wait_until(lambda: finished(backend, job_id))
+    assert backend.get_job_status(job_id)["status"] == "cancelled"
+    assert len(comfyui.prompt_queue.put_items) == 1
+
+
+@pytest.mark.parametrize("pipeline_depth, expected_pending", [(1, 1), (3, 3)])
+def test_pipeline_depth_bounds_prompts_in_queue(comfyui, pipeline_depth, expected_pending):
+    comfyui.duration = 0.05
+    backend = comfyui.lgutils._backend_executor
+    job_id = backend.submit_job("a", plan(6, pipeline_depth=pipeline_depth), SEEDED)
+
+    assert wait_until(lambda: finished(backend, job_id))
+    assert backend.get_job_status(job_id)["completed"] == 6
+    assert len(comfyui.prompt_queue.put_items) == 6
+    assert comfyui.prompt_queue.max_pending == expected_pending
+
+
+def test_cancel_discards_pipelined_prompts(comfyui):
+    comfyui.hold.clear()
+    backend = comfyui.lgutils._backend_executor
+    job_id = backend.submit_job("a", plan(6, pipeline_depth=3), SEEDED)
+    assert wait_until(lambda: len(comfyui.prompt_queue.queue) == 3)
+
+    assert backend.cancel_job(job_id)
+    assert wait_until(lambda: finished(backend, job_id))
+    assert backend.get_job_status(job_id)["status"] == "cancelled"
+    assert comfyui.prompt_queue.queue == []
+    assert len(comfyui.prompt_queue.put_items) == 3
+    assert backend.prompt_events == {}
+
+
+def test_repeated_submissions_validate_once(comfyui):
+    lgutils = comfyui.lgutils
+    backend = lgutils._backend_executor
+    job_id = backend.submit_job("a", plan(3), SEEDED)
+    assert wait_until(lambda: finished(backend, job_id))
+    # 每次提交的种子不同，结构相同，只验证一次
+    assert comfyui.validate_calls == 1
+    assert lgutils.validation_cache.get_stats()["hits"] == 2
+    seeds = {item[2]["1"]["inputs"]["seed"] for item in comfyui.prompt_queue.put_items}
+    assert len(seeds) == 3
+
+    # 节点定义重新加载后旧的验证结果不再命中
+    comfyui.node_class_mappings["SaveImage"] = type("SaveImage", (), {})
+    job_id = backend.submit_job("a", plan(1), SEEDED)
+    assert wait_until(lambda: finished(backend, job_id))
+    assert comfyui.validate_calls == 2
+
+
+def test_failed_validation_is_not_cached(comfyui):
+    lgutils = comfyui.lgutils
+    backend = lgutils._backend_executor
+    no_output = {"1": {"class_type": "KSampler", "inputs": {"seed": 1}}}
+    job_id = backend.submit_job("a", [{"group_name": "g", "repeat_count": 2, "delay_seconds": 0, "output_node_ids": ["1"]}], no_output)
+
+    assert wait_until(lambda: finished(backend, job_id))
+    assert comfyui.validate_calls == 2
+    assert comfyui.prompt_queue.put_items == []
+    assert lgutils.validation_cache.get_stats()["entries"] == 0
+
+
+@pytest.mark.parametrize("prompt, policy, pipeline_depth, expected_puts", [
+    (DETERMINISTIC, "off", 1, 4),
+    (DETERMINISTIC, "skip", 1, 1),
+    (DETERMINISTIC, "skip", 3, 3),
+    (DETERMINISTIC, "collapse", 3, 1),
+    (SEEDED, "collapse", 3, 4)
+])
+def test_duplicate_policy(comfyui, prompt, policy, pipeline_depth, expected_puts):
+    comfyui.duration = 0.05
+    backend = comfyui.lgutils._backend_executor
+    job_id = backend.submit_job("a", plan(4, duplicate_policy=policy, pipeline_depth=pipeline_depth), prompt)
+
+    assert wait_until(lambda: finished(backend, job_id))
+    job = backend.get_job_status(job_id)
+    assert len(comfyui.prompt_queue.put_items) == expected_puts
+    assert job["completed"] == expected_puts
+    assert job["skipped_duplicates"] == 4 - expected_puts
+
+
+def test_skip_retries_after_failed_run(comfyui):
+    comfyui.outcome = lambda item: "execution_error"
+    backend = comfyui.lgutils._backend_executor
+    job_id = backend.submit_job("a", plan(3, duplicate_policy="skip"), DETERMINISTIC)
+
+    # 失败的执行不作为重复判断的基准
+    assert wait_until(lambda: finished(backend, job_id))
+    assert len(comfyui.prompt_queue.put_items) == 3
+    assert backend.get_job_status(job_id)["skipped_duplicates"] == 0
+
+
+def test_priority_decides_which_queued_job_starts(comfyui):
+    backend = comfyui.lgutils._backend_executor
+    backend.max_running_jobs = 1
+    comfyui.hold.clear()
+    blocker = backend.submit_job("x", plan(1), SEEDED)
+    low = backend.submit_job("low", plan(1), SEEDED)
+    high = backend.submit_job("high", plan(1), SEEDED, priority=5)
+    assert [backend.get_job_status(job_id)["status"] for job_id in (blocker, low, high)] == ["running", "queued", "queued"]
+
+    comfyui.hold.set()
+    assert wait_until(lambda: finished(backend, low))
+    start_times = [backend.get_job_status(job_id)["start_time"] for job_id in (blocker, high, low)]
+    assert start_times == sorted(start_times)
+
+
+def test_owner_runs_one_job_at_a_time_and_owners_interleave(comfyui, monkeypatch):
+    comfyui.duration = 0.05
+    backend = comfyui.lgutils._backend_executor
+    owners = []
+    put = comfyui.prompt_queue.put
+
+    def record_owner(item):
+        owners.append(backend.prompt_owners.get(item[1]))
+        put(item)
+    monkeypatch.setattr(comfyui.prompt_queue, "put", record_owner)
+
+    first = backend.submit_job("a", plan(3), SEEDED)
+    second = backend.submit_job("a", plan(1), SEEDED)
+    other = backend.submit_job("b", plan(3), SEEDED)
+    assert [backend.get_job_status(job_id)["status"] for job_id in (first, second, other)] == ["running", "queued", "running"]
+
+    assert wait_until(lambda: all(finished(backend, job_id) for job_id in (first, second, other)))
+    # 不同提交者的 prompt 在队列中交替执行
+    assert sorted(owners[:4]) == sorted([first, first, other, other])
+    assert backend.get_job_status(second)["start_time"] >= backend.get_job_status(first)["finish_time"]
+
+
+def test_pause_and_resume(comfyui):
+    comfyui.duration = 0.05
+    backend = comfyui.lgutils._backend_executor
+    job_id = backend.submit_job("a", plan(4), SEEDED)
+    assert wait_until(lambda: comfyui.prompt_queue.put_items)
+
+    assert backend.pause_job(job_id)
+    assert not backend.pause_job(job_id)
+    # 已在队列中的 prompt 继续执行，之后不再提交
+    assert wait_until(lambda: backend.get_job_status(job_id)["completed"] == 1)
+    time.sleep(0.2)
+    assert backend.get_job_status(job_id)["status"] == "paused"
+    assert len(comfyui.prompt_queue.put_items) == 1
+
+    assert backend.resume_job(job_id)
+    assert wait_until(lambda: finished(backend, job_id))
+    assert backend.get_job_status(job_id)["completed"] == 4
+
+
+def test_cancel_queued_job(comfyui):
+    backend = comfyui.lgutils._backend_executor
+    backend.max_running_jobs = 1
+    comfyui.hold.clear()
+    running = backend.submit_job("a", plan(1), SEEDED)
+    queued = backend.submit_job("b", plan(1), SEEDED)
+
+    assert backend.cancel_job(queued)
+    assert backend.get_job_status(queued)["status"] == "cancelled"
+    assert not backend.cancel_job(queued)
+    assert "b" not in backend.pending and "b" not in backend.owner_order
+    comfyui.hold.set()
+    assert wait_until(lambda: finished(backend, running))
+    assert backend.get_job_status(queued)["start_time"] is None
+    assert comfyui.interrupts == 0
+
+
+def test_cancel_interrupts_only_own_running_prompt(comfyui):
+    comfyui.duration = 0.3
+    backend = comfyui.lgutils._backend_executor
+    executing = backend.submit_job("a", plan(2), SEEDED)
+    waiting = backend.submit_job("b", plan(2), SEEDED)
+    assert wait_until(lambda: len(comfyui.prompt_queue.running) == 1 and len(comfyui.prompt_queue.queue) == 1)
+    running_job = backend.prompt_owners[comfyui.prompt_queue.running[0][1]]
+    waiting_job = waiting if running_job == executing else executing
+
+    # 排队中的 prompt 直接删除，不中断其他任务正在执行的 prompt
+    assert backend.cancel_job(waiting_job)
+    assert wait_until(lambda: finished(backend, waiting_job))
+    assert comfyui.interrupts == 0
+    assert comfyui.prompt_queue.queue == []
+
+    assert backend.cancel_job(running_job)
+    assert comfyui.interrupts == 1
+    assert wait_until(lambda: finished(backend, running_job))
+    assert backend.get_job_status(running_job)["status"] == "cancelled"
+
+
+def test_interrupted_prompt_cancels_only_its_job(comfyui):
+    backend = comfyui.lgutils._backend_executor
+    interrupted_owner = {}
+    comfyui.outcome = lambda item: "execution_interrupted" if backend.prompt_owners.get(item[1]) == interrupted_owner.get("job") else "execution_success"
+    interrupted_owner["job"] = interrupted = backend.submit_job("a", plan(3), SEEDED)
+    other = backend.submit_job("b", plan(3), SEEDED)
+
+    assert wait_until(lambda: finished(backend, interrupted) and finished(backend, other))
+    assert backend.get_job_status(interrupted)["status"] == "cancelled"
+    assert backend.get_job_status(interrupted)["completed"] == 0
+    assert backend.get_job_status(other)["status"] == "done"
+    assert backend.get_job_status(other)["completed"] == 3
+    assert backend.interrupted_prompts == set()
+
+
+def test_finished_jobs_are_pruned(comfyui, monkeypatch):
+    monkeypatch.setattr(comfyui.lgutils, "MAX_FINISHED_JOBS", 2)
+    backend = comfyui.lgutils._backend_executor
+    # 同一提交者的任务依次执行，先提交的先结束
+    job_ids = [backend.submit_job("a", plan(1), SEEDED) for _ in range(4)]
+
+    assert wait_until(lambda: finished(backend, job_ids[-1]))
+    assert [job["id"] for job in backend.get_job_status()] == job_ids[2:]
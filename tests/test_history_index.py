@@ -0,0 +1,163 @@
+import os
+import json
+import pytest
+
+from ccxmanager.py import history_index
+from ccxmanager.py.history_index import CommitHistoryIndex
+from conftest import git
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    """10个线性提交的本地仓库，repo.commit()追加提交并返回SHA"""
+    for name in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{name}_NAME", "test")
+        monkeypatch.setenv(f"GIT_{name}_EMAIL", "test@example.com")
+    repo_path = str(tmp_path / "node")
+    git(["init", "-q", "-b", "main", repo_path])
+
+    def commit(message, file_name="node.py"):
+        with open(os.path.join(repo_path, file_name), 'a', encoding='utf-8') as f:
+            f.write(f"# {message}\n")
+        git(["add", file_name], cwd=repo_path)
+        git(["commit", "-q", "-m", message], cwd=repo_path)
+        return git(["rev-parse", "HEAD"], cwd=repo_path)
+
+    for i in range(10):
+        commit(f"commit {i}", "docs.md" if i % 3 == 0 else "node.py")
+    return type("Repo", (), {"path": repo_path, "commit": staticmethod(commit)})
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    """记录执行的git命令，并确认git命令不在全局锁内执行"""
+    index = CommitHistoryIndex(str(tmp_path / "history_cache"))
+    index.commands = []
+    run_git = history_index.run_git
+
+    def recording_run_git(args, **kwargs):
+        assert not index.lock.locked()
+        index.commands.append(args[0])
+        return run_git(args, **kwargs)
+    monkeypatch.setattr(history_index, "run_git", recording_run_git)
+    return index
+
+
+def log(repo):
+    return git(["log", "--pretty=format:%H"], cwd=repo.path).split("\n")
+
+
+def hashes(result):
+    return [commit["hash"] for commit in result["commits"]]
+
+
+def test_advance_reads_only_new_commits(repo, index):
+    assert hashes(index.query("node", repo.path)) == log(repo)
+    assert index.commands == ["log"]
+
+    index.commands.clear()
+    repo.commit("commit 10")
+    repo.commit("commit 11")
+    result = index.query("node", repo.path)
+    assert hashes(result) == log(repo)
+    assert result["total"] == 12
+    assert index.commands == ["merge-base", "log"]
+
+
+def test_rollback_slices_cached_list(repo, index):
+    newest = log(repo)
+    index.query("node", repo.path)
+    index.commands.clear()
+
+    git(["reset", "-q", "--hard", "HEAD~4"], cwd=repo.path)
+    assert hashes(index.query("node", repo.path)) == newest[4:]
+    # 只确认提交数量，不再遍历历史
+    assert index.commands == ["rev-list"]
+
+    state = index.nodes["node"]
+    assert len(state["commits"]) == 10
+    assert [info["start"] for info in state["heads"].values()] == [0, 4]
+
+
+def test_new_commit_after_rollback_drops_abandoned_heads(repo, index):
+    index.query("node", repo.path)
+    git(["reset", "-q", "--hard", "HEAD~4"], cwd=repo.path)
+    index.query("node", repo.path)
+    index.commands.clear()
+
+    repo.commit("diverged")
+    assert hashes(index.query("node", repo.path)) == log(repo)
+    assert "rev-list" not in index.commands and index.commands.count("log") == 1
+    state = index.nodes["node"]
+    # 回退前的最新提交已不在当前历史线上
+    assert len(state["commits"]) == 7
+    assert [info["start"] for info in state["heads"].values()] == [1, 0]
+
+
+def test_merge_history_is_not_sliced(repo, index, monkeypatch):
+    side_base = log(repo)[0]
+    # 提交时间：主分支的提交早于侧分支，合并后的列表按时间排序为 合并、侧分支、主分支、...
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "@3786912010 +0000")
+    repo.commit("main work")
+    git(["checkout", "-q", "-b", "side", side_base], cwd=repo.path)
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "@3786912020 +0000")
+    side = repo.commit("side work", "side.py")
+    git(["checkout", "-q", "main"], cwd=repo.path)
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "@3786912030 +0000")
+    git(["merge", "-q", "--no-edit", "side"], cwd=repo.path)
+    assert hashes(index.query("node", repo.path))[1] == side
+
+    # 侧分支的提交在合并后的列表中，但列表中它之后的主分支提交不属于它的历史
+    git(["reset", "-q", "--hard", side], cwd=repo.path)
+    index.commands.clear()
+    result = index.query("node", repo.path)
+    assert index.commands[0] == "rev-list" and "log" in index.commands
+    assert hashes(result) == log(repo)
+    assert hashes(result)[1] == side_base
+
+
+def test_eviction_trims_shared_list(repo, index):
+    index.max_heads = 2
+    newest = log(repo)
+    index.query("node", repo.path)
+    for back in (2, 5):
+        git(["reset", "-q", "--hard", newest[back]], cwd=repo.path)
+        index.query("node", repo.path)
+
+    state = index.nodes["node"]
+    assert list(state["heads"]) == [newest[2], newest[5]]
+    assert [commit["hash"] for commit in state["commits"]] == newest[2:]
+    assert [info["start"] for info in state["heads"].values()] == [0, 3]
+
+
+def test_cache_is_persisted_as_one_list(repo, tmp_path, index):
+    newest = log(repo)
+    index.query("node", repo.path)
+    git(["reset", "-q", "--hard", "HEAD~3"], cwd=repo.path)
+    index.query("node", repo.path, path="node.py")
+
+    with open(tmp_path / "history_cache" / "node.json", 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    assert len(data["commits"]) == 10
+    assert data["heads"][newest[3]]["start"] == 3
+
+    # 新实例从磁盘加载，HEAD和路径过滤都直接命中
+    reloaded = CommitHistoryIndex(str(tmp_path / "history_cache"))
+    index.commands.clear()
+    result = reloaded.query("node", repo.path, path="node.py")
+    assert index.commands == []
+    assert hashes(result) == git(["log", "--pretty=format:%H", "--", "node.py"], cwd=repo.path).split("\n")
+
+
+def test_query_paging_and_filters(repo, index):
+    newest = log(repo)
+    page = index.query("node", repo.path, limit=3, page=2)
+    assert hashes(page) == newest[3:6]
+    assert page["total"] == 10 and page["offset"] == 3
+
+    git(["reset", "-q", "--hard", "HEAD~2"], cwd=repo.path)
+    assert hashes(index.query("node", repo.path, offset=7)) == newest[9:]
+    filtered = index.query("node", repo.path, path="docs.md", limit=2)
+    assert filtered["total"] == 3
+    assert hashes(filtered) == git(["log", "--pretty=format:%H", "--", "docs.md"], cwd=repo.path).split("\n")[:2]
+    assert index.query("node", repo.path, since="2999-01-01")["total"] == 0
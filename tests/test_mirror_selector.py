@@ -0,0 +1,68 @@
+import json
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+from ccxmanager.py.mirror_selector import MirrorSelector, equivalent_mirrors, get_mirror_selector
+
+
+def test_equivalent_mirrors():
+    expected = [
+        "https://gitee.com/owner/repo/raw/main/dist/plugin.ccx",
+        "https://raw.githubusercontent.com/owner/repo/main/dist/plugin.ccx"
+    ]
+    assert equivalent_mirrors("https://gitee.com/owner/repo/raw/main/dist/plugin.ccx") == expected
+    assert equivalent_mirrors("https://github.com/owner/repo/raw/main/dist/plugin.ccx") == expected
+    assert equivalent_mirrors("https://raw.githubusercontent.com/owner/repo/main/dist/plugin.ccx") == expected
+    assert equivalent_mirrors("https://example.com/plugin.ccx") == []
+
+
+def test_race_picks_first_responder(start_range_server, tmp_path):
+    slow, fast = start_range_server(), start_range_server()
+    slow.files["/plugin.ccx"] = fast.files["/plugin.ccx"] = b"x" * 1024
+    slow.delays["/plugin.ccx"] = 1.0
+    stats_path = str(tmp_path / "mirror_stats.json")
+
+    winner = MirrorSelector(stats_path).race([slow.url("/plugin.ccx"), fast.url("/plugin.ccx")])
+    assert winner == fast.url("/plugin.ccx")
+    with open(stats_path, 'r', encoding='utf-8') as f:
+        stats = json.load(f)
+    assert stats[urlparse(winner).netloc]["ttfb_ms"] is not None
+
+
+def test_rank_uses_persisted_stats(tmp_path):
+    stats_path = str(tmp_path / "mirror_stats.json")
+    urls = ["https://gitee.com/a.ccx", "https://raw.githubusercontent.com/a.ccx"]
+    selector = MirrorSelector(stats_path)
+    selector.record_failure(urls[0], IOError("timeout"))
+    selector.record_success(urls[1], 1024 * 1024, 1.0)
+
+    # 新实例从统计文件加载历史，表现好的镜像排在前面
+    assert MirrorSelector(stats_path).rank(urls) == [urls[1], urls[0]]
+
+
+def test_download_from_url_falls_back_to_next_mirror(start_range_server, node, ccx_archive, tmp_path):
+    broken, mirror = start_range_server(), start_range_server()
+    data = ccx_archive(16 * 1024)
+    mirror.files["/plugin.ccx"] = data
+    node.config["mirrors"] = [mirror.url("/plugin.ccx")]
+    node.config["mirror_racing"] = False
+
+    cached_path, filename = node.download_from_url(broken.url("/plugin.ccx"))
+    assert filename == "plugin.ccx"
+    with open(cached_path, 'rb') as f:
+        assert f.read() == data
+    with open(tmp_path / "mirror_stats.json", 'r', encoding='utf-8') as f:
+        stats = json.load(f)
+    assert stats[urlparse(broken.url("/")).netloc]["failures"] == 1
+    assert stats[urlparse(mirror.url("/")).netloc]["successes"] == 1
+
+
+def test_shared_selector_keeps_concurrent_updates(tmp_path):
+    # 两个配置文件的启动任务并发下载时共用同一个选择器
+    selector = get_mirror_selector()
+    assert get_mirror_selector() is selector
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: selector.record_success("https://gitee.com/a.ccx", 1024, 0.1), range(80)))
+
+    with open(tmp_path / "mirror_stats.json", 'r', encoding='utf-8') as f:
+        assert json.load(f)["gitee.com"]["successes"] == 80
@@ -0,0 +1,75 @@
+import os
+import pytest
+
+from ccxmanager.node_version_manager import NodeVersionController
+from ccxmanager.py.git_runner import is_safe_ref
+from conftest import git
+
+
+@pytest.mark.parametrize("ref", ["main", "v1.2.0", "feature/x", "0123abc", "HEAD~2"])
+def test_is_safe_ref_accepts_refs(ref):
+    assert is_safe_ref(ref)
+
+
+@pytest.mark.parametrize("ref", ["", None, "--upload-pack=touch /tmp/x", "-b", "main branch", "main\n", "a\x00b", "a\x7fb"])
+def test_is_safe_ref_rejects_options_and_control_chars(ref):
+    assert not is_safe_ref(ref)
+
+
+@pytest.fixture
+def controller(tmp_path, upstream):
+    """custom_nodes下克隆了上游仓库的版本控制器"""
+    controller = NodeVersionController()
+    controller.custom_nodes_path = str(tmp_path / "custom_nodes")
+    git(["clone", "-q", upstream["url"], os.path.join(controller.custom_nodes_path, "test-node")])
+    return controller
+
+
+def head(controller):
+    return git(["rev-parse", "HEAD"], cwd=os.path.join(controller.custom_nodes_path, "test-node"))
+
+
+def upstream_commits(tmp_path):
+    """上游main分支的提交，最新的在前"""
+    return git(["rev-list", "main"], cwd=str(tmp_path / "upstream.git")).splitlines()
+
+
+def test_switch_rejects_unsafe_target_ref(controller):
+    before = head(controller)
+    success, message = controller.switch_node_version("test-node", 1, target_ref="--upload-pack=touch pwned")
+    assert not success
+    assert "Invalid target ref" in message
+    assert head(controller) == before
+
+
+def test_negative_offset_switches_offline(controller, tmp_path, monkeypatch):
+    commits = upstream_commits(tmp_path)
+    monkeypatch.setattr(controller, "fetch_missing", lambda *args: pytest.fail("目标提交已在本地，不应访问网络"))
+
+    success, message = controller.switch_node_version("test-node", -2)
+    assert success, message
+    assert head(controller) == commits[2]
+
+    # 偏移量相对于origin/main，而不是回退后的本地分支
+    success, message = controller.switch_node_version("test-node", -1)
+    assert success, message
+    assert head(controller) == commits[1]
+
+
+def test_offset_rejects_positive_values(controller):
+    success, message = controller.switch_node_version("test-node", 2)
+    assert not success
+    assert "Version offset" in message
+
+
+def test_latest_and_target_ref_fetch_new_commits(controller, upstream, tmp_path):
+    old_commit = upstream_commits(tmp_path)[1]
+    new_commit = upstream["commit"]("commit 3")
+
+    success, message = controller.switch_node_version("test-node", 1)
+    assert success, message
+    assert head(controller) == new_commit
+
+    success, message = controller.switch_node_version("test-node", 1, target_ref=old_commit)
+    assert success, message
+    assert head(controller) == old_commit
@@ -0,0 +1,135 @@
+import sys
+import copy
+import random
+
+from ccxmanager.py import prompt_graph
+from ccxmanager.py.prompt_graph import hash_prompt, structural_hash, build_adjacency, collect_dependencies, SubgraphPlanCache, PromptTemplate, ValidationCache, MAX_SEED
+
+# 1 -> 2 -> 4(输出)，1 -> 3 -> 5(输出)，6 与两个输出都无关
+PROMPT = {
+    "1": {"class_type": "Loader", "inputs": {"name": "a"}},
+    "2": {"class_type": "Encode", "inputs": {"model": ["1", 0], "text": "x"}},
+    "3": {"class_type": "Sampler", "inputs": {"model": ["1", 0], "seed": 7}},
+    "4": {"class_type": "SaveImage", "inputs": {"images": ["2", 0]}},
+    "5": {"class_type": "SaveImage", "inputs": {"images": ["3", 0], "extra": {"link_id": "6"}}},
+    "6": {"class_type": "Note", "inputs": {}},
+    "7": {"class_type": "Note", "inputs": {"source": [None, 0], "other": ["", 0]}}
+}
+
+
+def test_build_adjacency():
+    adjacency = build_adjacency(PROMPT)
+    assert adjacency["2"] == ["1"]
+    assert adjacency["5"] == ["3", "6"]
+    assert adjacency["7"] == []
+
+
+def test_collect_dependencies_preorder_without_duplicates():
+    adjacency = build_adjacency(PROMPT)
+    assert collect_dependencies(adjacency, ["4"]) == ("4", "2", "1")
+    assert collect_dependencies(adjacency, ["4", "5"]) == ("4", "2", "1", "5", "3", "6")
+    # 不存在的输出节点和依赖被忽略
+    assert collect_dependencies({"1": ["9"]}, ["1", "8"]) == ("1",)
+
+
+def test_collect_dependencies_handles_cycles_and_deep_graphs():
+    assert collect_dependencies({"1": ["2"], "2": ["1"]}, ["1"]) == ("1", "2")
+    depth = sys.getrecursionlimit() * 2
+    chain = {str(i): [str(i + 1)] if i + 1 < depth else [] for i in range(depth)}
+    assert len(collect_dependencies(chain, ["0"])) == depth
+
+
+def test_plan_cache_builds_adjacency_once_per_prompt(monkeypatch):
+    calls = []
+    monkeypatch.setattr(prompt_graph, "build_adjacency", lambda prompt: calls.append(1) or build_adjacency(prompt))
+    cache = SubgraphPlanCache()
+
+    plan = cache.get_plan(PROMPT, ["4"])
+    assert cache.get_plan(PROMPT, [4]) is plan
+    assert cache.get_plan(PROMPT, ["5"]) == ("5", "3", "1", "6")
+    assert len(calls) == 1
+
+    # 内容变化的 prompt 重新建立索引
+    changed = dict(PROMPT, **{"4": {"class_type": "SaveImage", "inputs": {"images": ["3", 0]}}})
+    assert cache.get_plan(changed, ["4"]) == ("4", "3", "1")
+    assert len(calls) == 2
+
+
+def test_plan_cache_evicts_least_recently_used():
+    cache = SubgraphPlanCache(max_prompts=1, max_plans=2)
+    first = cache.get_plan(PROMPT, ["4"])
+    cache.get_plan(PROMPT, ["5"])
+    cache.get_plan(PROMPT, ["4"])
+    cache.get_plan(PROMPT, ["4", "5"])
+    assert len(cache.plans) == 2
+    assert cache.get_plan(PROMPT, ["4"]) is first
+    assert len(cache.adjacency) == 1
+
+
+def test_template_shares_nodes_with_full_prompt():
+    template = SubgraphPlanCache().get_template(PROMPT, ["4"])
+    assert list(template.prompt) == ["4", "2", "1"]
+    assert all(template.prompt[node_id] is PROMPT[node_id] for node_id in template.prompt)
+
+
+def test_template_seed_slots_skip_linked_seeds():
+    prompt = {
+        "1": {"class_type": "Sampler", "inputs": {"seed": 1, "noise_seed": 2}},
+        "2": {"class_type": "Sampler", "inputs": {"seed": ["3", 0]}},
+        "3": {"class_type": "Seed", "inputs": {"value": 5}}
+    }
+    assert PromptTemplate(prompt).seed_slots == (("1", "seed"), ("1", "noise_seed"))
+
+
+def test_instantiate_copies_only_seeded_nodes():
+    template = SubgraphPlanCache().get_template(PROMPT, ["5"])
+    original = copy.deepcopy(PROMPT)
+
+    first = template.instantiate(random.Random(1))
+    second = template.instantiate(random.Random(2))
+    assert 0 <= first["3"]["inputs"]["seed"] <= MAX_SEED
+    assert first["3"]["inputs"]["seed"] != second["3"]["inputs"]["seed"]
+    # 写入种子的节点被复制，其余节点与完整 prompt 共享
+    assert first["3"] is not PROMPT["3"]
+    assert first["3"]["inputs"]["model"] == ["1", 0]
+    assert first["1"] is PROMPT["1"] and first["5"] is PROMPT["5"]
+    # 模板和来源 prompt 都保持不变
+    assert PROMPT == original
+    assert template.prompt["3"] is PROMPT["3"]
+
+
+def test_validation_cache_hits_and_copies():
+    cache = ValidationCache()
+    assert cache.get("a") is None
+    cache.put("a", ["4"])
+    outputs = cache.get("a")
+    assert outputs == ["4"]
+    # 返回副本，调用方修改不影响缓存
+    outputs.append("5")
+    assert cache.get("a") == ["4"]
+    assert cache.get_stats() == {"entries": 1, "hits": 2, "misses": 1, "hit_rate": 2 / 3}
+
+
+def test_validation_cache_evicts_and_invalidates():
+    cache = ValidationCache(max_entries=2)
+    cache.put("a", ["1"])
+    cache.put("b", ["2"])
+    cache.get("a")
+    cache.put("c", ["3"])
+    assert cache.get("b") is None
+    assert cache.get("a") == ["1"]
+    assert cache.invalidate() == 2
+    assert cache.get("c") is None
+
+
+def test_structural_hash_ignores_only_seed_values():
+    reseeded = dict(PROMPT, **{"3": {"class_type": "Sampler", "inputs": {"model": ["1", 0], "seed": 8}}})
+    assert hash_prompt(reseeded) != hash_prompt(PROMPT)
+    assert structural_hash(reseeded) == structural_hash(PROMPT)
+
+    # 其他输入变化、种子改为连线都会改变结构
+    changed = dict(PROMPT, **{"2": {"class_type": "Encode", "inputs": {"model": ["1", 0], "text": "y"}}})
+    assert structural_hash(changed) != structural_hash(PROMPT)
+    linked = dict(PROMPT, **{"3": {"class_type": "Sampler", "inputs": {"model": ["1", 0], "seed": ["6", 0]}}})
+    assert structural_hash(linked) != structural_hash(PROMPT)
+    assert PROMPT["3"]["inputs"]["seed"] == 7
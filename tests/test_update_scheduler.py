@@ -0,0 +1,94 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+
+from ccxmanager import auto_updater_node
+from ccxmanager.auto_updater_node import UpdateScheduler
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def config(**values):
+    return {"check_interval_days": 1, "check_jitter_minutes": 30, "next_check_time": "", **values}
+
+
+@pytest.mark.parametrize("next_check_time", ["", None, "not a time"])
+def test_load_due_missing_or_invalid_is_due_now(next_check_time):
+    assert UpdateScheduler()._load_due(config(next_check_time=next_check_time), NOW) == NOW
+
+
+def test_load_due_keeps_persisted_time():
+    due = NOW + timedelta(hours=6)
+    assert UpdateScheduler()._load_due(config(next_check_time=due.strftime(UpdateScheduler.TIME_FORMAT)), NOW) == due
+
+
+def test_load_due_beyond_one_period_is_due_now():
+    # 时钟回拨后持久化的时间远在一个周期之外，立即检查
+    due = NOW + timedelta(days=3)
+    assert UpdateScheduler()._load_due(config(next_check_time=due.strftime(UpdateScheduler.TIME_FORMAT)), NOW) == NOW
+
+
+def test_next_due_interval_and_jitter():
+    scheduler = UpdateScheduler()
+    assert scheduler._next_due(config(check_interval_days=0), NOW) is None
+    assert scheduler._next_due(config(check_jitter_minutes=0), NOW) == NOW + timedelta(days=1)
+    due = scheduler._next_due(config(), NOW)
+    assert NOW + timedelta(days=1) <= due <= NOW + timedelta(days=1, minutes=30)
+
+
+class FakeUpdater:
+    """只保存配置的更新器，调度器每轮新建一个实例"""
+    saved = {}
+
+    def __init__(self):
+        self.config = self.load_config()
+        self.updated_count = 0
+
+    def load_config(self):
+        return dict(FakeUpdater.saved)
+
+    def save_config(self):
+        FakeUpdater.saved = dict(self.config)
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    checks = []
+    monkeypatch.setattr(auto_updater_node, "GitHubRepoUpdater", FakeUpdater)
+    monkeypatch.setattr(auto_updater_node, "auto_check_for_repo_updates", lambda updater: checks.append(updater))
+    scheduler = UpdateScheduler(startup_delay=0)
+    scheduler.checks = checks
+    yield scheduler
+    scheduler.stop()
+    scheduler.thread.join(timeout=5)
+
+
+def test_scheduler_checks_when_due_and_persists_next_time(scheduler):
+    FakeUpdater.saved = config(next_check_time=None)
+    scheduler.start()
+    assert wait_until(lambda: scheduler.get_state()["last_run"])
+    assert len(scheduler.checks) == 1
+    next_check = datetime.strptime(FakeUpdater.saved["next_check_time"], UpdateScheduler.TIME_FORMAT)
+    assert next_check > datetime.now() + timedelta(hours=23)
+    assert scheduler.get_state()["next_run"] == FakeUpdater.saved["next_check_time"]
+
+
+def test_scheduler_waits_until_due_unless_forced(scheduler):
+    due = datetime.now() + timedelta(hours=6)
+    FakeUpdater.saved = config(next_check_time=due.strftime(UpdateScheduler.TIME_FORMAT))
+    scheduler.start()
+    assert wait_until(lambda: scheduler.get_state()["next_run"])
+    time.sleep(0.1)
+    assert scheduler.checks == []
+
+    scheduler.run_now()
+    assert wait_until(lambda: scheduler.checks)
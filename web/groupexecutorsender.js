@@ -302,6 +302,7 @@ app.registerExtension({
                             headers: { 'Content-Type': 'application/json' },
                             body: JSON.stringify({
                                 node_id: this.id,
+                                client_id: api.clientId,
                                 execution_list: enrichedExecutionList,
                                 api_prompt: fullApiPrompt
                             })